@@ -1,6 +1,8 @@
+import os
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
+from dotenv import load_dotenv
+from sqlalchemy import engine_from_config, make_url
 from sqlalchemy import pool
 
 from alembic import context
@@ -23,6 +25,18 @@ if config.config_file_name is not None:
 
 target_metadata = Base.metadata
 
+# Migrate the application's database: `alembic -x db_url=...`, else DB_URL
+# (environment or .env), else the URL of alembic.ini
+db_url = context.get_x_argument(as_dictionary=True).get("db_url")
+if db_url is None:
+    load_dotenv()
+    db_url = os.getenv("DB_URL")
+if db_url:
+    config.set_main_option("sqlalchemy.url", db_url.replace("%", "%%"))
+sqlite_database = make_url(config.get_main_option("sqlalchemy.url")).database
+if config.get_main_option("sqlalchemy.url").startswith("sqlite") and sqlite_database:
+    os.makedirs(os.path.dirname(sqlite_database) or ".", exist_ok=True)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,6 +61,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=url.startswith("sqlite"),
     )
 
     with context.begin_transaction():
@@ -67,7 +82,13 @@ def run_migrations_online() -> None:
     )
 
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=target_metadata)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite cannot alter most constraints in place, autogenerate
+            # renders batch operations (copy and move the table) for it
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
 
         with context.begin_transaction():
             context.run_migrations()
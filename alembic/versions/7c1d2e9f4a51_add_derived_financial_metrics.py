@@ -0,0 +1,52 @@
+"""Add derived financial metrics as generated columns
+
+Revision ID: 7c1d2e9f4a51
+Revises: 53f0cfaa19b8
+Create Date: 2026-10-19 13:05:12.418223
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7c1d2e9f4a51"
+down_revision: Union[str, None] = "53f0cfaa19b8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Same expressions as PlexCentrisListingDB
+DERIVED_COLUMNS = {
+    "prix_pi2_terrain": "prix * 1.0 / NULLIF(superficie_terrain, 0)",
+    "annees_payback": "CASE WHEN revenus > taxes THEN prix * 1.0 / (revenus - taxes) END",
+    "ratio_revenus_prix": "revenus * 100.0 / NULLIF(prix, 0)",
+    "diff_prix_eval": "(prix - eval_municipale) * 100.0 / NULLIF(eval_municipale, 0)",
+    "prix_par_unite": "prix * 1.0 / NULLIF(nombre_unites, 0)",
+    "multiplicateur_revenus": "prix * 1.0 / NULLIF(revenus, 0)",
+}
+
+INDEXES = {
+    "ix_listings_quartier_payback": ["quartier", "annees_payback"],
+    "ix_listings_quartier_prix_par_unite": ["quartier", "prix_par_unite"],
+    "ix_listings_diff_prix_eval": ["diff_prix_eval"],
+}
+
+
+def upgrade() -> None:
+    # Stored on Postgres, virtual on SQLite (which cannot add stored columns)
+    for name, expression in DERIVED_COLUMNS.items():
+        op.add_column(
+            "plex_centris_listings",
+            sa.Column(name, sa.Float, sa.Computed(expression), nullable=True),
+        )
+    for name, columns in INDEXES.items():
+        op.create_index(name, "plex_centris_listings", columns)
+
+
+def downgrade() -> None:
+    for name in INDEXES:
+        op.drop_index(name, table_name="plex_centris_listings")
+    for name in DERIVED_COLUMNS:
+        op.drop_column("plex_centris_listings", name)
@@ -0,0 +1,33 @@
+"""Add data_version, moved forward by every write to the listings
+
+Revision ID: a6c4e2b8f913
+Revises: f5a2c8e1d7b4
+Create Date: 2026-10-19 15:32:44.610528
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "a6c4e2b8f913"
+down_revision: Union[str, None] = "f5a2c8e1d7b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    data_version = op.create_table(
+        "data_version",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.bulk_insert(data_version, [{"name": "listings", "version": 1}])
+
+
+def downgrade() -> None:
+    op.drop_table("data_version")
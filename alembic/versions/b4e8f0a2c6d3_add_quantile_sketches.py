@@ -0,0 +1,34 @@
+"""Add quantile sketches per metric, quartier and month
+
+Revision ID: b4e8f0a2c6d3
+Revises: 7c1d2e9f4a51
+Create Date: 2026-10-19 13:22:40.615307
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b4e8f0a2c6d3"
+down_revision: Union[str, None] = "7c1d2e9f4a51"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "quantile_sketches",
+        sa.Column("metric", sa.String(), nullable=False),
+        sa.Column("quartier", sa.String(), nullable=False),
+        sa.Column("bucket", sa.String(), nullable=False),
+        sa.Column("n", sa.Integer(), nullable=False),
+        sa.Column("sketch", sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint("metric", "quartier", "bucket"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("quantile_sketches")
@@ -0,0 +1,46 @@
+"""Add listing_summaries, the thumbnail cards seen on result pages
+
+Revision ID: b7e3a9d2c461
+Revises: c2d9f6a1e754
+Create Date: 2026-10-19 17:05:42.913027
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3a9d2c461"
+down_revision: Union[str, None] = "c2d9f6a1e754"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "listing_summaries",
+        sa.Column("centris_id", sa.Integer(), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("prix", sa.Integer(), nullable=True),
+        sa.Column("categorie", sa.String(), nullable=True),
+        sa.Column("adresse", sa.String(), nullable=True),
+        sa.Column("first_seen", sa.String(), nullable=False),
+        sa.Column("last_seen", sa.String(), nullable=False),
+        sa.Column("changed_on", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("centris_id"),
+    )
+    op.create_index(
+        op.f("ix_listing_summaries_last_seen"),
+        "listing_summaries",
+        ["last_seen"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        op.f("ix_listing_summaries_last_seen"), table_name="listing_summaries"
+    )
+    op.drop_table("listing_summaries")
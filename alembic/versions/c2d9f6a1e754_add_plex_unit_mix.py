@@ -0,0 +1,72 @@
+"""Add plex_unit_mix, the number of units per size of each listing
+
+Revision ID: c2d9f6a1e754
+Revises: a6c4e2b8f913
+Create Date: 2026-10-19 16:20:13.508761
+
+"""
+
+import json
+import re
+from collections import Counter
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c2d9f6a1e754"
+down_revision: Union[str, None] = "a6c4e2b8f913"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def _unit_mix_counts(unites: list[str]) -> dict[float, int]:
+    # Same as centris.backend.mappers.unit_mix_counts, frozen for this revision
+    counts = Counter()
+    for unite in unites:
+        if match := re.fullmatch(r"\s*(\d+)(\s+1/2)?\s*", unite):
+            counts[int(match.group(1)) + (0.5 if match.group(2) else 0.0)] += 1
+    return dict(counts)
+
+
+def upgrade() -> None:
+    unit_mix = op.create_table(
+        "plex_unit_mix",
+        sa.Column("centris_id", sa.Integer(), nullable=False),
+        sa.Column("pieces", sa.Float(), nullable=False),
+        sa.Column("count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["centris_id"],
+            ["plex_centris_listings.centris_id"],
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint("centris_id", "pieces"),
+    )
+    op.create_index(
+        "ix_unit_mix_pieces_count", "plex_unit_mix", ["pieces", "count"], unique=False
+    )
+
+    # Backfill from the JSON `unites` column
+    connection = op.get_bind()
+    result = connection.execute(
+        sa.text(
+            "SELECT centris_id, unites FROM plex_centris_listings "
+            "WHERE unites IS NOT NULL"
+        )
+    )
+    while batch := result.fetchmany(BATCH_SIZE):
+        rows = [
+            {"centris_id": centris_id, "pieces": pieces, "count": count}
+            for centris_id, unites in batch
+            for pieces, count in _unit_mix_counts(json.loads(unites)).items()
+        ]
+        if rows:
+            op.bulk_insert(unit_mix, rows)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_unit_mix_pieces_count", table_name="plex_unit_mix")
+    op.drop_table("plex_unit_mix")
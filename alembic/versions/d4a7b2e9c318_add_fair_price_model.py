@@ -0,0 +1,43 @@
+"""Add the fair price model's expected price and the gap to it
+
+Revision ID: d4a7b2e9c318
+Revises: e8c1f4b7a239
+Create Date: 2026-10-19 19:02:41.173508
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d4a7b2e9c318"
+down_revision: Union[str, None] = "e8c1f4b7a239"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "plex_centris_listings", sa.Column("prix_modele", sa.Integer(), nullable=True)
+    )
+    # Same expression as PlexCentrisListingDB, virtual on SQLite
+    op.add_column(
+        "plex_centris_listings",
+        sa.Column(
+            "diff_prix_modele",
+            sa.Float,
+            sa.Computed("(prix - prix_modele) * 100.0 / NULLIF(prix_modele, 0)"),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        "ix_listings_diff_prix_modele", "plex_centris_listings", ["diff_prix_modele"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_listings_diff_prix_modele", table_name="plex_centris_listings")
+    op.drop_column("plex_centris_listings", "diff_prix_modele")
+    op.drop_column("plex_centris_listings", "prix_modele")
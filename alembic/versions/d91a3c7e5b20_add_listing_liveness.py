@@ -0,0 +1,38 @@
+"""Add listing liveness flag and last seen date
+
+Revision ID: d91a3c7e5b20
+Revises: b4e8f0a2c6d3
+Create Date: 2026-10-19 13:41:08.250193
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d91a3c7e5b20"
+down_revision: Union[str, None] = "b4e8f0a2c6d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Listings already stored count as active until the first liveness sweep
+    op.add_column(
+        "plex_centris_listings",
+        sa.Column("active", sa.Boolean(), server_default=sa.true(), nullable=False),
+    )
+    op.add_column(
+        "plex_centris_listings", sa.Column("last_seen", sa.String(), nullable=True)
+    )
+    op.create_index(
+        "ix_listings_active_quartier", "plex_centris_listings", ["active", "quartier"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_listings_active_quartier", table_name="plex_centris_listings")
+    op.drop_column("plex_centris_listings", "last_seen")
+    op.drop_column("plex_centris_listings", "active")
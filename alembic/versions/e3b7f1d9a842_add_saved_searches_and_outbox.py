@@ -0,0 +1,55 @@
+"""Add saved searches and their match outbox
+
+Revision ID: e3b7f1d9a842
+Revises: d91a3c7e5b20
+Create Date: 2026-10-19 13:58:31.902417
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e3b7f1d9a842"
+down_revision: Union[str, None] = "d91a3c7e5b20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "saved_searches",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("enabled", sa.Boolean(), server_default=sa.true(), nullable=False),
+        sa.Column("quartier", sa.String(), nullable=True),
+        sa.Column("min_prix", sa.Integer(), nullable=True),
+        sa.Column("max_prix", sa.Integer(), nullable=True),
+        sa.Column("min_unites", sa.Integer(), nullable=True),
+        sa.Column("max_unites", sa.Integer(), nullable=True),
+        sa.Column("max_payback", sa.Float(), nullable=True),
+        sa.Column("max_prix_par_unite", sa.Float(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "search_matches",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("search_id", sa.Integer(), nullable=False),
+        sa.Column("centris_id", sa.Integer(), nullable=False),
+        sa.Column("matched_at", sa.String(), nullable=False),
+        sa.Column("sent_at", sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(["search_id"], ["saved_searches.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("search_id", "centris_id"),
+    )
+    op.create_index(
+        op.f("ix_search_matches_sent_at"), "search_matches", ["sent_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_search_matches_sent_at"), table_name="search_matches")
+    op.drop_table("search_matches")
+    op.drop_table("saved_searches")
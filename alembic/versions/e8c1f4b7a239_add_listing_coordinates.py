@@ -0,0 +1,32 @@
+"""Add latitude and longitude to the listings
+
+Revision ID: e8c1f4b7a239
+Revises: b7e3a9d2c461
+Create Date: 2026-10-19 18:12:30.442871
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e8c1f4b7a239"
+down_revision: Union[str, None] = "b7e3a9d2c461"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "plex_centris_listings", sa.Column("latitude", sa.Float(), nullable=True)
+    )
+    op.add_column(
+        "plex_centris_listings", sa.Column("longitude", sa.Float(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("plex_centris_listings", "longitude")
+    op.drop_column("plex_centris_listings", "latitude")
@@ -0,0 +1,34 @@
+"""Stamp listings with the data version of their last write
+
+Revision ID: f1c6a3d8b925
+Revises: d4a7b2e9c318
+Create Date: 2026-10-19 21:12:05.418237
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f1c6a3d8b925"
+down_revision: Union[str, None] = "d4a7b2e9c318"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "plex_centris_listings", sa.Column("write_version", sa.Integer(), nullable=True)
+    )
+    # NULL marks the rows written but not stamped yet
+    op.execute("UPDATE plex_centris_listings SET write_version = 0")
+    op.create_index(
+        "ix_listings_write_version", "plex_centris_listings", ["write_version"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_listings_write_version", table_name="plex_centris_listings")
+    op.drop_column("plex_centris_listings", "write_version")
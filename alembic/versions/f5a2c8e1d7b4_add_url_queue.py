@@ -0,0 +1,46 @@
+"""Add the url_queue work queue
+
+Revision ID: f5a2c8e1d7b4
+Revises: e3b7f1d9a842
+Create Date: 2026-10-19 14:41:07.218305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f5a2c8e1d7b4"
+down_revision: Union[str, None] = "e3b7f1d9a842"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "url_queue",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("centris_id", sa.Integer(), nullable=False),
+        sa.Column("url", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("lease_owner", sa.String(), nullable=True),
+        sa.Column("lease_expires_at", sa.Float(), nullable=True),
+        sa.Column("enqueued_at", sa.String(), nullable=False),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("centris_id"),
+    )
+    op.create_index(
+        "ix_url_queue_status_lease",
+        "url_queue",
+        ["status", "lease_expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_url_queue_status_lease", table_name="url_queue")
+    op.drop_table("url_queue")
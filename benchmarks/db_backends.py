@@ -0,0 +1,125 @@
+"""Ingest write throughput per database backend and settings.
+
+Every configuration gets a fresh database migrated with alembic, then stores the
+same listings with `scrape_and_save`. Pages come from memory (generated by the
+mock site) and are parsed before the clock starts, so only the writes are
+measured. By default: plain
+SQLite against SQLite with the `SQLITE_PRAGMAS` of `centris`, committing every
+listing or in batches. Add Postgres with `--db-url`, it must point to an empty
+database.
+
+    python benchmarks/db_backends.py --listings 2000
+    python benchmarks/db_backends.py --db-url postgresql://localhost/centris_bench
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from argparse import Namespace
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+from loguru import logger  # noqa: E402
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import centris.backend.main as main_module  # noqa: E402
+from centris import configure_sqlite  # noqa: E402
+from centris.backend.centris_scraper import BASE_URL, CentrisBienParser  # noqa: E402
+from centris.backend.db_models import Base, PlexCentrisListingDB  # noqa: E402
+from centris.backend.mock_server import MockCentrisSite, MockConfig  # noqa: E402
+
+ROOT = Path(__file__).parents[1]
+
+
+def migrate(db_url: str) -> None:
+    config = Config(
+        str(ROOT / "alembic.ini"), cmd_opts=Namespace(x=[f"db_url={db_url}"])
+    )
+    config.set_main_option("script_location", str(ROOT / "alembic"))
+    command.upgrade(config, "head")
+
+
+def run(db_url: str, pages: list[tuple[str, str]], tuned: bool, commit_every: int):
+    migrate(db_url)
+    engine = create_engine(db_url)
+    if tuned:
+        configure_sqlite(engine)
+    Session = sessionmaker(bind=engine)
+
+    # Serve the pages from memory, parsed ahead so only the writes are timed
+    scrape_date = datetime.now()
+    parsers = [CentrisBienParser.from_html(url, html) for url, html in pages]
+    for parser in parsers:
+        parser.get_data(scrape_date)
+    main_module.fetch_listings = lambda urls, budget, max_workers: iter(parsers)
+    with Session() as session:
+        start = time.perf_counter()
+        main_module.scrape_and_save(
+            [parser.url for parser in parsers],
+            scrape_date,
+            set(),
+            session,
+            commit_every=commit_every,
+        )
+        elapsed = time.perf_counter() - start
+        stored = session.scalar(select(func.count(PlexCentrisListingDB.centris_id)))
+    engine.dispose()
+    return stored, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listings", type=int, default=1000)
+    parser.add_argument("--db-url", help="Also run on this (empty) database")
+    parser.add_argument("--batch", type=int, default=25, help="Listings per commit")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    site = MockCentrisSite(MockConfig(pages=args.listings, listings_per_page=1))
+    pages = []
+    for position in range(args.listings):
+        listing = site.listing(position)
+        url = f"{BASE_URL}{listing['path']}?view=Summary"
+        pages.append((url, site.listing_page(listing["centris_id"])))
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    configurations = [
+        ("sqlite, default pragmas", None, False, 1),
+        ("sqlite, default pragmas", None, False, args.batch),
+        ("sqlite, WAL + tuned", None, True, 1),
+        ("sqlite, WAL + tuned", None, True, args.batch),
+    ]
+    if args.db_url:
+        configurations += [
+            ("--db-url", args.db_url, False, 1),
+            ("--db-url", args.db_url, False, args.batch),
+        ]
+
+    print(
+        f"{'backend':<26}{'commit every':>13}{'stored':>8}{'seconds':>9}{'listings/s':>12}"
+    )
+    for i, (name, db_url, tuned, commit_every) in enumerate(configurations):
+        if db_url is None:
+            db_url = f"sqlite:///{tmp_dir.name}/bench_{i}.db"
+        elif commit_every != 1:
+            # Second run on the same database: start from empty tables again
+            with create_engine(db_url).begin() as connection:
+                for table in reversed(Base.metadata.sorted_tables):
+                    connection.execute(table.delete())
+        stored, elapsed = run(db_url, pages, tuned, commit_every)
+        print(
+            f"{name:<26}{commit_every:>13}{stored:>8}{elapsed:>9.2f}"
+            f"{stored / elapsed:>12.1f}"
+        )
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
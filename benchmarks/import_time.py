@@ -0,0 +1,90 @@
+"""Cold-start guard for the ingest CLI and the dashboards.
+
+Imports each entry point in a fresh interpreter with `-X importtime`, fails if it is
+over its time budget or if it pulls a heavy dependency that must stay deferred.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --scale 2  # slower machine
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parents[1]
+
+# Entry point -> import budget in milliseconds
+BUDGETS_MS = {
+    "centris.backend.cli": 700,
+    "centris.backend.main": 600,
+    "centris.frontend.dashboard": 2500,
+    "centris.frontend.data_quality": 2500,
+}
+
+# Only imported when the feature that needs them runs
+DEFERRED_MODULES = ["playwright", "ydata_profiling", "geopy", "scrapy", "dotenv"]
+
+# Also deferred by the ingest entry points: only comps, pricing and the known IDs
+# need numpy / scipy, the dashboards load them through pandas anyway
+DEFERRED_BY_ENTRY_POINT = {
+    "centris.backend.cli": ["numpy", "scipy", "pyarrow"],
+    "centris.backend.main": ["numpy", "scipy", "pyarrow"],
+}
+
+
+def measure(module: str) -> tuple[float, set[str]]:
+    """Return the cumulative import time (ms) of `module` and the packages it loaded."""
+    code = (
+        f"import sys, {module}; "
+        "print(','.join(sorted({m.split('.')[0] for m in sys.modules})))"
+    )
+    env = {k: v for k, v in os.environ.items() if k != "DB_URL"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+        env=env,
+        check=True,
+    )
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.strip() == module:
+            total_us = int(cumulative)
+    return total_us / 1000, set(result.stdout.strip().split(","))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="Budget multiplier")
+    args = parser.parse_args()
+
+    failed = False
+    for module, budget_ms in BUDGETS_MS.items():
+        try:
+            elapsed_ms, loaded = measure(module)
+        except subprocess.CalledProcessError as e:
+            print(f"SKIP  {module}: {e.stderr.strip().splitlines()[-1]}")
+            continue
+
+        budget_ms *= args.scale
+        deferred = DEFERRED_MODULES + DEFERRED_BY_ENTRY_POINT.get(module, [])
+        leaked = sorted(set(deferred) & loaded)
+        ok = elapsed_ms <= budget_ms and not leaked
+        failed |= not ok
+        status = "OK  " if ok else "FAIL"
+        print(f"{status}  {module}: {elapsed_ms:.0f} ms (budget {budget_ms:.0f} ms)")
+        if leaked:
+            print(f"      eagerly imports {', '.join(leaked)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
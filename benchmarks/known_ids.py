@@ -0,0 +1,112 @@
+"""Memory and speed of the known IDs: Python set against the Bloom filter.
+
+Adds `--ids` random Centris IDs to both, then checks as many unseen ones to
+measure the false positive rate, i.e. the share of new listings that still cost
+a database lookup. With `--db-url`, also times loading the stored IDs: the full
+set of `get_existing_centris_ids`, a `KnownIds` rebuild and a cached load.
+
+    python benchmarks/known_ids.py --ids 1000000
+    python benchmarks/known_ids.py --db-url sqlite:///centris.db
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+import numpy as np  # noqa: E402
+from loguru import logger  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from centris.backend.known_ids import KnownIds, ScalableBloomFilter  # noqa: E402
+from centris.backend.main import get_existing_centris_ids  # noqa: E402
+
+
+def measure(function):
+    """Result, seconds and peak traced MB of `function()`."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 1e6
+
+
+def in_memory(n_ids: int, error_rate: float) -> None:
+    rng = np.random.default_rng(0)
+    ids = rng.choice(90_000_000, size=2 * n_ids, replace=False) + 10_000_000
+    stored, unseen = ids[:n_ids], ids[n_ids:]
+
+    known, set_seconds, set_mb = measure(lambda: set(stored.tolist()))
+    start = time.perf_counter()
+    set_hits = sum(i in known for i in unseen.tolist())
+    set_lookup = time.perf_counter() - start
+
+    def fill():
+        bloom = ScalableBloomFilter(error_rate=error_rate)
+        for chunk in np.array_split(stored, max(1, n_ids // 100_000)):
+            bloom.add_many(chunk)
+        return bloom
+
+    bloom, bloom_seconds, bloom_mb = measure(fill)
+    start = time.perf_counter()
+    false_positives = int(bloom.contains_many(unseen).sum())
+    bloom_lookup = time.perf_counter() - start
+    assert bloom.contains_many(stored).all()
+
+    print(
+        f"{'':<8}{'build s':>9}{'peak MB':>9}{'kept MB':>9}{'lookup s':>10}{'hits':>9}"
+    )
+    print(
+        f"{'set':<8}{set_seconds:>9.2f}{set_mb:>9.1f}{set_mb:>9.1f}"
+        f"{set_lookup:>10.2f}{set_hits:>9}"
+    )
+    print(
+        f"{'bloom':<8}{bloom_seconds:>9.2f}{bloom_mb:>9.1f}{bloom.nbytes / 1e6:>9.1f}"
+        f"{bloom_lookup:>10.2f}{false_positives:>9}"
+    )
+    print(
+        f"false positive rate {false_positives / len(unseen):.4f} "
+        f"(target {error_rate}), {len(bloom.filters)} filters"
+    )
+
+
+def from_database(db_url: str) -> None:
+    Session = sessionmaker(bind=create_engine(db_url))
+    path = Path(tempfile.mkdtemp()) / "known_ids.npz"
+    with Session() as session:
+        ids, seconds, mb = measure(lambda: get_existing_centris_ids(session))
+        print(f"set of {len(ids)} stored IDs: {seconds:.2f} s, peak {mb:.1f} MB")
+        for label in ("rebuild", "cached"):
+            known_ids, seconds, mb = measure(lambda: KnownIds.load(session, path))
+            print(f"KnownIds {label}: {seconds:.2f} s, peak {mb:.1f} MB")
+        sample = list(ids)[:5000] + list(range(1, 5001))
+        found, seconds, _ = measure(lambda: known_ids.known(sample))
+        print(
+            f"{len(sample)} candidates, half stored: {len(found)} found "
+            f"in {known_ids.queries} queries, {seconds:.2f} s"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ids", type=int, default=1_000_000)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    parser.add_argument("--db-url", help="Also time loading the IDs of this database")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    in_memory(args.ids, args.error_rate)
+    if args.db_url:
+        from_database(args.db_url)
+
+
+if __name__ == "__main__":
+    main()
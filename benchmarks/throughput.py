@@ -0,0 +1,102 @@
+"""End-to-end ingest throughput against the local mock Centris server.
+
+Runs `get_urls_from_web` -> `scrape_and_save` on a fresh SQLite file (or the given
+database URL) and reports listings/sec, p95 fetch latency and peak RSS.
+
+    python benchmarks/throughput.py --pages 20 --workers 8 --latency 0.05
+    python benchmarks/throughput.py --db-url postgresql://localhost/centris_bench
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parents[1]))
+
+from loguru import logger  # noqa: E402
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from centris.backend.db_models import Base, PlexCentrisListingDB  # noqa: E402
+from centris.backend.main import (  # noqa: E402
+    get_existing_centris_ids,
+    get_urls_from_web,
+    scrape_and_save,
+)
+from centris.backend.mock_server import MockCentrisServer, MockConfig  # noqa: E402
+from fetching.rate_limiter import configure_limiter  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux, in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db-url", help="Defaults to a temporary SQLite file")
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--max-rate", type=float, default=200.0, help="req/s cap")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    db_url = args.db_url or f"sqlite:///{tmp_dir.name}/bench.db"
+
+    config = MockConfig(
+        pages=args.pages,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+    )
+    with MockCentrisServer(config) as server:
+        os.environ["CENTRIS_FETCH_BASE_URL"] = server.base_url
+
+        engine = create_engine(db_url)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        limiter = configure_limiter(
+            server.base_url, rate=args.max_rate / 4, max_rate=args.max_rate, burst=4
+        )
+
+        scrape_date = datetime.now()
+        start = time.perf_counter()
+        with Session() as session:
+            existing_ids = get_existing_centris_ids(session)
+            n_before = len(existing_ids)
+            urls = get_urls_from_web(scrape_date, use_api=True, num_pages=args.pages)
+            crawl_time = time.perf_counter() - start
+            scrape_and_save(
+                urls, scrape_date, existing_ids, session, max_workers=args.workers
+            )
+            stored = session.scalar(select(func.count(PlexCentrisListingDB.centris_id)))
+        elapsed = time.perf_counter() - start
+
+    metrics = limiter.metrics()
+    new_listings = stored - n_before
+    print(f"database          {engine.url.render_as_string(hide_password=True)}")
+    print(f"urls collected    {len(urls)} in {crawl_time:.2f}s")
+    print(f"listings stored   {new_listings} in {elapsed:.2f}s")
+    print(f"throughput        {new_listings / elapsed:.1f} listings/s")
+    p95 = metrics["p95_latency"]
+    print(f"p95 latency       {p95 * 1000:.1f} ms" if p95 is not None else "p95 n/a")
+    print(
+        f"final rate        {metrics['rate']} req/s ({metrics['throttled']} throttled)"
+    )
+    print(f"peak RSS          {peak_rss_mb():.1f} MB")
+    tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
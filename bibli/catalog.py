@@ -0,0 +1,288 @@
+"""Availability of book titles in the Nelligan (Montreal libraries) Encore catalog.
+
+Replaces the Selenium notebook: the advanced-search URL is built directly, result
+pages are fetched over a pooled `requests.Session` with bounded concurrency and
+parsed with selectolax, and answers are kept in a JSON cache with a TTL:
+
+    with TitleCache() as cache:
+        results = lookup_titles(["The Wake", "Kafka sur le rivage"], cache=cache)
+
+Fetching goes through `fetch`, so saved result pages can be replayed offline
+with `SavedPages` (and recorded with `save_pages_to`).
+"""
+
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections.abc import Callable, Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from urllib.parse import quote, urljoin
+
+import requests
+from loguru import logger
+from requests.adapters import HTTPAdapter
+from selectolax.parser import HTMLParser
+
+from fetching.rate_limiter import FetchError, limited_request
+
+
+BASE_URL = "https://nelligandecouverte.ville.montreal.qc.ca/iii/encore"
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) bibli-availability/0.1"}
+
+# Limits picked in the advanced search form of the notebook, as Encore search terms
+DEFAULT_LIMITS = {
+    "f": ["-"],  # Format: Livre
+    "c": ["55"],  # Collection: Adultes
+    "b": ["x33a"],  # Location: LE PRÉVOST - Adultes
+    "l": ["eng", "fre"],  # Language: Anglais or Français
+}
+
+# Where the parts of a result live on an Encore result page
+RESULT_SELECTOR = "div.searchResult"
+TITLE_SELECTOR = ".dpBibTitle a, span.title a"
+AUTHOR_SELECTOR = ".dpBibAuthor"
+AVAILABILITY_SELECTOR = ".availabilityMessage, .itemsAvailable, .availability"
+NO_RESULTS_SELECTOR = ".noResults, #noResultsFound"
+
+AVAILABLE_WORDS = ("disponible", "available", "sur les rayons", "on shelf")
+UNAVAILABLE_WORDS = ("prêt", "due", "retour", "indisponible", "unavailable")
+
+DEFAULT_CACHE_PATH = "artifacts/bibli_cache.json"
+
+
+@dataclass
+class CatalogHit:
+    title: str
+    record_url: str
+    author: str | None = None
+    status: str | None = None
+    available: bool | None = None
+
+
+@dataclass
+class LookupResult:
+    query: str
+    url: str
+    hits: list[CatalogHit] = field(default_factory=list)
+    fetched_at: float = 0.0
+    from_cache: bool = False
+    error: str | None = None
+
+    @property
+    def available(self) -> bool:
+        return any(hit.available for hit in self.hits)
+
+
+def normalize_title(title: str) -> str:
+    """Cache key of a title: case, accents and spacing do not matter."""
+    decomposed = unicodedata.normalize("NFKD", title.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", stripped).split())
+
+
+def build_search_url(
+    title: str,
+    limits: dict[str, list[str]] | None = None,
+    base_url: str = BASE_URL,
+) -> str:
+    """Encore URL of a title search with the given limits, e.g. `l: ["eng", "fre"]`."""
+    # Parentheses and colons are search syntax, keep them out of the title
+    terms = [f"t:({' '.join(re.sub(r'[():|]', ' ', title).split())})"]
+    for key, values in (DEFAULT_LIMITS if limits is None else limits).items():
+        if len(values) == 1:
+            terms.append(f"{key}:{values[0]}")
+        elif values:
+            terms.append("(" + " | ".join(f"{key}:{value}" for value in values) + ")")
+    search = quote(" ".join(terms), safe="")
+    return f"{base_url}/search/C__S{search}__Orightresult__U?lang=frc&suite=cobalt"
+
+
+def _availability(text: str | None) -> bool | None:
+    if not text:
+        return None
+    text = text.casefold()
+    if any(word in text for word in UNAVAILABLE_WORDS):
+        return False
+    if any(word in text for word in AVAILABLE_WORDS):
+        return True
+    return None
+
+
+def parse_results(html: str, base_url: str = BASE_URL) -> list[CatalogHit]:
+    """Extract the hits of an Encore result page, empty when nothing matched."""
+    tree = HTMLParser(html)
+    if tree.css_first(NO_RESULTS_SELECTOR):
+        return []
+    hits = []
+    for result in tree.css(RESULT_SELECTOR):
+        link = result.css_first(TITLE_SELECTOR)
+        if link is None:
+            continue
+        author = result.css_first(AUTHOR_SELECTOR)
+        status = result.css_first(AVAILABILITY_SELECTOR)
+        status_text = " ".join(status.text().split()) if status else None
+        hits.append(
+            CatalogHit(
+                title=" ".join(link.text().split()),
+                record_url=urljoin(base_url + "/", link.attributes.get("href") or ""),
+                author=" ".join(author.text().split()) if author else None,
+                status=status_text,
+                available=_availability(status_text),
+            )
+        )
+    return hits
+
+
+class TitleCache:
+    """Lookup results per normalized title, persisted as JSON, valid for `ttl` seconds."""
+
+    def __init__(
+        self, path: str | Path = DEFAULT_CACHE_PATH, ttl: float = 7 * 24 * 3600
+    ) -> None:
+        self.path = Path(path)
+        self.ttl = ttl
+        self._entries: dict[str, dict] = {}
+        if self.path.exists():
+            self._entries = json.loads(self.path.read_text())
+        self._dirty = False
+
+    def get(self, title: str) -> LookupResult | None:
+        entry = self._entries.get(normalize_title(title))
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+            return None
+        hits = [CatalogHit(**hit) for hit in entry["hits"]]
+        return LookupResult(**{**entry, "query": title, "hits": hits}, from_cache=True)
+
+    def put(self, result: LookupResult) -> None:
+        entry = asdict(result)
+        del entry["from_cache"], entry["error"]
+        self._entries[normalize_title(result.query)] = entry
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._entries, ensure_ascii=False, indent=1))
+        tmp_path.replace(self.path)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __enter__(self) -> "TitleCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.save()
+
+
+def page_file_name(title: str) -> str:
+    return normalize_title(title).replace(" ", "_")[:120] + ".html"
+
+
+class SavedPages:
+    """Fetch result pages from a directory instead of the catalog, by title."""
+
+    def __init__(self, directory: str | Path) -> None:
+        self.directory = Path(directory)
+
+    def __call__(self, title: str, url: str) -> str:
+        path = self.directory / page_file_name(title)
+        if not path.exists():
+            raise FileNotFoundError(f"No saved result page for {title!r} ({path})")
+        return path.read_text()
+
+
+def http_fetcher(max_connections: int = 8) -> Callable[[str, str], str]:
+    """Fetch through one pooled session and the shared limiter of the catalog host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    def fetch(title: str, url: str) -> str:
+        response = limited_request(
+            "GET", url, session=session, headers=HEADERS, timeout=20
+        )
+        return response.text
+
+    return fetch
+
+
+def save_pages_to(
+    directory: str | Path, fetch: Callable[[str, str], str]
+) -> Callable[[str, str], str]:
+    """Wrap `fetch` to keep a copy of every page, to be replayed with `SavedPages`."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    lock = threading.Lock()
+
+    def fetch_and_save(title: str, url: str) -> str:
+        html = fetch(title, url)
+        with lock:
+            (directory / page_file_name(title)).write_text(html)
+        return html
+
+    return fetch_and_save
+
+
+def lookup_title(
+    title: str,
+    fetch: Callable[[str, str], str],
+    limits: dict[str, list[str]] | None = None,
+) -> LookupResult:
+    url = build_search_url(title, limits)
+    result = LookupResult(query=title, url=url, fetched_at=time.time())
+    try:
+        result.hits = parse_results(fetch(title, url))
+    except (FetchError, requests.RequestException, OSError) as e:
+        logger.warning(f"Lookup of {title!r} failed: {e}")
+        result.error = str(e)
+    return result
+
+
+def lookup_titles(
+    titles: Iterable[str],
+    cache: TitleCache | None = None,
+    fetch: Callable[[str, str], str] | None = None,
+    max_workers: int = 8,
+    limits: dict[str, list[str]] | None = None,
+    refresh: bool = False,
+) -> list[LookupResult]:
+    """Look up every title, at most `max_workers` at once, in input order.
+
+    Titles equal once normalized are fetched once. Fresh cached answers are reused
+    unless `refresh`, failed lookups are not cached.
+    """
+    titles = list(titles)
+    unique = {normalize_title(title): title for title in reversed(titles)}
+    fetch = fetch or http_fetcher(max_workers)
+    results: dict[str, LookupResult] = {}
+    to_fetch = []
+    for key, title in unique.items():
+        cached = None if refresh or cache is None else cache.get(title)
+        if cached is not None:
+            results[key] = cached
+        else:
+            to_fetch.append(title)
+    logger.info(
+        f"{len(unique) - len(to_fetch)} titles cached, {len(to_fetch)} to fetch"
+    )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(lookup_title, title, fetch, limits) for title in to_fetch
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results[normalize_title(result.query)] = result
+            if cache is not None and result.error is None:
+                cache.put(result)
+    return [results[normalize_title(title)] for title in titles]
@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+from dataclasses import asdict
+
+from bibli.catalog import (
+    DEFAULT_CACHE_PATH,
+    SavedPages,
+    TitleCache,
+    http_fetcher,
+    lookup_titles,
+    save_pages_to,
+)
+
+
+def add_lookup_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "lookup", help="Check which titles of a reading list the library has"
+    )
+    parser.add_argument(
+        "titles", nargs="?", help="File with one title per line (default: stdin)"
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    parser.add_argument(
+        "--ttl-days",
+        type=float,
+        default=7,
+        help="Age after which a title is re-fetched",
+    )
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached answers")
+    parser.add_argument(
+        "--pages-dir", help="Parse saved result pages from this directory, offline"
+    )
+    parser.add_argument("--save-pages", help="Keep the fetched result pages here")
+    parser.add_argument("--json", action="store_true", help="Print JSON lines")
+    parser.set_defaults(func=run_lookup)
+
+
+def run_lookup(args: argparse.Namespace) -> None:
+    if args.titles:
+        with open(args.titles) as lines:
+            titles = [line.strip() for line in lines if line.strip()]
+    else:
+        titles = [line.strip() for line in sys.stdin if line.strip()]
+
+    fetch = SavedPages(args.pages_dir) if args.pages_dir else http_fetcher(args.workers)
+    if args.save_pages:
+        fetch = save_pages_to(args.save_pages, fetch)
+
+    with TitleCache(args.cache, ttl=args.ttl_days * 24 * 3600) as cache:
+        results = lookup_titles(
+            titles,
+            cache=cache,
+            fetch=fetch,
+            max_workers=args.workers,
+            refresh=args.refresh,
+        )
+
+    for result in results:
+        if args.json:
+            print(json.dumps(asdict(result), ensure_ascii=False))
+            continue
+        if result.error:
+            status = "error"
+        elif result.available:
+            status = "available"
+        elif result.hits:
+            status = "on loan"
+        else:
+            status = "not found"
+        print(f"{status:<10} {len(result.hits):>3}  {result.query}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="bibli", description="Library catalog")
+    subparsers = parser.add_subparsers(required=True)
+    add_lookup_parser(subparsers)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
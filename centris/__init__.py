@@ -1,10 +1,127 @@
 import os
-from sqlalchemy import create_engine
+from functools import lru_cache
+from pathlib import Path
+from sqlalchemy import Engine, create_engine, event, make_url
 from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
 
-load_dotenv(override=True)
+# Embedded database used when DB_URL is not set (same as alembic.ini)
+DEFAULT_DB_URL = "sqlite:///db/database.db"
 
-engine = create_engine(os.getenv("DB_URL"))
+# Set on every SQLite connection. WAL lets the dashboard and the read API read
+# during an ingest, and with it synchronous=NORMAL only syncs at checkpoints:
+# a power loss can drop the last commits, never corrupt the file.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -65536,  # in KiB, i.e. 64 MB
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+    "busy_timeout": 10000,  # ms to wait for the write lock
+    "foreign_keys": "ON",
+}
 
-Session = sessionmaker(bind=engine)
+# Async drivers used for the sync DB_URL drivers
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def get_db_url() -> str:
+    from dotenv import load_dotenv
+
+    load_dotenv(override=True)
+    return os.getenv("DB_URL", DEFAULT_DB_URL)
+
+
+def configure_sqlite(engine):
+    """Apply `SQLITE_PRAGMAS` to every connection of a SQLite engine, sync or async.
+
+    The driver's own transaction handling is turned off and SQLAlchemy emits
+    BEGIN itself, so that SAVEPOINTs (`session.begin_nested()`) work. Other
+    backends are returned untouched.
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    @event.listens_for(sync_engine, "begin")
+    def begin(connection) -> None:
+        connection.exec_driver_sql("BEGIN")
+
+    return engine
+
+
+def _create_sqlite_directory(url) -> None:
+    database = url.database
+    if url.get_backend_name() == "sqlite" and database and database != ":memory:":
+        Path(database).parent.mkdir(parents=True, exist_ok=True)
+
+
+@lru_cache(maxsize=None)
+def get_engine() -> Engine:
+    """Create the engine on first use, so importing `centris` needs no database."""
+    url = make_url(get_db_url())
+    _create_sqlite_directory(url)
+    return configure_sqlite(create_engine(url))
+
+
+@lru_cache(maxsize=None)
+def get_async_engine():
+    """Async counterpart of `get_engine` (asyncpg for Postgres, aiosqlite for SQLite).
+
+    The pool is sized for one ingest writer plus a few readers, override it with
+    `DB_POOL_SIZE` / `DB_MAX_OVERFLOW`.
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = make_url(get_db_url())
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    if url.get_backend_name() == "sqlite":
+        # SQLite has a single writer, a larger pool only adds lock contention
+        _create_sqlite_directory(url)
+        return configure_sqlite(create_async_engine(url))
+    return create_async_engine(
+        url,
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
+        pool_pre_ping=True,
+        pool_recycle=1800,
+    )
+
+
+class LazySessionmaker(sessionmaker):
+    """sessionmaker that binds `get_engine()` when the first session is opened."""
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+Session = LazySessionmaker()
+
+
+@lru_cache(maxsize=None)
+def get_async_sessionmaker():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    return async_sessionmaker(bind=get_async_engine(), expire_on_commit=False)
+
+
+def __getattr__(name: str):
+    # `from centris import engine` keeps working, the engines are created on access
+    if name == "engine":
+        return get_engine()
+    if name == "AsyncSession":
+        return get_async_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
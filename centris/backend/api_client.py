@@ -1,6 +1,12 @@
 import requests
 from typing import List, Dict, Any
-import time
+from centris.backend.centris_scraper import (
+    BASE_URL,
+    ThumbnailSummary,
+    get_fetch_url,
+    parse_thumbnail_summaries,
+)
+from fetching.rate_limiter import FetchError, limited_request
 
 
 class CentrisAPIClient:
@@ -8,7 +14,7 @@ class CentrisAPIClient:
 
     def __init__(self):
         self.session = requests.Session()
-        self.base_url = "https://www.centris.ca"
+        self.base_url = get_fetch_url(BASE_URL)
         self.headers = {
             "Accept": "application/json, text/javascript, */*; q=0.01",
             "Accept-Encoding": "gzip, deflate, br",
@@ -22,12 +28,15 @@ class CentrisAPIClient:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
         }
 
-    def get_listings(self, page: int = 1) -> List[Dict[Any, Any]]:
+    def get_listings(
+        self, page: int = 1, save_html: bool = True
+    ) -> List[Dict[Any, Any]]:
         """
         Get property listings using the Centris API
 
         Args:
             page: Page number to fetch
+            save_html: Whether to dump the returned HTML to `page_<page>.html`
 
         Returns:
             List of property listings
@@ -51,14 +60,19 @@ class CentrisAPIClient:
         }
 
         try:
-            response = self.session.post(endpoint, json=payload, headers=self.headers)
-            response.raise_for_status()
-            # save html
-            with open(f"page_{page}.html", "w") as f:
-                f.write(response.json()["d"]["Result"]["html"])
+            response = limited_request(
+                "POST",
+                endpoint,
+                session=self.session,
+                json=payload,
+                headers=self.headers,
+            )
+            if save_html:
+                with open(f"page_{page}.html", "w") as f:
+                    f.write(response.json()["d"]["Result"]["html"])
             return response.json()["d"]["Result"]["html"]
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, FetchError) as e:
             print(f"Error fetching listings: {e}")
             return []
 
@@ -81,12 +95,42 @@ class CentrisAPIClient:
 
             all_listings.extend(listings)
             print(f"Fetched {len(listings)} listings from page {page}")
-
-            # Add a small delay between requests
-            time.sleep(1)
+            # No fixed delay: limited_request paces calls on the shared host limiter
 
         return all_listings
 
+    def get_listing_urls(self, max_pages: int = 5) -> list[str]:
+        """
+        Get listing URLs from the thumbnail HTML returned by the API
+
+        Args:
+            max_pages: Maximum number of pages to fetch
+
+        Returns:
+            List of listing URLs, without duplicates
+        """
+        return [summary.url for summary in self.get_listing_summaries(max_pages)]
+
+    def get_listing_summaries(self, max_pages: int = 5) -> list[ThumbnailSummary]:
+        """
+        Get the listing cards (ID, URL, price, category, address) returned by the API
+
+        Args:
+            max_pages: Maximum number of pages to fetch
+
+        Returns:
+            List of card summaries, without duplicates
+        """
+        summaries = {}
+        for page in range(1, max_pages + 1):
+            html = self.get_listings(page, save_html=False)
+            if not html:
+                break
+            for summary in parse_thumbnail_summaries(html):
+                summaries.setdefault(summary.centris_id, summary)
+
+        return list(summaries.values())
+
 
 # Example usage
 def main():
@@ -0,0 +1,259 @@
+import asyncio
+import itertools
+from collections.abc import Collection, Iterable
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import httpx
+from loguru import logger
+from sqlalchemy.exc import SQLAlchemyError
+
+from centris import get_async_sessionmaker
+from centris.backend.centris_scraper import (
+    LISTING_HEADERS,
+    CentrisBienParser,
+    get_fetch_url,
+    parse_centris_id,
+)
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.main import skip_existing
+from centris.backend.mappers import map_bien_centris_to_orm
+from centris.backend.queries import stamp_listings
+from centris.backend.record_log import RecordLog
+from centris.backend.saved_searches import SearchMatcher
+from centris.backend.sketches import SketchAccumulator
+from centris.backend.snapshots import SnapshotStore
+from centris.backend.summaries import refresh_listing
+from centris.backend.utils import MemoryGuard
+from fetching.rate_limiter import limited_request_async
+
+if TYPE_CHECKING:
+    from centris.backend.known_ids import KnownIds
+
+
+async def fetch_listing_async(client: httpx.AsyncClient, url: str) -> CentrisBienParser:
+    response = await limited_request_async(
+        client, "GET", get_fetch_url(url), headers=LISTING_HEADERS
+    )
+    return CentrisBienParser.from_html(url, response.text)
+
+
+def _write_rows(
+    session,
+    rows: list[PlexCentrisListingDB],
+    matcher: SearchMatcher | None,
+    refresh_ids: Collection[int],
+    sketches: SketchAccumulator | None,
+    new_ids: list[int],
+) -> None:
+    """Insert the new `rows` and overwrite the refreshed ones, without committing."""
+    refreshed = [
+        refresh_listing(session, db_entry)
+        for db_entry in rows
+        if db_entry.centris_id in refresh_ids
+    ]
+    new = [db_entry for db_entry in rows if db_entry.centris_id not in refresh_ids]
+    session.add_all(new)
+    if matcher is not None:
+        # Flushing first fills the generated metrics the searches use
+        session.flush()
+        for db_entry in new:
+            matcher.add_matches(session, db_entry)
+        for row in refreshed:
+            matcher.add_matches(session, row, refreshed=True)
+    if sketches is not None and refreshed:
+        # Their previous values cannot be taken out of the sketches
+        sketches.resketch(
+            session, [row.centris_id for row in refreshed], adding=new_ids
+        )
+
+
+async def save_batch_async(
+    session_factory,
+    batch: list[PlexCentrisListingDB],
+    matcher: SearchMatcher | None = None,
+    refresh_ids: Collection[int] = (),
+    sketches: SketchAccumulator | None = None,
+) -> list[int]:
+    """Write a batch in one transaction, falling back to row by row if it fails.
+
+    Rows of `refresh_ids` overwrite their stored listing and the sketches of their
+    quartier and month are rebuilt. Saved search hits found by `matcher` are
+    committed with their listings. Returns the IDs of the written listings.
+    """
+    # Added to the sketches by the caller once committed
+    new_ids = [
+        db_entry.centris_id
+        for db_entry in batch
+        if db_entry.centris_id not in refresh_ids
+    ]
+    async with session_factory() as session:
+        try:
+            await session.run_sync(
+                _write_rows, batch, matcher, refresh_ids, sketches, new_ids
+            )
+            written = [db_entry.centris_id for db_entry in batch]
+            await session.run_sync(stamp_listings, written)
+            await session.commit()
+            return written
+        except SQLAlchemyError as e:
+            logger.warning(f"Batch of {len(batch)} failed ({e}), retrying row by row")
+            await session.rollback()
+
+    stored = []
+    for db_entry in batch:
+        async with session_factory() as session:
+            try:
+                await session.run_sync(
+                    _write_rows, [db_entry], matcher, refresh_ids, sketches, new_ids
+                )
+                await session.commit()
+                stored.append(db_entry.centris_id)
+            except SQLAlchemyError as e:
+                logger.error(f"Error storing {db_entry.url}: {e}")
+                await session.rollback()
+    if stored:
+        # One bump for the rows of the batch, right after their commits
+        async with session_factory() as session:
+            await session.run_sync(stamp_listings, stored)
+            await session.commit()
+    return stored
+
+
+async def scrape_and_save_async(
+    urls: Iterable[str],
+    scrape_date: datetime,
+    existing_ids: "set[int] | KnownIds",
+    session_factory=None,
+    concurrency: int = 8,
+    batch_size: int = 50,
+    memory_guard: MemoryGuard | None = None,
+    snapshot_store: SnapshotStore | None = None,
+    sketches: SketchAccumulator | None = None,
+    matcher: SearchMatcher | None = None,
+    refresh_ids: set[int] | None = None,
+    record_log: RecordLog | None = None,
+) -> int:
+    """Async counterpart of `main.scrape_and_save`.
+
+    `concurrency` fetchers share the host rate limiter and hand rows to a single
+    writer, which stores them in batches on the async engine without leaving the
+    event loop. Refreshed listings go through the same writer and batches. URLs
+    are read and checked against the stored listings in a worker thread, as
+    `urls` and a `KnownIds` may block on files, pages or the database. Returns
+    the number of stored listings.
+    """
+    session_factory = session_factory or get_async_sessionmaker()
+    queue: asyncio.Queue[PlexCentrisListingDB | None] = asyncio.Queue(
+        maxsize=2 * batch_size
+    )
+    url_queue: asyncio.Queue[str | None] = asyncio.Queue(maxsize=2 * concurrency)
+    refresh_ids = refresh_ids if refresh_ids is not None else set()
+    # Stored listings are resolved per chunk of URLs, one query each
+    url_iter = skip_existing(urls, existing_ids, refresh_ids)
+    in_flight: set[int] = set()
+    refreshed = 0
+
+    async def feeder() -> None:
+        loop = asyncio.get_running_loop()
+        error = None
+        try:
+            # Only this coroutine advances `url_iter`, one chunk at a time
+            while chunk := await loop.run_in_executor(
+                None, list, itertools.islice(url_iter, batch_size)
+            ):
+                if memory_guard is not None and memory_guard.exceeded():
+                    logger.error(f"Memory above {memory_guard.max_mb} MB, stopping")
+                    break
+                for url in chunk:
+                    await url_queue.put(url)
+        except Exception as e:
+            error = e
+        # One end mark per fetcher, not when cancelled: the fetchers are too
+        for _ in range(concurrency):
+            await url_queue.put(None)
+        if error is not None:
+            raise error
+
+    async def fetcher(client: httpx.AsyncClient) -> None:
+        while (url := await url_queue.get()) is not None:
+            centris_id = parse_centris_id(url)
+            if centris_id in in_flight:
+                logger.info(f"Skipping {centris_id}")
+                continue
+            in_flight.add(centris_id)
+            try:
+                centris_parser = await fetch_listing_async(client, url)
+                record = centris_parser.get_data(scrape_date)
+                if record_log is not None:
+                    record_log.append(record)
+                db_entry = map_bien_centris_to_orm(record)
+                if snapshot_store is not None:
+                    snapshot_store.put(centris_parser, db_entry.date_scrape)
+                centris_parser.release()
+            except Exception as e:
+                logger.error(f"Error storing {url}: {e}")
+                in_flight.discard(centris_id)
+                continue
+            # Stays in flight until written, so a repeated URL is not fetched again
+            await queue.put(db_entry)
+
+    async def save(batch: list[PlexCentrisListingDB]) -> int:
+        nonlocal refreshed
+        if record_log is not None:
+            record_log.flush()
+        written = await save_batch_async(
+            session_factory, batch, matcher, refresh_ids, sketches
+        )
+        stored = 0
+        for centris_id in written:
+            if centris_id in refresh_ids:
+                refresh_ids.discard(centris_id)
+                refreshed += 1
+                continue
+            existing_ids.add(centris_id)
+            stored += 1
+            if sketches is not None:
+                sketches.add(centris_id)
+        in_flight.difference_update(db_entry.centris_id for db_entry in batch)
+        return stored
+
+    async def writer() -> int:
+        stored = 0
+        batch = []
+        while (db_entry := await queue.get()) is not None:
+            batch.append(db_entry)
+            if len(batch) >= batch_size:
+                stored += await save(batch)
+                batch = []
+        if batch:
+            stored += await save(batch)
+        return stored
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        writer_task = asyncio.create_task(writer())
+        fetchers = asyncio.gather(
+            feeder(), *(fetcher(client) for _ in range(concurrency))
+        )
+        await asyncio.wait({writer_task, fetchers}, return_when=asyncio.FIRST_COMPLETED)
+        if writer_task.done():
+            # The writer died: the fetchers would wait forever on the full queue
+            fetchers.cancel()
+            await asyncio.gather(fetchers, return_exceptions=True)
+            writer_task.result()
+        try:
+            await fetchers
+        finally:
+            # Unless the writer dies meanwhile, it drains the queue up to the end
+            end = asyncio.ensure_future(queue.put(None))
+            await asyncio.wait({writer_task, end}, return_when=asyncio.FIRST_COMPLETED)
+            end.cancel()
+        stored = await writer_task
+
+    if record_log is not None:
+        record_log.flush()
+    if refreshed:
+        logger.info(f"Refreshed {refreshed} listings whose card changed")
+    logger.info(f"Stored {stored} listings")
+    return stored
@@ -0,0 +1,160 @@
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from loguru import logger
+from sqlalchemy import select, update
+from tqdm import tqdm
+
+from centris.backend.centris_scraper import CentrisBienParser
+from centris.backend.db_models import NON_PARSER_COLUMNS, PlexCentrisListingDB
+from centris.backend.queries import replace_unit_mix, stamp_listings
+from centris.backend.sketches import SKETCH_METRICS, resketch_listings, sketch_groups
+from centris.backend.snapshots import SnapshotStore
+
+
+# Columns filled by the parser, i.e. what a reparse can fix
+BACKFILL_FIELDS = [
+    column.name
+    for column in PlexCentrisListingDB.__table__.columns
+    if column.computed is None
+    and column.name not in {"centris_id", "url", "date_scrape", *NON_PARSER_COLUMNS}
+]
+
+
+def reparse_fields(
+    snapshot: tuple[str, int, str, str], fields: list[str]
+) -> tuple[int, dict | None]:
+    """Parse one archived page and return the DB values of `fields`."""
+    url, centris_id, date_scrape, html = snapshot
+    try:
+        centris_parser = CentrisBienParser.from_html(url, html)
+        db_entry = centris_parser.to_db_model(
+            datetime.strptime(date_scrape, "%Y-%m-%d")
+        )
+    except Exception as e:
+        logger.error(f"Error reparsing {centris_id}: {e}")
+        return centris_id, None
+    return centris_id, {field: getattr(db_entry, field) for field in fields}
+
+
+def _reparse_chunk(args: tuple[list, list[str]]) -> list[tuple[int, dict | None]]:
+    snapshots, fields = args
+    return [reparse_fields(snapshot, fields) for snapshot in snapshots]
+
+
+def _chunks(iterable, size: int):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _bounded_map(executor, fn, tasks, window: int):
+    """Like `executor.map` but keeps at most `window` tasks in flight."""
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def backfill(
+    fields: list[str],
+    snapshot_store: SnapshotStore,
+    session,
+    workers: int | None = None,
+    chunk_size: int = 256,
+    batch_size: int = 1000,
+    dry_run: bool = False,
+) -> Counter:
+    """Reparse the archived pages and update the columns whose value changed.
+
+    Snapshots are parsed in chunks across `workers` processes, compared with the
+    current DB values and written with bulk UPDATEs by primary key. No network
+    access is needed. Listings whose sketched or priced columns changed have
+    their sketches rebuilt and their fair price cleared, to be scored again.
+    Returns the number of changed values per field.
+    """
+    from centris.backend.pricing import PRICING_FEATURES
+
+    unknown = set(fields) - set(BACKFILL_FIELDS)
+    if unknown:
+        raise ValueError(
+            f"Cannot backfill {sorted(unknown)}, choose among {BACKFILL_FIELDS}"
+        )
+
+    columns = [getattr(PlexCentrisListingDB, field) for field in fields]
+    current = {
+        row[0]: dict(zip(fields, row[1:]))
+        for row in session.execute(select(PlexCentrisListingDB.centris_id, *columns))
+    }
+    logger.info(f"Reparsing {len(snapshot_store)} snapshots for {fields}")
+
+    changed = Counter()
+    changed_ids = set()
+    updates = []
+
+    # Columns the sketches and the fair price model are computed from
+    derived_from = {"quartier", *SKETCH_METRICS, *PRICING_FEATURES}
+
+    def write(updates: list[dict]) -> None:
+        derived_ids = [
+            row["centris_id"] for row in updates if derived_from & row.keys()
+        ]
+        # A new quartier moves a listing to other sketches
+        moved_from = sketch_groups(session, derived_ids) if "quartier" in fields else ()
+        session.execute(update(PlexCentrisListingDB), updates)
+        # The unit mix table is derived from `unites`
+        replace_unit_mix(
+            session,
+            {row["centris_id"]: row["unites"] for row in updates if "unites" in row},
+        )
+        if derived_ids:
+            resketch_listings(session, derived_ids, groups=moved_from)
+            session.execute(
+                update(PlexCentrisListingDB)
+                .where(PlexCentrisListingDB.centris_id.in_(derived_ids))
+                .values(prix_modele=None)
+            )
+
+    tasks = (
+        (chunk, fields) for chunk in _chunks(snapshot_store.iter_latest(), chunk_size)
+    )
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results_iter = _bounded_map(executor, _reparse_chunk, tasks, 2 * workers)
+        for results in tqdm(results_iter, desc="Backfilling"):
+            for centris_id, values in results:
+                if values is None or centris_id not in current:
+                    continue
+                diff = {
+                    field: value
+                    for field, value in values.items()
+                    if current[centris_id][field] != value
+                }
+                if not diff:
+                    continue
+                changed.update(diff.keys())
+                changed_ids.add(centris_id)
+                updates.append({"centris_id": centris_id, **diff})
+                if len(updates) >= batch_size and not dry_run:
+                    write(updates)
+                    updates = []
+
+    if updates and not dry_run:
+        write(updates)
+    if changed and not dry_run:
+        stamp_listings(session, changed_ids)
+    if not dry_run:
+        session.commit()
+
+    logger.info(f"Changed values per field: {dict(changed) or 'none'}")
+    return changed
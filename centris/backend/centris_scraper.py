@@ -1,21 +1,131 @@
-import requests
+import os
 import re
 from selectolax.parser import HTMLParser
 from collections import namedtuple
+from collections.abc import Callable
 from functools import cached_property
-from playwright.sync_api import sync_playwright
 from centris.backend.data_models import PlexCentrisListing
 from centris.backend.db_models import PlexCentrisListingDB
 from centris.backend.mappers import map_bien_centris_to_orm
+from fetching.rate_limiter import limited_request
 from datetime import datetime
 from loguru import logger
 from tqdm import tqdm
 
 
-START_URL_PLEX = "https://www.centris.ca/fr/plex~a-vendre~montreal?view=Thumbnail"
+BASE_URL = "https://www.centris.ca"
+
+# Seed searches: plexes for every city around Montreal. The parser and the
+# listings table only cover plexes, "plex" results include every size of them
+PLEX_PROPERTY_TYPES = ["plex", "duplex", "triplex", "quadruplex", "quintuplex"]
+SEARCH_PROPERTY_TYPES = ["plex"]
+SEARCH_REGIONS = [
+    "montreal",
+    "laval",
+    "longueuil",
+    "brossard",
+    "boucherville",
+    "terrebonne",
+    "repentigny",
+]
+
+LISTING_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
+}
 
 UrlData = namedtuple("UrlData", ["centris_id", "ville", "quartier"])
 
+# What a thumbnail card of a result page shows about a listing
+ThumbnailSummary = namedtuple(
+    "ThumbnailSummary", ["centris_id", "url", "prix", "categorie", "adresse"]
+)
+
+
+def build_search_url(property_type: str = "plex", region: str = "montreal") -> str:
+    return f"{BASE_URL}/fr/{property_type}~a-vendre~{region}?view=Thumbnail"
+
+
+def build_seed_urls(
+    property_types: list[str] = SEARCH_PROPERTY_TYPES,
+    regions: list[str] = SEARCH_REGIONS,
+) -> list[str]:
+    return [
+        build_search_url(property_type, region)
+        for property_type in property_types
+        for region in regions
+    ]
+
+
+def get_fetch_url(url: str) -> str:
+    """Map a canonical Centris URL to the host actually contacted.
+
+    Set `CENTRIS_FETCH_BASE_URL` to point the scrapers at a local stand-in such as
+    `centris.backend.mock_server`; stored URLs keep the canonical Centris host.
+    """
+    fetch_base_url = os.getenv("CENTRIS_FETCH_BASE_URL")
+    if fetch_base_url and url.startswith(BASE_URL):
+        return fetch_base_url.rstrip("/") + url[len(BASE_URL) :]
+    return url
+
+
+def parse_centris_id(url: str) -> int | None:
+    """Extract the Centris ID of a listing URL without fetching it."""
+    match = re.search(r"/(\d+)(?:\?|$)", url)
+    return int(match.group(1)) if match else None
+
+
+def _card_text(card, selector: str) -> str | None:
+    node = card.css_first(selector)
+    text = " ".join(node.text(separator=" ").split()) if node else ""
+    return text or None
+
+
+def _thumbnail_card(link):
+    # Price, category and address are siblings of the link within the card
+    node = link
+    while node.parent is not None:
+        node = node.parent
+        if "property-thumbnail-item" in (node.attributes.get("class") or ""):
+            return node
+    return link.parent or link
+
+
+def parse_thumbnail_summaries(html: str) -> list[ThumbnailSummary]:
+    """Extract the card of every listing of a thumbnail result page (or
+    GetInscriptions HTML), without duplicates."""
+    summaries = {}
+    for link in HTMLParser(html).css("a.property-thumbnail-summary-link"):
+        href = link.attributes.get("href")
+        if not href or not href.startswith("/fr/"):
+            continue
+        url = f"{BASE_URL}{href}"
+        centris_id = parse_centris_id(url)
+        if centris_id is None or centris_id in summaries:
+            continue
+        card = _thumbnail_card(link)
+        price_meta = card.css_first('meta[itemprop="price"]')
+        if price_meta is not None:
+            price_text = price_meta.attributes.get("content") or ""
+        else:
+            price_text = _card_text(card, ".price") or ""
+        price_digits = re.sub(r"\D", "", price_text.split(".")[0])
+        summaries[centris_id] = ThumbnailSummary(
+            centris_id=centris_id,
+            url=url,
+            prix=int(price_digits) if price_digits else None,
+            categorie=_card_text(card, ".category"),
+            adresse=_card_text(card, ".address"),
+        )
+    return list(summaries.values())
+
+
+def parse_thumbnail_urls(html: str) -> list[str]:
+    """Extract listing URLs from a thumbnail result page (or GetInscriptions HTML)."""
+    return [summary.url for summary in parse_thumbnail_summaries(html)]
+
+
+START_URL_PLEX = build_search_url("plex", "montreal")
+
 
 class CentrisBienParser:
     """Extract relevant info data from a parsed HTML of a Centris Duplex listing  page."""
@@ -23,6 +133,18 @@ class CentrisBienParser:
     def __init__(self, url) -> None:
         self.url = url
 
+    @classmethod
+    def from_html(cls, url: str, html: str) -> "CentrisBienParser":
+        """Build a parser on an already fetched page, without network access."""
+        centris_parser = cls(url)
+        centris_parser.html = html
+        return centris_parser
+
+    def release(self) -> None:
+        """Drop the page and its parsed tree once the listing has been stored."""
+        for attribute in ("html", "tree", "carac_data"):
+            self.__dict__.pop(attribute, None)
+
     def get_data(self, scrape_date: datetime) -> PlexCentrisListing:
         return PlexCentrisListing(
             url=self.url,
@@ -38,6 +160,7 @@ class CentrisBienParser:
             superficie_terrain=self.superficie_terrain,
             stationnement=self.stationnement,
             utilisation=self.utilisation,
+            style_batiment=self.style_batiment,
             adresse=self.addresse,
             ville=self.ville,
             quartier=self.quartier,
@@ -54,13 +177,9 @@ class CentrisBienParser:
 
     @cached_property
     def html(self):
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
-        }
-        response = requests.get(self.url, headers=headers)
-        if response.status_code != 200:
-            raise Exception(f"Failed to fetch page {self.url}")
-
+        response = limited_request(
+            "GET", get_fetch_url(self.url), headers=LISTING_HEADERS
+        )
         return response.text
 
     @cached_property
@@ -133,8 +252,10 @@ class CentrisBienParser:
     @property
     def revenus(self) -> int | None:
         revenus_text = self.carac_data.get("Revenus bruts potentiels")
-        revenus_brut = int(re.sub(r"[^0-9]", "", revenus_text))
-        return revenus_brut
+        if revenus_text is None:
+            return None
+        value = re.sub(r"[^0-9]", "", revenus_text)
+        return int(value) if value else None
 
     @property
     def description(self) -> str | None:
@@ -314,8 +435,14 @@ class CentrisBienParser:
 class CentrisScraper:
     """Navigate all Centris listings for plexes and extract HTML"""
 
-    def __init__(self, start_url: str = START_URL_PLEX):
+    def __init__(
+        self,
+        start_url: str = START_URL_PLEX,
+        throttle: Callable[[str], None] | None = None,
+    ):
         self.start_url = start_url
+        # Called with the target URL before each navigation, to share a politeness budget
+        self.throttle = throttle or (lambda url: None)
 
     def scrape_urls(self, num_pages: int = 5, headless: bool = True) -> list[str]:
         """
@@ -326,9 +453,30 @@ class CentrisScraper:
             headless: Whether to run browser in headless mode
 
         Returns:
-            List of fetched URLs
+            List of fetched URLs, without duplicates
+        """
+        return [
+            summary.url
+            for summary in self.scrape_summaries(num_pages=num_pages, headless=headless)
+        ]
+
+    def scrape_summaries(
+        self, num_pages: int = 5, headless: bool = True
+    ) -> list[ThumbnailSummary]:
         """
-        fetched_urls = []
+        Navigate through Centris thumbnail pages and collect the listing cards.
+
+        Args:
+            num_pages: Number of pages to scrape
+            headless: Whether to run browser in headless mode
+
+        Returns:
+            List of card summaries (ID, URL, price, category, address), without duplicates
+        """
+        # Imported here so parse-only jobs do not pay for Playwright
+        from playwright.sync_api import sync_playwright
+
+        summaries = {}
 
         with sync_playwright() as playwright:
             try:
@@ -355,7 +503,9 @@ class CentrisScraper:
                     }
                 )
 
-                page.goto(self.start_url)
+                start_url = get_fetch_url(self.start_url)
+                self.throttle(start_url)
+                page.goto(start_url)
                 self.handle_cookies(page)
                 self.sort_listings(page)
 
@@ -366,16 +516,10 @@ class CentrisScraper:
                     page.wait_for_selector("a.property-thumbnail-summary-link")
                     page.wait_for_timeout(2000)  # Extra safety wait
 
-                    # Get all summary links directly
-                    summary_links = page.query_selector_all(
-                        "a.property-thumbnail-summary-link"
-                    )
-
-                    for link in summary_links:
-                        href = link.get_attribute("href")
-                        if href and href.startswith("/fr/"):
-                            full_url = f"https://www.centris.ca{href}"
-                            fetched_urls.append(full_url)
+                    # Read every card of the page at once
+                    result_html = page.inner_html("div#property-result")
+                    for summary in parse_thumbnail_summaries(result_html):
+                        summaries.setdefault(summary.centris_id, summary)
 
                     # Load next batch of listings
                     try:
@@ -384,6 +528,7 @@ class CentrisScraper:
                             logger.info("No more listings to load.")
                             break
 
+                        self.throttle(start_url)
                         next_button.click()
 
                         # Wait for loading indicator or some element that indicates page transition
@@ -399,14 +544,14 @@ class CentrisScraper:
 
             except Exception as e:
                 logger.error(f"Critical error in navigation: {e}")
-                fetched_urls = []
+                summaries = {}
 
             finally:
                 # Ensure browser closes even if an exception occurs
                 if "browser" in locals():
                     browser.close()
 
-        return fetched_urls
+        return list(summaries.values())
 
     def sort_listings(self, page):
         try:
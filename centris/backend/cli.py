@@ -0,0 +1,807 @@
+import argparse
+import asyncio
+import itertools
+import multiprocessing
+import sys
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from loguru import logger
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from tqdm import tqdm
+
+from centris import Session, configure_sqlite
+from centris.backend.backfill import BACKFILL_FIELDS, backfill
+from centris.backend.centris_scraper import (
+    BASE_URL,
+    PLEX_PROPERTY_TYPES,
+    SEARCH_PROPERTY_TYPES,
+    SEARCH_REGIONS,
+    build_seed_urls,
+)
+from centris.backend.db_models import PlexCentrisListingDB, SavedSearchDB
+from centris.backend.frontier import PolitenessBudget
+from centris.backend.main import (
+    iter_urls_from_lines,
+    iter_urls_from_path,
+    iter_urls_from_web,
+    scrape_and_save,
+)
+from centris.backend.queries import listings_query, unit_mix_stats_query
+from centris.backend.record_log import (
+    DEFAULT_RECORD_LOG_DIR,
+    RecordLog,
+    iter_records,
+    list_segments,
+    read_index,
+    replay_to_database,
+    replay_to_parquet,
+)
+from centris.backend.saved_searches import CRITERIA, SearchMatcher, pending_matches
+from centris.backend.sketches import (
+    SKETCH_METRICS,
+    SketchAccumulator,
+    load_sketches,
+    rebuild_sketches,
+)
+from centris.backend.snapshots import DEFAULT_SNAPSHOT_PATH, SnapshotStore
+from centris.backend.utils import MemoryGuard, get_default_date
+from centris.backend.work_queue import enqueue, queue_counts, run_worker
+
+if TYPE_CHECKING:
+    from centris.backend.known_ids import KnownIds
+
+
+def add_source_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--source",
+        choices=["web", "file", "stdin"],
+        default="web",
+        help="Where listing URLs come from (default: crawl centris.ca)",
+    )
+    parser.add_argument("--file", help="File with one URL per line (--source file)")
+    parser.add_argument("--pages", type=int, default=2, help="Result pages per search")
+    parser.add_argument(
+        "--property-types",
+        nargs="+",
+        choices=PLEX_PROPERTY_TYPES,
+        default=SEARCH_PROPERTY_TYPES,
+        metavar="TYPE",
+        help="Plex types to search (default: %(default)s, every plex)",
+    )
+    parser.add_argument("--regions", nargs="+", default=SEARCH_REGIONS)
+    parser.add_argument(
+        "--use-api",
+        action="store_true",
+        help="Collect URLs from the GetInscriptions endpoint instead of a browser",
+    )
+    parser.add_argument("--no-headless", dest="headless", action="store_false")
+
+
+def iter_source_urls(
+    args: argparse.Namespace,
+    scrape_date: datetime,
+    existing_ids: "set[int] | KnownIds",
+    budget: PolitenessBudget,
+    session=None,
+    refresh_ids: set[int] | None = None,
+) -> Iterator[str]:
+    if args.source == "web":
+        return iter_urls_from_web(
+            scrape_date,
+            seeds=build_seed_urls(args.property_types, args.regions),
+            existing_ids=existing_ids,
+            budget=budget,
+            use_api=args.use_api,
+            session=session,
+            refresh_ids=refresh_ids,
+            num_pages=args.pages,
+            headless=args.headless,
+        )
+    if args.source == "file":
+        if not args.file:
+            raise SystemExit("--file is required with --source file")
+        return iter_urls_from_path(args.file)
+    return iter_urls_from_lines(sys.stdin)
+
+
+def add_record_log_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--record-log",
+        default=DEFAULT_RECORD_LOG_DIR,
+        help="Where to log the parsed records, replayable (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-record-log", dest="record_log", action="store_const", const=None
+    )
+
+
+def add_ingest_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "ingest", help="Scrape listings and store them, streaming URLs one by one"
+    )
+    add_source_arguments(parser)
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent fetches")
+    parser.add_argument(
+        "--commit-every",
+        type=int,
+        default=25,
+        help="Listings written per transaction (per batch with --async)",
+    )
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        help="Stop cleanly when the resident memory goes above this cap",
+    )
+    parser.add_argument(
+        "--snapshots",
+        default=DEFAULT_SNAPSHOT_PATH,
+        help="Where to archive compact page snapshots (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-snapshots", dest="snapshots", action="store_const", const=None
+    )
+    parser.add_argument(
+        "--no-sketches",
+        dest="sketches",
+        action="store_false",
+        help="Do not update the quantile sketches read by the dashboards",
+    )
+    add_record_log_arguments(parser)
+    parser.add_argument(
+        "--no-fair-price",
+        dest="fair_price",
+        action="store_false",
+        help="Do not score the new listings with the fair price model",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Fetch with httpx and write batches on the async engine",
+    )
+    parser.set_defaults(func=run_ingest)
+
+
+def run_ingest(args: argparse.Namespace) -> None:
+    scrape_date = datetime.now()
+    budget = PolitenessBudget(max_concurrency=args.workers)
+    memory_guard = MemoryGuard(args.max_memory_mb) if args.max_memory_mb else None
+    snapshot_store = SnapshotStore(args.snapshots) if args.snapshots else None
+    sketches = SketchAccumulator(Session) if args.sketches else None
+    record_log = RecordLog(args.record_log) if args.record_log else None
+
+    from centris.backend.known_ids import KnownIds
+
+    try:
+        with Session() as session:
+            existing_ids = KnownIds.load(session)
+            matcher = SearchMatcher.from_session(session)
+            # Filled by the crawl with the stored listings whose thumbnail card changed
+            refresh_ids: set[int] = set()
+            urls = iter_source_urls(
+                args, scrape_date, existing_ids, budget, session, refresh_ids
+            )
+
+            if args.use_async:
+                from centris.backend.async_pipeline import scrape_and_save_async
+
+                stored = asyncio.run(
+                    scrape_and_save_async(
+                        urls,
+                        scrape_date,
+                        existing_ids,
+                        concurrency=args.workers,
+                        batch_size=args.commit_every,
+                        memory_guard=memory_guard,
+                        snapshot_store=snapshot_store,
+                        sketches=sketches,
+                        matcher=matcher,
+                        refresh_ids=refresh_ids,
+                        record_log=record_log,
+                    )
+                )
+            else:
+                stored = scrape_and_save(
+                    urls,
+                    scrape_date,
+                    existing_ids,
+                    session,
+                    budget,
+                    max_workers=args.workers,
+                    memory_guard=memory_guard,
+                    snapshot_store=snapshot_store,
+                    sketches=sketches,
+                    matcher=matcher,
+                    refresh_ids=refresh_ids,
+                    commit_every=args.commit_every,
+                    record_log=record_log,
+                )
+            # The stored listings of this run, so the next one skips the rebuild
+            existing_ids.save()
+    finally:
+        # A failed run still flushes its records and closes the segment
+        if snapshot_store is not None:
+            snapshot_store.close()
+        if record_log is not None:
+            record_log.close()
+
+    if sketches is not None:
+        sketches.flush()
+    if args.fair_price:
+        score_new_listings()
+    logger.info(
+        f"Ingest done: {stored} new listings, {matcher.matched} saved search matches"
+    )
+
+
+def score_new_listings() -> None:
+    from centris.backend.pricing import fair_price_model, score_listings
+
+    with Session() as session:
+        score_listings(session, fair_price_model(session))
+
+
+def add_backfill_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "backfill", help="Reparse archived snapshots and update changed columns"
+    )
+    parser.add_argument(
+        "--fields", nargs="+", required=True, choices=BACKFILL_FIELDS, metavar="FIELD"
+    )
+    parser.add_argument("--snapshots", default=DEFAULT_SNAPSHOT_PATH)
+    parser.add_argument("--workers", type=int, help="Processes (default: all cores)")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="Report changes without writing"
+    )
+    parser.set_defaults(func=run_backfill)
+
+
+def run_backfill(args: argparse.Namespace) -> None:
+    with SnapshotStore(args.snapshots) as snapshot_store, Session() as session:
+        backfill(
+            args.fields,
+            snapshot_store,
+            session,
+            workers=args.workers,
+            dry_run=args.dry_run,
+        )
+
+
+def add_comps_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "comps", help="Show the listings most comparable to a given one"
+    )
+    parser.add_argument("centris_id", type=int)
+    parser.add_argument("-k", type=int, default=10, help="Number of comparables")
+    parser.set_defaults(func=run_comps)
+
+
+def run_comps(args: argparse.Namespace) -> None:
+    from centris.backend.comps import CompsIndex
+
+    with Session() as session:
+        index = CompsIndex.from_session(session)
+        comps = index.query_id(args.centris_id, k=args.k)
+        listings = {
+            listing.centris_id: listing
+            for listing in session.scalars(
+                select(PlexCentrisListingDB).where(
+                    PlexCentrisListingDB.centris_id.in_([c for c, _ in comps])
+                )
+            )
+        }
+        for centris_id, distance in comps:
+            listing = listings[centris_id]
+            print(
+                f"{distance:6.2f}  {listing.prix:>10,}  {listing.quartier}  {listing.url}"
+            )
+
+
+def add_unit_mix_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "unit-mix", help="Listings and prices per quartier for a unit size"
+    )
+    parser.add_argument("pieces", type=float, help="Unit size, e.g. 4.5 for a 4 ½")
+    parser.add_argument("--include-inactive", action="store_true")
+    parser.set_defaults(func=run_unit_mix)
+
+
+def run_unit_mix(args: argparse.Namespace) -> None:
+    query = unit_mix_stats_query(args.pieces, include_inactive=args.include_inactive)
+    with Session() as session:
+        rows = session.execute(query).all()
+    print(
+        f"{'quartier':<45}{'listings':>9}{'units':>7}{'avg prix':>12}{'prix/unit':>12}"
+    )
+    for quartier, listings, units, avg_prix, avg_prix_par_unite in rows:
+        print(
+            f"{quartier or '?':<45}{listings:>9}{units:>7}"
+            f"{avg_prix or 0:>12,.0f}{avg_prix_par_unite or 0:>12,.0f}"
+        )
+
+
+def add_geocode_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "geocode", help="Store listing coordinates from a local address gazetteer"
+    )
+    parser.add_argument("gazetteer", help="CSV or Parquet of address points")
+    parser.add_argument(
+        "--online",
+        action="store_true",
+        help="Send the addresses missing from the gazetteer to Nominatim (1/s)",
+    )
+    parser.add_argument(
+        "--all",
+        dest="include_geocoded",
+        action="store_true",
+        help="Also redo the listings that already have coordinates",
+    )
+    parser.add_argument(
+        "--max-number-gap",
+        type=int,
+        default=40,
+        help="Farthest civic number accepted on the same street",
+    )
+    parser.set_defaults(func=run_geocode)
+
+
+def run_geocode(args: argparse.Namespace) -> None:
+    from centris.backend.geocoding import (
+        Gazetteer,
+        geocode_listings,
+        nominatim_geocoder,
+    )
+
+    gazetteer = Gazetteer.load(args.gazetteer, max_number_gap=args.max_number_gap)
+    online = nominatim_geocoder() if args.online else None
+    with Session() as session:
+        geocode_listings(
+            session, gazetteer, online, include_geocoded=args.include_geocoded
+        )
+
+
+def add_fair_price_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "fair-price",
+        help="Update the fair price model, score the listings and show the cheapest",
+    )
+    parser.add_argument(
+        "--model", help="Model cache (default: artifacts/fair_price.npz)"
+    )
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Retrain on every listing"
+    )
+    parser.add_argument(
+        "--rescore",
+        action="store_true",
+        help="Score every listing again, not only the unscored ones",
+    )
+    parser.add_argument(
+        "--alpha", type=float, help="Ridge penalty, retrains when changed"
+    )
+    parser.add_argument("--top", type=int, default=20, help="Listings shown")
+    parser.set_defaults(func=run_fair_price)
+
+
+def run_fair_price(args: argparse.Namespace) -> None:
+    from centris.backend.pricing import (
+        DEFAULT_MODEL_PATH,
+        fair_price_model,
+        score_listings,
+    )
+
+    with Session() as session:
+        model = fair_price_model(
+            session,
+            args.model or DEFAULT_MODEL_PATH,
+            rebuild=args.rebuild,
+            alpha=args.alpha,
+        )
+        score_listings(session, model, rescore=args.rescore or args.rebuild)
+        listings = session.scalars(
+            listings_query()
+            .where(PlexCentrisListingDB.diff_prix_modele.is_not(None))
+            .order_by(PlexCentrisListingDB.diff_prix_modele)
+            .limit(args.top)
+        ).all()
+
+    print(f"{'vs modèle':>9}{'prix':>12}{'modèle':>12}  quartier / url")
+    for listing in listings:
+        print(
+            f"{listing.diff_prix_modele:>8.1f}%{listing.prix:>12,}"
+            f"{listing.prix_modele:>12,}  {listing.quartier}  {listing.url}"
+        )
+
+
+def add_sketches_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "sketches", help="Show quartier quantiles from the stored sketches"
+    )
+    parser.add_argument("--metric", choices=SKETCH_METRICS, default="prix")
+    parser.add_argument("--since", help="First month to include, e.g. 2024-06")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Recompute every sketch from the listings table first",
+    )
+    parser.set_defaults(func=run_sketches)
+
+
+def run_sketches(args: argparse.Namespace) -> None:
+    with Session() as session:
+        if args.rebuild:
+            added = rebuild_sketches(session)
+            logger.info(f"Rebuilt sketches from {added} values")
+        sketches = load_sketches(session, [args.metric], since=args.since)
+
+    print(f"{'quartier':<40} {'n':>6} {'p25':>12} {'p50':>12} {'p75':>12}")
+    for (_, quartier), sketch in sorted(
+        sketches.items(), key=lambda item: (item[0][1] is None, item[0][1] or "")
+    ):
+        p25, p50, p75 = sketch.quantiles([0.25, 0.5, 0.75])
+        name = "(tous)" if quartier is None else quartier or "(inconnu)"
+        print(f"{name:<40} {sketch.n:>6} {p25:>12,.1f} {p50:>12,.1f} {p75:>12,.1f}")
+
+
+def add_liveness_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "liveness", help="Check which stored listings are still online"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=64, help="Requests in flight"
+    )
+    parser.add_argument(
+        "--max-rate", type=float, default=200.0, help="Requests per second cap"
+    )
+    parser.add_argument(
+        "--all",
+        dest="include_inactive",
+        action="store_true",
+        help="Also recheck listings already known to be inactive",
+    )
+    parser.add_argument(
+        "--unseen-days",
+        type=int,
+        help="Only check listings not seen for this many days, e.g. 1 after a crawl",
+    )
+    parser.set_defaults(func=run_liveness)
+
+
+def run_liveness(args: argparse.Namespace) -> None:
+    from centris.backend.liveness import sweep
+
+    with Session() as session:
+        sweep(
+            session,
+            concurrency=args.concurrency,
+            max_rate=args.max_rate,
+            include_inactive=args.include_inactive,
+            unseen_days=args.unseen_days,
+        )
+
+
+def add_searches_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "searches", help="Manage saved searches and read their matches"
+    )
+    actions = parser.add_subparsers(required=True)
+
+    add = actions.add_parser("add", help="Save a search, matched at every ingest")
+    add.add_argument("name")
+    add.add_argument("--quartier")
+    add.add_argument("--min-prix", type=int)
+    add.add_argument("--max-prix", type=int)
+    add.add_argument("--min-unites", type=int)
+    add.add_argument("--max-unites", type=int)
+    add.add_argument("--max-payback", type=float, help="Years")
+    add.add_argument("--max-prix-par-unite", type=float)
+    add.set_defaults(func=run_searches_add)
+
+    list_parser = actions.add_parser("list", help="Show the saved searches")
+    list_parser.set_defaults(func=run_searches_list)
+
+    outbox = actions.add_parser("outbox", help="Show the matches not sent yet")
+    outbox.add_argument(
+        "--mark-sent", action="store_true", help="Mark the shown matches as sent"
+    )
+    outbox.set_defaults(func=run_searches_outbox)
+
+
+def run_searches_add(args: argparse.Namespace) -> None:
+    criteria = {
+        column: getattr(args, column)
+        for column in ["quartier", "min_prix", "max_prix", *CRITERIA]
+    }
+    with Session() as session:
+        search = SavedSearchDB(name=args.name, **criteria)
+        session.add(search)
+        session.commit()
+        logger.info(f"Saved search {search.id}: {args.name}")
+
+
+def run_searches_list(args: argparse.Namespace) -> None:
+    with Session() as session:
+        for search in session.scalars(select(SavedSearchDB)):
+            criteria = {
+                column: getattr(search, column)
+                for column in ["quartier", "min_prix", "max_prix", *CRITERIA]
+                if getattr(search, column) is not None
+            }
+            status = "" if search.enabled else " (disabled)"
+            print(f"{search.id:>5}  {search.name}{status}  {criteria}")
+
+
+def run_searches_outbox(args: argparse.Namespace) -> None:
+    with Session() as session:
+        matches = pending_matches(session)
+        for match, search, url in matches:
+            print(f"{match.matched_at}  {search.name}  {url}")
+            if args.mark_sent:
+                match.sent_at = get_default_date()
+        session.commit()
+
+
+def add_queue_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "queue", help="Ingest with several workers sharing a URL queue in the database"
+    )
+    actions = parser.add_subparsers(required=True)
+
+    enqueue_parser = actions.add_parser("enqueue", help="Queue listing URLs")
+    add_source_arguments(enqueue_parser)
+    enqueue_parser.set_defaults(func=run_queue_enqueue)
+
+    work = actions.add_parser("work", help="Claim queued URLs and store the listings")
+    work.add_argument(
+        "--processes", type=int, default=1, help="Worker processes on this machine"
+    )
+    work.add_argument(
+        "--workers", type=int, default=4, help="Concurrent fetches per process"
+    )
+    work.add_argument("--batch-size", type=int, default=20, help="URLs per lease")
+    work.add_argument("--lease-seconds", type=float, default=120)
+    work.add_argument("--max-attempts", type=int, default=3)
+    work.add_argument(
+        "--wait",
+        action="store_true",
+        help="Keep polling for new URLs instead of exiting once the queue is empty",
+    )
+    work.add_argument("--no-sketches", dest="sketches", action="store_false")
+    add_record_log_arguments(work)
+    work.add_argument("--no-fair-price", dest="fair_price", action="store_false")
+    work.set_defaults(func=run_queue_work)
+
+    status = actions.add_parser("status", help="Count queued URLs per status")
+    status.set_defaults(func=run_queue_status)
+
+
+def run_queue_enqueue(args: argparse.Namespace) -> None:
+    from centris.backend.known_ids import KnownIds
+
+    scrape_date = datetime.now()
+    with Session() as session:
+        existing_ids = KnownIds.load(session)
+        urls = iter_source_urls(args, scrape_date, existing_ids, PolitenessBudget())
+        added = enqueue(session, urls)
+    logger.info(f"Queued {added} new URLs")
+
+
+def _queue_worker(args: argparse.Namespace) -> int:
+    sketches = SketchAccumulator(Session) if args.sketches else None
+    record_log = RecordLog(args.record_log) if args.record_log else None
+    with Session() as session:
+        matcher = SearchMatcher.from_session(session)
+    try:
+        stored = run_worker(
+            batch_size=args.batch_size,
+            max_workers=args.workers,
+            lease_seconds=args.lease_seconds,
+            max_attempts=args.max_attempts,
+            stop_when_empty=not args.wait,
+            sketches=sketches,
+            matcher=matcher,
+            record_log=record_log,
+        )
+    finally:
+        if record_log is not None:
+            record_log.close()
+    if sketches is not None:
+        sketches.flush()
+    return stored
+
+
+def run_queue_work(args: argparse.Namespace) -> None:
+    if args.processes == 1:
+        stored = _queue_worker(args)
+    else:
+        # Fresh interpreters, so that no process inherits another's DB connections
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(args.processes, mp_context=context) as executor:
+            stored = sum(executor.map(_queue_worker, [args] * args.processes))
+    if args.fair_price and stored:
+        score_new_listings()
+    logger.info(f"Queue workers stored {stored} listings")
+
+
+def run_queue_status(args: argparse.Namespace) -> None:
+    with Session() as session:
+        for status, count in sorted(queue_counts(session).items()):
+            print(f"{status:<10} {count:>8}")
+
+
+def add_records_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "records", help="List or replay the logged records of past ingests"
+    )
+    actions = parser.add_subparsers(required=True)
+
+    list_parser = actions.add_parser("list", help="Records per segment, from the index")
+    list_parser.add_argument("--dir", default=DEFAULT_RECORD_LOG_DIR)
+    list_parser.set_defaults(func=run_records_list)
+
+    replay = actions.add_parser(
+        "replay", help="Load logged records into a database or a Parquet file"
+    )
+    replay.add_argument("--dir", default=DEFAULT_RECORD_LOG_DIR)
+    replay.add_argument(
+        "--from", dest="first", help="First segment, a name prefix e.g. 2024-12-01"
+    )
+    replay.add_argument("--to", dest="last", help="Last segment, a name prefix")
+    target = replay.add_mutually_exclusive_group()
+    target.add_argument(
+        "--db-url",
+        help="Database to load, migrated with `alembic -x db_url=...` (default: DB_URL)",
+    )
+    target.add_argument("--parquet", help="Write a Parquet file instead")
+    replay.set_defaults(func=run_records_replay)
+
+
+def run_records_list(args: argparse.Namespace) -> None:
+    total = 0
+    for segment in list_segments(args.dir):
+        blocks = read_index(segment)
+        records = sum(block["records"] for block in blocks)
+        total += records
+        size_mb = segment.stat().st_size / 1e6
+        print(
+            f"{segment.name:<45}{records:>9}{len(blocks):>7} blocks{size_mb:>8.1f} MB"
+        )
+    print(f"{'total':<45}{total:>9}")
+
+
+def run_records_replay(args: argparse.Namespace) -> None:
+    segments = list_segments(args.dir, args.first, args.last)
+    if not segments:
+        raise SystemExit(f"No segments in {args.dir} for this range")
+    records = iter_records(tqdm(segments, desc="Replaying segments"))
+    if args.parquet:
+        written = replay_to_parquet(records, args.parquet)
+        logger.info(f"Wrote {written} records to {args.parquet}")
+        return
+
+    if args.db_url:
+        engine = configure_sqlite(create_engine(args.db_url))
+        session_factory = sessionmaker(bind=engine)
+    else:
+        session_factory = Session
+    with session_factory() as session:
+        written = replay_to_database(session, records)
+    logger.info(f"Replayed {written} rows from {len(segments)} segments")
+
+
+def add_profile_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "profile-parser",
+        help="Time each parser field and selector over a corpus of pages",
+    )
+    parser.add_argument(
+        "html",
+        nargs="*",
+        help="Listing pages to parse (default: the archived snapshots)",
+    )
+    parser.add_argument("--snapshots", default=DEFAULT_SNAPSHOT_PATH)
+    parser.add_argument("--limit", type=int, help="Max snapshots to parse")
+    parser.add_argument(
+        "--repeat", type=int, default=1, help="Parse the corpus this many times"
+    )
+    parser.add_argument("--fields", nargs="+", help="Fields to read (default: all)")
+    parser.add_argument("--top", type=int, default=20, help="Rows per table")
+    parser.add_argument("--json", help="Write the report as JSON to this file")
+    parser.add_argument(
+        "--collapsed", help="Write collapsed stacks (flamegraph.pl, speedscope)"
+    )
+    parser.add_argument(
+        "--cprofile", help="Also run the plain parser under cProfile, stats file"
+    )
+    parser.set_defaults(func=run_profile)
+
+
+def iter_profile_pages(args: argparse.Namespace) -> Iterator[tuple[str, str]]:
+    if args.html:
+        for path in args.html:
+            # Only the ID and location of the URL are parsed
+            centris_id = "".join(c for c in Path(path).stem if c.isdigit()) or "0"
+            url = f"{BASE_URL}/fr/plex~a-vendre~inconnu/{centris_id}?view=Summary"
+            yield url, Path(path).read_text()
+        return
+    with SnapshotStore(args.snapshots) as snapshot_store:
+        snapshots = itertools.islice(snapshot_store.iter_latest(), args.limit)
+        for url, _, _, html in snapshots:
+            yield url, html
+
+
+def run_profile(args: argparse.Namespace) -> None:
+    import cProfile
+
+    from centris.backend.profiling import ParserProfiler, parse_pages, profile_pages
+
+    pages = list(iter_profile_pages(args)) * args.repeat
+    profiler = profile_pages(pages, ParserProfiler(), args.fields)
+    print(profiler.report(args.top))
+    if args.json:
+        profiler.write_json(args.json)
+    if args.collapsed:
+        profiler.write_collapsed(args.collapsed)
+    if args.cprofile:
+        cprofile = cProfile.Profile()
+        cprofile.runcall(parse_pages, pages, args.fields)
+        cprofile.dump_stats(args.cprofile)
+        logger.info(f"cProfile stats in {args.cprofile}, read with `python -m pstats`")
+
+
+def add_serve_parser(subparsers) -> None:
+    parser = subparsers.add_parser(
+        "serve", help="Serve the listings over a read-only HTTP API"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--cache-size", type=int, default=512, help="Responses kept in memory"
+    )
+    parser.set_defaults(func=run_serve)
+
+
+def run_serve(args: argparse.Namespace) -> None:
+    from centris.backend.read_api import ListingsAPI, ReadAPIServer
+
+    server = ReadAPIServer(
+        ListingsAPI(cache_size=args.cache_size), args.host, args.port
+    )
+    logger.info(f"Serving listings on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="centris", description="Centris scraping")
+    subparsers = parser.add_subparsers(required=True)
+    add_ingest_parser(subparsers)
+    add_backfill_parser(subparsers)
+    add_comps_parser(subparsers)
+    add_unit_mix_parser(subparsers)
+    add_geocode_parser(subparsers)
+    add_fair_price_parser(subparsers)
+    add_sketches_parser(subparsers)
+    add_liveness_parser(subparsers)
+    add_searches_parser(subparsers)
+    add_queue_parser(subparsers)
+    add_records_parser(subparsers)
+    add_profile_parser(subparsers)
+    add_serve_parser(subparsers)
+    return parser
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
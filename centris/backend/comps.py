@@ -0,0 +1,275 @@
+import warnings
+
+import numpy as np
+from loguru import logger
+from scipy.spatial import cKDTree
+from sqlalchemy import select
+
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import get_data_version
+
+
+# Numeric features compared between listings, coordinates are used once stored
+COMPS_FEATURES = [
+    column
+    for column in [
+        "prix",
+        "nombre_unites",
+        "superficie_terrain",
+        "annee_construction",
+        "revenus",
+        "taxes",
+        "latitude",
+        "longitude",
+    ]
+    if column in PlexCentrisListingDB.__table__.columns
+]
+
+# Money and areas are skewed, they are compared on a log scale
+LOG_FEATURES = {"prix", "superficie_terrain", "revenus", "taxes"}
+
+DEFAULT_WEIGHTS = {
+    "prix": 2.0,
+    "nombre_unites": 1.5,
+    "revenus": 1.5,
+}
+
+
+class CompsIndex:
+    """k-nearest comparable listings over normalized features.
+
+    Features are log-scaled where skewed, centered on the median and divided by
+    the interquartile range, so a unit of distance means about the same thing
+    for each of them. Missing values sit at the median. Listings from another
+    quartier are `quartier_penalty` further away.
+
+    Built listings live in KD-trees, one over everything and one per quartier.
+    Listings added or changed afterwards go to a small buffer scanned by brute
+    force, and everything is rebuilt (and the scaling refitted) once the buffer
+    or the removed entries reach `rebuild_threshold`:
+
+        index = CompsIndex.from_session(session)
+        index.upsert(centris_id, {"prix": 899000, ...}, quartier="Verdun")
+        index.query_id(centris_id, k=10)  # [(centris_id, distance), ...]
+    """
+
+    def __init__(
+        self,
+        features: list[str] | None = None,
+        weights: dict[str, float] | None = None,
+        quartier_penalty: float = 1.0,
+        rebuild_threshold: int = 256,
+    ) -> None:
+        self.features = features or COMPS_FEATURES
+        weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.weights = np.array([weights.get(f, 1.0) for f in self.features])
+        self.quartier_penalty = quartier_penalty
+        self.rebuild_threshold = rebuild_threshold
+
+        self._raw: dict[int, np.ndarray] = {}
+        self._quartiers: dict[int, str | None] = {}
+        self._center = np.zeros(len(self.features))
+        self._scale = np.ones(len(self.features))
+
+        # Built part: row positions in the trees map to `_ids`
+        self._ids = np.empty(0, dtype=np.int64)
+        self._points = np.empty((0, len(self.features)))
+        self._tree: cKDTree | None = None
+        self._quartier_trees: dict[str, tuple[cKDTree, np.ndarray]] = {}
+        self._stale: set[int] = set()
+
+        # Incremental part
+        self._buffer: dict[int, np.ndarray] = {}
+
+        # Listings data version of the last load or sync
+        self.version = 0
+
+    @classmethod
+    def from_session(cls, session, **kwargs) -> "CompsIndex":
+        """Index every listing in the database."""
+        index = cls(**kwargs)
+        index.version = get_data_version(session)
+        columns = [getattr(PlexCentrisListingDB, f) for f in index.features]
+        rows = session.execute(
+            select(
+                PlexCentrisListingDB.centris_id, PlexCentrisListingDB.quartier, *columns
+            )
+        )
+        for centris_id, quartier, *values in rows:
+            index._raw[centris_id] = np.array(values, dtype=float)
+            index._quartiers[centris_id] = quartier
+        index.rebuild()
+        return index
+
+    def sync(self, session) -> int:
+        """Upsert the listings written since the last sync, returns their count.
+
+        Those are the rows stamped after the version of the last load or sync
+        (new, refreshed, backfilled or geocoded) and the ones not stamped yet.
+        Deleted listings are removed.
+        """
+        stored_ids = set(session.scalars(select(PlexCentrisListingDB.centris_id)))
+        for centris_id in set(self._raw) - stored_ids:
+            self.remove(centris_id)
+        version = get_data_version(session)
+        write_version = PlexCentrisListingDB.write_version
+        listings = session.scalars(
+            select(PlexCentrisListingDB).where(
+                (write_version > self.version) | write_version.is_(None)
+            )
+        ).all()
+        for listing in listings:
+            self.upsert_listing(listing)
+        self.version = version
+        return len(listings)
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __contains__(self, centris_id: int) -> bool:
+        return centris_id in self._raw
+
+    def _transform(self, raw: np.ndarray) -> np.ndarray:
+        values = raw.copy()
+        for i, feature in enumerate(self.features):
+            if feature in LOG_FEATURES:
+                values[..., i] = np.log1p(np.clip(values[..., i], 0, None))
+        return values
+
+    def _normalize(self, raw: np.ndarray) -> np.ndarray:
+        points = (self._transform(raw) - self._center) / self._scale
+        return np.nan_to_num(points, nan=0.0) * self.weights
+
+    def rebuild(self) -> None:
+        """Refit the scaling and rebuild the trees from every listing."""
+        self._ids = np.fromiter(self._raw, dtype=np.int64, count=len(self._raw))
+        self._buffer = {}
+        self._stale = set()
+        if not len(self._ids):
+            self._tree = None
+            self._quartier_trees = {}
+            return
+
+        transformed = self._transform(np.vstack([self._raw[i] for i in self._ids]))
+        # Features missing on every listing (e.g. coordinates before geocoding)
+        # are all-NaN, they end up at 0
+        with np.errstate(all="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            center = np.nanmedian(transformed, axis=0)
+            q75, q25 = np.nanpercentile(transformed, [75, 25], axis=0)
+        scale = q75 - q25
+        self._center = np.nan_to_num(center, nan=0.0)
+        self._scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        self._points = (
+            np.nan_to_num((transformed - self._center) / self._scale, nan=0.0)
+            * self.weights
+        )
+
+        self._tree = cKDTree(self._points)
+        quartiers = np.array([self._quartiers[i] for i in self._ids], dtype=object)
+        self._quartier_trees = {}
+        for quartier in set(quartiers) - {None}:
+            positions = np.flatnonzero(quartiers == quartier)
+            self._quartier_trees[quartier] = (
+                cKDTree(self._points[positions]),
+                self._ids[positions],
+            )
+        logger.debug(f"Comps index rebuilt on {len(self._ids)} listings")
+
+    def upsert(
+        self, centris_id: int, values: dict[str, float | None], quartier: str | None
+    ) -> None:
+        """Add or update a listing without rebuilding the trees."""
+        raw = np.array(
+            [np.nan if values.get(f) is None else values[f] for f in self.features],
+            dtype=float,
+        )
+        if centris_id in self._raw and centris_id not in self._buffer:
+            self._stale.add(centris_id)
+        self._raw[centris_id] = raw
+        self._quartiers[centris_id] = quartier
+        self._buffer[centris_id] = self._normalize(raw)
+        self._maybe_rebuild()
+
+    def upsert_listing(self, listing: PlexCentrisListingDB) -> None:
+        self.upsert(
+            listing.centris_id,
+            {f: getattr(listing, f) for f in self.features},
+            listing.quartier,
+        )
+
+    def remove(self, centris_id: int) -> None:
+        if centris_id not in self._raw:
+            return
+        del self._raw[centris_id]
+        del self._quartiers[centris_id]
+        if self._buffer.pop(centris_id, None) is None:
+            self._stale.add(centris_id)
+        self._maybe_rebuild()
+
+    def _maybe_rebuild(self) -> None:
+        if max(len(self._buffer), len(self._stale)) >= self.rebuild_threshold:
+            self.rebuild()
+
+    def query(
+        self,
+        values: dict[str, float | None],
+        quartier: str | None,
+        k: int = 10,
+        exclude: set[int] | None = None,
+    ) -> list[tuple[int, float]]:
+        """Return the `k` closest listings as (centris_id, distance), closest first."""
+        raw = np.array(
+            [np.nan if values.get(f) is None else values[f] for f in self.features],
+            dtype=float,
+        )
+        return self._query_point(self._normalize(raw), quartier, k, exclude or set())
+
+    def query_id(self, centris_id: int, k: int = 10) -> list[tuple[int, float]]:
+        """Comparables of an indexed listing, itself excluded."""
+        if centris_id not in self._raw:
+            raise KeyError(f"Listing {centris_id} is not indexed")
+        return self._query_point(
+            self._normalize(self._raw[centris_id]),
+            self._quartiers[centris_id],
+            k,
+            {centris_id},
+        )
+
+    def _query_point(
+        self, point: np.ndarray, quartier: str | None, k: int, exclude: set[int]
+    ) -> list[tuple[int, float]]:
+        # Tree rows of updated or removed listings are out of date
+        skipped = exclude | self._stale | set(self._buffer)
+        candidates: dict[int, float] = {}
+
+        def add(centris_id: int, distance: float) -> None:
+            if self._quartiers[centris_id] != quartier or quartier is None:
+                distance += self.quartier_penalty
+            candidates[centris_id] = min(distance, candidates.get(centris_id, np.inf))
+
+        # With a constant penalty, the k best are among the k closest overall
+        # and the k closest in the same quartier, once skipped entries are ignored
+        fetch = k + len(exclude) + len(self._stale)
+        trees = []
+        if self._tree is not None:
+            trees.append((self._tree, self._ids))
+        if quartier in self._quartier_trees:
+            trees.append(self._quartier_trees[quartier])
+        for tree, ids in trees:
+            distances, positions = tree.query(point, k=min(fetch, tree.n))
+            for distance, position in zip(
+                np.atleast_1d(distances), np.atleast_1d(positions)
+            ):
+                if int(ids[position]) not in skipped:
+                    add(int(ids[position]), float(distance))
+
+        if self._buffer:
+            buffered_ids = list(self._buffer)
+            buffered = np.vstack([self._buffer[i] for i in buffered_ids])
+            distances = np.linalg.norm(buffered - point, axis=1)
+            for centris_id, distance in zip(buffered_ids, distances):
+                if centris_id not in exclude:
+                    add(centris_id, float(distance))
+
+        return sorted(candidates.items(), key=lambda item: item[1])[:k]
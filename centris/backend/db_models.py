@@ -1,4 +1,5 @@
-from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
+from sqlalchemy import JSON, Computed, ForeignKey, Index, UniqueConstraint, true
+from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 from centris.backend.utils import get_default_date
 from typing import Optional
 
@@ -7,8 +8,6 @@ class Base(DeclarativeBase):
     pass
 
 
-# TODO - Add "active" field to track if listing is still active
-# Propably requires calling the URL and checking if there is a redirect to the summary page
 # Annoying: publication_date cannot be scraped from the HTML
 class PlexCentrisListingDB(Base):
     __tablename__ = "plex_centris_listings"
@@ -38,3 +37,172 @@ class PlexCentrisListingDB(Base):
     revenus: Mapped[Optional[int]]
     taxes: Mapped[Optional[int]]
     eval_municipale: Mapped[Optional[int]]
+
+    # liveness, updated by centris.backend.liveness
+    active: Mapped[bool] = mapped_column(default=True, server_default=true())
+    last_seen: Mapped[Optional[str]] = mapped_column(default=get_default_date)
+
+    # coordinates, filled by centris.backend.geocoding
+    latitude: Mapped[Optional[float]]
+    longitude: Mapped[Optional[float]]
+
+    # expected price, filled by centris.backend.pricing
+    prix_modele: Mapped[Optional[int]]
+
+    # listings data version of the last write to the row (NULL until stamped),
+    # see centris.backend.queries.stamp_listings
+    write_version: Mapped[Optional[int]]
+
+    # derived financial metrics, computed by the database on every write
+    # (NULL instead of inf/NaN when a divisor is missing or zero)
+    prix_pi2_terrain: Mapped[Optional[float]] = mapped_column(
+        Computed("prix * 1.0 / NULLIF(superficie_terrain, 0)")
+    )
+    annees_payback: Mapped[Optional[float]] = mapped_column(
+        Computed("CASE WHEN revenus > taxes THEN prix * 1.0 / (revenus - taxes) END")
+    )
+    ratio_revenus_prix: Mapped[Optional[float]] = mapped_column(
+        Computed("revenus * 100.0 / NULLIF(prix, 0)")
+    )
+    diff_prix_eval: Mapped[Optional[float]] = mapped_column(
+        Computed("(prix - eval_municipale) * 100.0 / NULLIF(eval_municipale, 0)")
+    )
+    prix_par_unite: Mapped[Optional[float]] = mapped_column(
+        Computed("prix * 1.0 / NULLIF(nombre_unites, 0)")
+    )
+    multiplicateur_revenus: Mapped[Optional[float]] = mapped_column(
+        Computed("prix * 1.0 / NULLIF(revenus, 0)")
+    )
+    diff_prix_modele: Mapped[Optional[float]] = mapped_column(
+        Computed("(prix - prix_modele) * 100.0 / NULLIF(prix_modele, 0)")
+    )
+
+    # one row per unit size, e.g. "2 x 5 ½" -> (5.5, 2)
+    unit_mix: Mapped[list["PlexUnitMixDB"]] = relationship(
+        cascade="all, delete-orphan", passive_deletes=True, lazy="raise"
+    )
+
+    __table_args__ = (
+        Index("ix_listings_quartier_payback", "quartier", "annees_payback"),
+        Index("ix_listings_quartier_prix_par_unite", "quartier", "prix_par_unite"),
+        Index("ix_listings_diff_prix_eval", "diff_prix_eval"),
+        Index("ix_listings_diff_prix_modele", "diff_prix_modele"),
+        Index("ix_listings_active_quartier", "active", "quartier"),
+        Index("ix_listings_write_version", "write_version"),
+    )
+
+
+# Listing columns a parse of the listing page does not fill, written by liveness,
+# geocoding, pricing and `stamp_listings` instead
+NON_PARSER_COLUMNS = frozenset(
+    {"active", "last_seen", "latitude", "longitude", "prix_modele", "write_version"}
+)
+
+
+class PlexUnitMixDB(Base):
+    """Number of units of each size in a listing, derived from `unites` at ingest"""
+
+    __tablename__ = "plex_unit_mix"
+
+    centris_id: Mapped[int] = mapped_column(
+        ForeignKey("plex_centris_listings.centris_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    pieces: Mapped[float] = mapped_column(primary_key=True)  # 5.5 for a 5 ½
+    count: Mapped[int]
+
+    __table_args__ = (Index("ix_unit_mix_pieces_count", "pieces", "count"),)
+
+
+class ListingSummaryDB(Base):
+    """Thumbnail card of a listing as last seen on a result page, see centris.backend.summaries"""
+
+    __tablename__ = "listing_summaries"
+
+    centris_id: Mapped[int] = mapped_column(primary_key=True)
+    url: Mapped[str]
+    prix: Mapped[Optional[int]]
+    categorie: Mapped[Optional[str]]
+    adresse: Mapped[Optional[str]]
+    first_seen: Mapped[str] = mapped_column(default=get_default_date)
+    last_seen: Mapped[str] = mapped_column(default=get_default_date, index=True)
+    changed_on: Mapped[Optional[str]]  # last day the card differed from the day before
+
+
+class QuantileSketchDB(Base):
+    """Serialized KLL sketch of a listing metric, see centris.backend.sketches"""
+
+    __tablename__ = "quantile_sketches"
+
+    metric: Mapped[str] = mapped_column(primary_key=True)
+    quartier: Mapped[str] = mapped_column(primary_key=True)
+    bucket: Mapped[str] = mapped_column(primary_key=True)  # month, e.g. 2024-12
+    n: Mapped[int] = mapped_column(default=0)
+    sketch: Mapped[dict] = mapped_column(JSON)
+
+
+class SavedSearchDB(Base):
+    """Alert criteria, matched against each new listing at ingest.
+
+    Every criterion is optional, e.g. triplex in Verdun under 900k with payback
+    under 18 years: quartier="Verdun", min_unites=3, max_unites=3,
+    max_prix=900000, max_payback=18.
+    """
+
+    __tablename__ = "saved_searches"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str]
+    enabled: Mapped[bool] = mapped_column(default=True, server_default=true())
+    quartier: Mapped[Optional[str]]
+    min_prix: Mapped[Optional[int]]
+    max_prix: Mapped[Optional[int]]
+    min_unites: Mapped[Optional[int]]
+    max_unites: Mapped[Optional[int]]
+    max_payback: Mapped[Optional[float]]
+    max_prix_par_unite: Mapped[Optional[float]]
+
+
+class SearchMatchDB(Base):
+    """Outbox of listings matching a saved search, `sent_at` is set once notified"""
+
+    __tablename__ = "search_matches"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    search_id: Mapped[int] = mapped_column(ForeignKey("saved_searches.id"))
+    centris_id: Mapped[int]
+    matched_at: Mapped[str] = mapped_column(default=get_default_date)
+    sent_at: Mapped[Optional[str]] = mapped_column(index=True)
+
+    __table_args__ = (UniqueConstraint("search_id", "centris_id"),)
+
+
+class UrlQueueDB(Base):
+    """Listing URLs to ingest, claimed in leases by workers, see centris.backend.work_queue"""
+
+    __tablename__ = "url_queue"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    centris_id: Mapped[int] = mapped_column(unique=True)
+    url: Mapped[str]
+    status: Mapped[str] = mapped_column(default="pending")
+    attempts: Mapped[int] = mapped_column(default=0)
+    lease_owner: Mapped[Optional[str]]
+    lease_expires_at: Mapped[Optional[float]]  # epoch seconds
+    enqueued_at: Mapped[str] = mapped_column(default=get_default_date)
+    last_error: Mapped[Optional[str]]
+
+    __table_args__ = (Index("ix_url_queue_status_lease", "status", "lease_expires_at"),)
+
+
+class DataVersionDB(Base):
+    """Counter moved forward by every write to a dataset, e.g. "listings".
+
+    Readers compare it to the version they cached, see centris.backend.read_api
+    """
+
+    __tablename__ = "data_version"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(default=0)
+    updated_at: Mapped[Optional[str]]
@@ -0,0 +1,185 @@
+import heapq
+import itertools
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+from centris.backend.centris_scraper import (
+    CentrisBienParser,
+    CentrisScraper,
+    ThumbnailSummary,
+    parse_centris_id,
+)
+from fetching.rate_limiter import get_limiter
+
+if TYPE_CHECKING:
+    from centris.backend.known_ids import KnownIds
+
+
+class PolitenessBudget:
+    """Global budget shared by every fetch of a run.
+
+    Caps the number of requests in flight, whatever seed search or listing they
+    belong to. The pace per host is set by the shared adaptive limiter of that host.
+    """
+
+    def __init__(self, max_concurrency: int = 4) -> None:
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def wait_turn(self, url: str) -> None:
+        """Block until the host of `url` may be hit again."""
+        get_limiter(url).acquire()
+
+    @contextmanager
+    def slot(self, url: str):
+        """Hold one of the concurrent slots for the duration of a request.
+
+        The request itself takes its token from the host limiter (`limited_request`).
+        """
+        with self._semaphore:
+            yield
+
+
+class CrawlFrontier:
+    """Deduplicated priority queue of listing URLs collected from many seed searches.
+
+    The same listing shows up under several searches (e.g. `plex` and `triplex`), so
+    URLs are deduplicated on their Centris ID. Unseen listings are served before the
+    ones already stored; ties keep discovery order, which follows the "Publication
+    récente" sort of each search, so fresh listings come first. The thumbnail
+    card of each listing is kept in `summaries` when the crawl provides it.
+
+    `known_ids` is a set or a `KnownIds`, checked once per batch of added URLs;
+    the stored listings met are kept in `known_seen`.
+    """
+
+    UNSEEN = 0
+    KNOWN = 1
+
+    def __init__(self, known_ids: "set[int] | KnownIds | None" = None) -> None:
+        self.known_ids = known_ids if known_ids is not None else set()
+        self.known_seen: set[int] = set()
+        self._heap: list[tuple[int, int, str]] = []
+        self._seen_ids: set[int] = set()
+        self.summaries: dict[int, ThumbnailSummary] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, url: str) -> bool:
+        """Queue `url`, returns False if the listing is already in the frontier."""
+        return bool(self.add_many([url]))
+
+    def add_many(self, urls: Iterable[str]) -> int:
+        """Queue URLs, returns how many were not in the frontier yet."""
+        from centris.backend.known_ids import known_among
+
+        ids = {}
+        for url in urls:
+            centris_id = parse_centris_id(url)
+            if centris_id is None:
+                logger.warning(f"Ignoring URL without Centris ID: {url}")
+                continue
+            ids.setdefault(centris_id, url)
+        with self._lock:
+            ids = {i: url for i, url in ids.items() if i not in self._seen_ids}
+        known = known_among(self.known_ids, ids)
+
+        added = 0
+        with self._lock:
+            self.known_seen |= known
+            for centris_id, url in ids.items():
+                if centris_id in self._seen_ids:
+                    continue
+                self._seen_ids.add(centris_id)
+                priority = self.KNOWN if centris_id in known else self.UNSEEN
+                heapq.heappush(self._heap, (priority, next(self._counter), url))
+                added += 1
+        return added
+
+    def add_summaries(self, summaries: Iterable[ThumbnailSummary]) -> int:
+        summaries = list(summaries)
+        with self._lock:
+            for summary in summaries:
+                self.summaries.setdefault(summary.centris_id, summary)
+        return self.add_many(summary.url for summary in summaries)
+
+    def pop(self) -> str | None:
+        with self._lock:
+            if not self._heap:
+                return None
+            return heapq.heappop(self._heap)[2]
+
+    def drain(self) -> Iterator[str]:
+        while (url := self.pop()) is not None:
+            yield url
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+def crawl_seeds(
+    seeds: Iterable[str],
+    frontier: CrawlFrontier,
+    budget: PolitenessBudget,
+    num_pages: int = 5,
+    headless: bool = True,
+) -> CrawlFrontier:
+    """Run one thumbnail crawl per seed search concurrently and feed the frontier.
+
+    Every page navigation goes through `budget`, so adding seeds increases the
+    parallelism up to `budget.max_concurrency` instead of the wall time.
+    """
+
+    def crawl_seed(seed: str) -> tuple[str, list[ThumbnailSummary]]:
+        scraper = CentrisScraper(seed, throttle=budget.wait_turn)
+        return seed, scraper.scrape_summaries(num_pages=num_pages, headless=headless)
+
+    with ThreadPoolExecutor(max_workers=budget.max_concurrency) as executor:
+        futures = [executor.submit(crawl_seed, seed) for seed in seeds]
+        for future in as_completed(futures):
+            seed, summaries = future.result()
+            added = frontier.add_summaries(summaries)
+            logger.info(
+                f"{seed}: {len(summaries)} URLs fetched, {added} new in frontier"
+            )
+
+    return frontier
+
+
+def fetch_listings(
+    urls: Iterable[str], budget: PolitenessBudget, max_workers: int = 1
+) -> Iterator[CentrisBienParser]:
+    """Fetch listing pages concurrently and yield parsers with their HTML loaded.
+
+    At most `2 * max_workers` pages are in flight, so the HTML held in memory does
+    not grow with the number of URLs. Parsers are yielded in completion order.
+    """
+
+    def fetch(url: str) -> CentrisBienParser | None:
+        centris_parser = CentrisBienParser(url)
+        try:
+            with budget.slot(url):
+                centris_parser.html
+        except Exception as e:
+            logger.error(f"Error fetching {url}: {e}")
+            return None
+        return centris_parser
+
+    url_iter = iter(urls)
+    window = 2 * max_workers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {
+            executor.submit(fetch, url) for url in itertools.islice(url_iter, window)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for url in itertools.islice(url_iter, len(done)):
+                pending.add(executor.submit(fetch, url))
+            for future in done:
+                if (centris_parser := future.result()) is not None:
+                    yield centris_parser
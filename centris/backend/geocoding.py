@@ -0,0 +1,420 @@
+"""Offline geocoding of listing addresses against a local address-point gazetteer.
+
+The gazetteer is a CSV or Parquet export of civic address points, e.g. the
+"Adresses ponctuelles" of the Montreal open data portal or Adresses Québec.
+Street names are normalized (case, accents, abbreviations, link words) and
+mapped to integer IDs. The points are sorted on (street ID, civic number), so
+a batch of addresses is matched with one `np.searchsorted`:
+
+    gazetteer = Gazetteer.load("data/adresses.csv")
+    latitude, longitude, quality = gazetteer.geocode(["5405, Rue St-Dominique"])
+
+Each address is matched at the first of these levels that succeeds:
+- `exact`: same street and civic number.
+- `nearest`: same street, the closest civic number within `max_number_gap`.
+- `fuzzy`: the same two levels, on the closest street name. Candidates share
+  the most character trigrams with the name and are ranked with difflib.
+Anything else is a miss, with NaN coordinates and an empty quality. Only the
+misses need an online geocoder, see `geocode_listings`.
+"""
+
+import csv
+import difflib
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import select, update
+
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import stamp_listings
+
+
+# Accepted column names of a gazetteer, first match wins
+GAZETTEER_COLUMNS = {
+    "number": ["number", "numero", "civique", "addr_de", "no_civique"],
+    "number_to": ["number_to", "addr_a"],
+    "street": ["street", "rue", "odonyme", "nom_rue"],
+    "generic": ["generique", "type_voie"],
+    "link": ["lien"],
+    "specific": ["specifique", "nom_voie"],
+    "direction": ["direction", "orientation"],
+    "latitude": ["latitude", "lat"],
+    "longitude": ["longitude", "lon", "lng"],
+}
+
+# Abbreviations of street types, saints and directions
+ABBREVIATIONS = {
+    "av": "avenue",
+    "ave": "avenue",
+    "boul": "boulevard",
+    "bd": "boulevard",
+    "blvd": "boulevard",
+    "ch": "chemin",
+    "mtee": "montee",
+    "pl": "place",
+    "prom": "promenade",
+    "rte": "route",
+    "terr": "terrasse",
+    "st": "saint",
+    "ste": "sainte",
+    "e": "est",
+    "o": "ouest",
+    "w": "ouest",
+    "west": "ouest",
+    "east": "est",
+    "n": "nord",
+}
+STREET_TYPES = {
+    "rue",
+    "avenue",
+    "boulevard",
+    "chemin",
+    "montee",
+    "place",
+    "promenade",
+    "route",
+    "terrasse",
+    "croissant",
+    "cote",
+    "square",
+    "ruelle",
+    "allee",
+}
+LINK_WORDS = {"de", "du", "des", "la", "le", "les", "l", "d"}
+
+_NUMBER_SHIFT = 20  # civic numbers are below 2**20 in the packed keys
+
+# Coordinates found online per commit, Nominatim answers once per second
+ONLINE_BATCH_SIZE = 50
+
+
+def normalize_street(street: str) -> str:
+    """Comparable street name: "Boul. St-Laurent O." -> "boulevard saint laurent ouest"."""
+    decomposed = unicodedata.normalize("NFKD", street.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    words = re.sub(r"[^\w]+", " ", stripped).split()
+    return " ".join(
+        ABBREVIATIONS.get(word, word) for word in words if word not in LINK_WORDS
+    )
+
+
+def parse_address(address: str) -> tuple[int | None, str]:
+    """Civic number and normalized street of a Centris address.
+
+    Like `clean_address`, only the first two comma separated parts are read:
+    "5405 - 5409, Rue Saint-Dominique, Montréal (Le Plateau)" -> (5405, ...).
+    """
+    parts = [part.strip() for part in address.split(",")]
+    if len(parts) > 1 and re.match(r"^\d", parts[0]):
+        number_part, street = parts[0], parts[1]
+    else:
+        match = re.match(r"^\s*(\d+\w?(?:\s*-\s*\d+\w?)?)\s+(.*)$", parts[0])
+        if match is None:
+            return None, normalize_street(parts[0])
+        number_part, street = match.groups()
+    number = re.match(r"\d+", number_part)
+    return int(number.group()) if number else None, normalize_street(street)
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _street_name(street_key: str) -> str:
+    return " ".join(word for word in street_key.split() if word not in STREET_TYPES)
+
+
+class Gazetteer:
+    """Address points indexed by (street, civic number)."""
+
+    def __init__(
+        self,
+        streets: Sequence[str],
+        numbers: Sequence[int],
+        latitudes: Sequence[float],
+        longitudes: Sequence[float],
+        max_number_gap: int = 40,
+        fuzzy_cutoff: float = 0.85,
+    ) -> None:
+        self.max_number_gap = max_number_gap
+        self.fuzzy_cutoff = fuzzy_cutoff
+
+        self.street_ids: dict[str, int] = {}
+        street_ids = np.fromiter(
+            (self.street_ids.setdefault(s, len(self.street_ids)) for s in streets),
+            dtype=np.int64,
+            count=len(streets),
+        )
+        # Street names without their type, when only one street has that name
+        self.name_ids: dict[str, int] = {}
+        for street_key, street_id in self.street_ids.items():
+            name = _street_name(street_key)
+            self.name_ids[name] = -1 if name in self.name_ids else street_id
+        self._street_keys = list(self.street_ids)
+        self._street_cache: dict[str, tuple[int, bool]] = {}
+        self._trigram_index: dict[str, list[int]] | None = None
+
+        numbers = np.asarray(numbers, dtype=np.int64)
+        keys = (street_ids << _NUMBER_SHIFT) | numbers
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.numbers = numbers[order]
+        self.latitudes = np.asarray(latitudes, dtype=float)[order]
+        self.longitudes = np.asarray(longitudes, dtype=float)[order]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_records(cls, records, **kwargs) -> "Gazetteer":
+        """Build from dicts with the column names of `GAZETTEER_COLUMNS`."""
+        streets, numbers, latitudes, longitudes = [], [], [], []
+        columns = None
+        skipped = 0
+        for record in records:
+            if columns is None:
+                columns = _resolve_columns(record.keys())
+            try:
+                number = int(float(record[columns["number"]]))
+                latitude = float(record[columns["latitude"]])
+                longitude = float(record[columns["longitude"]])
+            except (TypeError, ValueError):
+                skipped += 1
+                continue
+            if "street" in columns:
+                street = record[columns["street"]] or ""
+            else:
+                street = " ".join(
+                    str(record[columns[part]] or "")
+                    for part in ["generic", "link", "specific", "direction"]
+                    if part in columns
+                )
+            street = normalize_street(street)
+            if not street or not 0 <= number < 2**_NUMBER_SHIFT:
+                skipped += 1
+                continue
+            # A point covering a range of numbers answers for both ends
+            ends = {number}
+            if "number_to" in columns:
+                try:
+                    ends.add(int(float(record[columns["number_to"]])))
+                except (TypeError, ValueError):
+                    pass
+            for end in ends:
+                if 0 <= end < 2**_NUMBER_SHIFT:
+                    streets.append(street)
+                    numbers.append(end)
+                    latitudes.append(latitude)
+                    longitudes.append(longitude)
+        if skipped:
+            logger.warning(f"Skipped {skipped} gazetteer rows without number or street")
+        return cls(streets, numbers, latitudes, longitudes, **kwargs)
+
+    @classmethod
+    def load(cls, path: str | Path, **kwargs) -> "Gazetteer":
+        """Read a CSV or Parquet gazetteer (Parquet needs pandas and pyarrow)."""
+        path = Path(path)
+        if path.suffix == ".parquet":
+            import pandas as pd
+
+            records = pd.read_parquet(path).to_dict("records")
+            gazetteer = cls.from_records(records, **kwargs)
+        else:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                gazetteer = cls.from_records(csv.DictReader(f), **kwargs)
+        logger.info(
+            f"Gazetteer {path}: {len(gazetteer)} points on "
+            f"{len(gazetteer.street_ids)} streets"
+        )
+        return gazetteer
+
+    def _find_street(self, street_key: str) -> tuple[int, bool]:
+        """Street ID (-1 if unknown) and whether it was matched approximately."""
+        if street_key in self._street_cache:
+            return self._street_cache[street_key]
+        street_id = self.street_ids.get(street_key, -1)
+        fuzzy = False
+        if street_id < 0:
+            street_id = self.name_ids.get(_street_name(street_key), -1)
+        if street_id < 0 and street_key:
+            street_id = self._closest_street(street_key)
+            fuzzy = street_id >= 0
+        self._street_cache[street_key] = street_id, fuzzy
+        return street_id, fuzzy
+
+    def _closest_street(self, street_key: str, candidates: int = 20) -> int:
+        if self._trigram_index is None:
+            self._trigram_index = defaultdict(list)
+            for key, street_id in self.street_ids.items():
+                for gram in _trigrams(key):
+                    self._trigram_index[gram].append(street_id)
+        shared = Counter()
+        for gram in _trigrams(street_key):
+            shared.update(self._trigram_index.get(gram, ()))
+        best_ratio, best_id = 0.0, -1
+        for street_id, _ in shared.most_common(candidates):
+            ratio = difflib.SequenceMatcher(
+                None, street_key, self._street_keys[street_id]
+            ).ratio()
+            if ratio > best_ratio:
+                best_ratio, best_id = ratio, street_id
+        return best_id if best_ratio >= self.fuzzy_cutoff else -1
+
+    def geocode(
+        self, addresses: Sequence[str | None]
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Latitudes, longitudes (NaN for misses) and match qualities of `addresses`."""
+        count = len(addresses)
+        street_ids = np.full(count, -1, dtype=np.int64)
+        numbers = np.zeros(count, dtype=np.int64)
+        fuzzy = np.zeros(count, dtype=bool)
+        for i, address in enumerate(addresses):
+            if not address:
+                continue
+            number, street_key = parse_address(address)
+            if number is None or number >= 2**_NUMBER_SHIFT:
+                continue
+            street_ids[i], fuzzy[i] = self._find_street(street_key)
+            numbers[i] = number
+
+        latitudes = np.full(count, np.nan)
+        longitudes = np.full(count, np.nan)
+        quality = np.full(count, "", dtype=object)
+        known = street_ids >= 0
+        if not known.any() or not len(self.keys):
+            return latitudes, longitudes, quality
+
+        query_keys = (street_ids << _NUMBER_SHIFT) | numbers
+        right = np.searchsorted(self.keys, query_keys).clip(max=len(self.keys) - 1)
+        left = (right - 1).clip(min=0)
+        # Closest point among the neighbours, on the same street only
+        candidates = np.stack([right, left])
+        same_street = (self.keys[candidates] >> _NUMBER_SHIFT) == street_ids
+        gaps = np.where(
+            same_street,
+            np.abs(self.numbers[candidates] - numbers),
+            np.iinfo(np.int64).max,
+        )
+        best = candidates[gaps.argmin(axis=0), np.arange(count)]
+        gap = gaps.min(axis=0)
+
+        matched = known & (gap <= self.max_number_gap)
+        latitudes[matched] = self.latitudes[best[matched]]
+        longitudes[matched] = self.longitudes[best[matched]]
+        quality[matched & (gap == 0)] = "exact"
+        quality[matched & (gap > 0)] = "nearest"
+        quality[matched & fuzzy] = "fuzzy"
+        return latitudes, longitudes, quality
+
+
+def _resolve_columns(names) -> dict[str, str]:
+    by_lower = {name.lower(): name for name in names}
+    columns = {}
+    for column, aliases in GAZETTEER_COLUMNS.items():
+        for alias in aliases:
+            if alias in by_lower:
+                columns[column] = by_lower[alias]
+                break
+    missing = {"number", "latitude", "longitude"} - columns.keys()
+    if missing or not ({"street", "specific"} & columns.keys()):
+        raise ValueError(
+            f"Gazetteer columns {sorted(by_lower)} lack {sorted(missing) or 'a street'}"
+        )
+    return columns
+
+
+def nominatim_geocoder(user_agent: str = "centris_app"):
+    """Nominatim at its 1 request per second policy (needs geopy)."""
+    from geopy.extra.rate_limiter import RateLimiter
+    from geopy.geocoders import Nominatim
+
+    return RateLimiter(
+        Nominatim(user_agent=user_agent, timeout=5).geocode, min_delay_seconds=1
+    )
+
+
+def geocode_listings(
+    session,
+    gazetteer: Gazetteer,
+    online=None,
+    include_geocoded: bool = False,
+    batch_size: int = 5000,
+) -> dict[str, int]:
+    """Store the coordinates of the listings without any, returns counts per match quality.
+
+    Addresses are matched offline in batches. The misses go to `online`, e.g.
+    `nominatim_geocoder()`, one at a time, when given.
+    """
+    query = select(
+        PlexCentrisListingDB.centris_id,
+        PlexCentrisListingDB.adresse,
+        PlexCentrisListingDB.ville,
+    ).where(PlexCentrisListingDB.adresse.is_not(None))
+    if not include_geocoded:
+        query = query.where(PlexCentrisListingDB.latitude.is_(None))
+    rows = session.execute(query).all()
+    logger.info(f"Geocoding {len(rows)} listings")
+
+    counts = dict.fromkeys(["exact", "nearest", "fuzzy", "online", "missed"], 0)
+    misses = []
+
+    def write(updates: list[dict]) -> None:
+        if updates:
+            session.execute(update(PlexCentrisListingDB), updates)
+            stamp_listings(session, [row["centris_id"] for row in updates])
+            session.commit()
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        latitudes, longitudes, quality = gazetteer.geocode([row[1] for row in batch])
+        updates = []
+        for (centris_id, adresse, ville), latitude, longitude, match in zip(
+            batch, latitudes, longitudes, quality
+        ):
+            if match:
+                counts[match] += 1
+                updates.append(
+                    {
+                        "centris_id": centris_id,
+                        "latitude": float(latitude),
+                        "longitude": float(longitude),
+                    }
+                )
+            else:
+                misses.append((centris_id, adresse, ville))
+        write(updates)
+
+    # Written in batches too, a slow geocoder still commits every minute or so
+    updates = []
+    for centris_id, adresse, ville in misses:
+        location = None
+        if online is not None:
+            street = "".join(adresse.split(",")[:2])
+            try:
+                location = online(f"{street}, {ville or 'Montréal'}, Québec, Canada")
+            except Exception as e:
+                logger.warning(f"Error geocoding {adresse}: {e}")
+        if location is None:
+            counts["missed"] += 1
+            continue
+        counts["online"] += 1
+        updates.append(
+            {
+                "centris_id": centris_id,
+                "latitude": location.latitude,
+                "longitude": location.longitude,
+            }
+        )
+        if len(updates) >= ONLINE_BATCH_SIZE:
+            write(updates)
+            updates = []
+    write(updates)
+
+    logger.info(f"Geocoded: {counts}")
+    return counts
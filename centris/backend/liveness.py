@@ -0,0 +1,178 @@
+import asyncio
+from collections import Counter
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+import httpx
+from loguru import logger
+from sqlalchemy import select, update
+from tqdm import tqdm
+
+from centris import get_async_sessionmaker
+from centris.backend.centris_scraper import (
+    BASE_URL,
+    LISTING_HEADERS,
+    get_fetch_url,
+    parse_centris_id,
+)
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import stamp_listings
+from centris.backend.sketches import resketch_listings
+from centris.backend.utils import get_default_date
+from fetching.rate_limiter import (
+    FetchError,
+    configure_limiter,
+    limited_request_async,
+)
+
+
+ACTIVE = "active"
+REMOVED = "removed"  # 404 / 410
+REDIRECTED = "redirected"  # sent to a search or summary page, i.e. sold or withdrawn
+
+REMOVED_STATUS_CODES = {404, 410}
+REDIRECT_STATUS_CODES = {301, 302, 303, 307, 308}
+
+
+async def check_listing(
+    client: httpx.AsyncClient, url: str, method: str = "HEAD"
+) -> str | None:
+    """Classify a listing URL with a HEAD request, None if the answer is unclear.
+
+    Redirects are not followed: one to a URL of the same listing only means it
+    moved, any other one means the listing is gone.
+    """
+    try:
+        await limited_request_async(
+            client, method, get_fetch_url(url), headers=LISTING_HEADERS
+        )
+        return ACTIVE
+    except FetchError as e:
+        if e.status_code == 405 and method == "HEAD":
+            return await check_listing(client, url, method="GET")
+        if e.status_code in REMOVED_STATUS_CODES:
+            return REMOVED
+        if e.status_code in REDIRECT_STATUS_CODES and e.response is not None:
+            location = e.response.headers.get("Location", "")
+            if parse_centris_id(location) == parse_centris_id(url):
+                return ACTIVE
+            return REDIRECTED
+        logger.warning(f"Could not check {url}: {e}")
+    except httpx.HTTPError as e:
+        logger.warning(f"Could not check {url}: {e!r}")
+    return None
+
+
+def write_statuses(session, rows: list[dict]) -> None:
+    """Store a batch of results, the sketches follow the listings that flipped."""
+    was_active = dict(
+        session.execute(
+            select(PlexCentrisListingDB.centris_id, PlexCentrisListingDB.active).where(
+                PlexCentrisListingDB.centris_id.in_([row["centris_id"] for row in rows])
+            )
+        ).all()
+    )
+    session.execute(update(PlexCentrisListingDB), rows)
+    flipped = [
+        row["centris_id"]
+        for row in rows
+        if was_active.get(row["centris_id"]) != row["active"]
+    ]
+    if flipped:
+        resketch_listings(session, flipped)
+    stamp_listings(session, flipped)
+
+
+async def check_listings(
+    listings: Iterable[tuple[int, str]],
+    session_factory=None,
+    concurrency: int = 64,
+    batch_size: int = 1000,
+) -> Counter:
+    """Check (centris_id, url) pairs concurrently and write the results in bulk.
+
+    `active` is set on every classified listing and `last_seen` moves to today
+    for the active ones; unclear answers leave the row untouched. Writes go
+    through the async engine, so the checks in flight keep running meanwhile.
+    Returns the number of listings per outcome.
+    """
+    session_factory = session_factory or get_async_sessionmaker()
+    today = get_default_date()
+    outcomes = Counter()
+    updates = []
+    listing_iter = iter(listings)
+    progress = tqdm(desc="Checking listings")
+    # One write at a time, SQLite has a single writer anyway
+    write_lock = asyncio.Lock()
+
+    async def flush() -> None:
+        if not updates:
+            return
+        batch = updates.copy()
+        updates.clear()
+        async with write_lock, session_factory() as session:
+            await session.run_sync(write_statuses, batch)
+            await session.commit()
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        # Coroutines share `listing_iter`: next() never yields to the event loop
+        for centris_id, url in listing_iter:
+            status = await check_listing(client, url)
+            outcomes[status or "unknown"] += 1
+            progress.update()
+            if status is None:
+                continue
+            row = {"centris_id": centris_id, "active": status == ACTIVE}
+            if status == ACTIVE:
+                row["last_seen"] = today
+            updates.append(row)
+            if len(updates) >= batch_size:
+                await flush()
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        timeout=15, limits=limits, follow_redirects=False
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    await flush()
+    progress.close()
+
+    logger.info(f"Liveness: {dict(outcomes)}")
+    return outcomes
+
+
+def sweep(
+    session,
+    concurrency: int = 64,
+    rate: float = 20.0,
+    max_rate: float = 200.0,
+    include_inactive: bool = False,
+    unseen_days: int | None = None,
+) -> Counter:
+    """Check every stored listing, skipping the known inactive ones by default.
+
+    With `unseen_days`, listings seen less than that many days ago, e.g. on a
+    result page of the last crawl, are skipped too.
+
+    HEAD requests are cheap for the site, so the host limiter ramps up quickly
+    to `max_rate` for the sweep; it still backs off on throttling or slow responses.
+    """
+    configure_limiter(
+        get_fetch_url(BASE_URL),
+        rate=rate,
+        max_rate=max_rate,
+        burst=concurrency,
+        increase=1.0,
+    )
+    query = select(PlexCentrisListingDB.centris_id, PlexCentrisListingDB.url)
+    if not include_inactive:
+        query = query.where(PlexCentrisListingDB.active)
+    if unseen_days is not None:
+        cutoff = datetime.now() - timedelta(days=unseen_days - 1)
+        query = query.where(
+            PlexCentrisListingDB.last_seen.is_(None)
+            | (PlexCentrisListingDB.last_seen < cutoff.strftime("%Y-%m-%d"))
+        )
+    listings = session.execute(query).all()
+    logger.info(f"Checking {len(listings)} listings")
+    return asyncio.run(check_listings(listings, concurrency=concurrency))
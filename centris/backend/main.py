@@ -1,10 +1,35 @@
+import itertools
+from collections.abc import Iterable, Iterator
 from datetime import datetime
-from centris.backend.centris_scraper import CentrisBienParser, CentrisScraper
+from typing import TYPE_CHECKING
+from centris.backend.api_client import CentrisAPIClient
+from centris.backend.centris_scraper import (
+    START_URL_PLEX,
+    get_fetch_url,
+    parse_centris_id,
+)
 from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.frontier import (
+    CrawlFrontier,
+    PolitenessBudget,
+    crawl_seeds,
+    fetch_listings,
+)
+from centris.backend.mappers import map_bien_centris_to_orm
+from centris.backend.queries import stamp_listings
+from centris.backend.record_log import RecordLog
+from centris.backend.saved_searches import SearchMatcher
+from centris.backend.sketches import SketchAccumulator
+from centris.backend.snapshots import SnapshotStore
+from centris.backend.summaries import refresh_listing, upsert_summaries
+from centris.backend.utils import MemoryGuard
+from fetching.rate_limiter import get_limiter
 from loguru import logger
 from tqdm import tqdm
 from pathlib import Path
-from centris import Session
+
+if TYPE_CHECKING:
+    from centris.backend.known_ids import KnownIds
 
 
 def get_existing_centris_ids(session) -> set[int]:
@@ -15,9 +40,48 @@ def get_existing_centris_ids(session) -> set[int]:
 
 
 # TODO - Add stopping criteria based on existing_ids: if among the URL of a given page, at least 1 is in the DB, we stop (because listings are sorted by date)
-def get_urls_from_web(scrape_date: datetime, **kwargs) -> list[str]:
-    scraper = CentrisScraper()
-    urls = scraper.scrape_urls(**kwargs)
+def iter_urls_from_web(
+    scrape_date: datetime,
+    seeds: list[str] | None = None,
+    existing_ids: "set[int] | KnownIds | None" = None,
+    budget: PolitenessBudget | None = None,
+    use_api: bool = False,
+    session=None,
+    refresh_ids: set[int] | None = None,
+    **kwargs,
+) -> Iterator[str]:
+    """Crawl every seed search and yield deduplicated URLs, unseen listings first.
+
+    With `use_api`, URLs come from the `GetInscriptions` endpoint instead of a browser.
+    URLs are also written to `artifacts/<scrape date>/urls.txt` as they are yielded.
+    With a `session`, the thumbnail cards are stored and the IDs of the stored
+    listings whose card changed are added to `refresh_ids` before the first URL
+    is yielded.
+    """
+    frontier = CrawlFrontier(known_ids=existing_ids)
+    if use_api:
+        client = CentrisAPIClient()
+        frontier.add_summaries(
+            client.get_listing_summaries(max_pages=kwargs.get("num_pages", 5))
+        )
+    else:
+        crawl_seeds(
+            seeds or [START_URL_PLEX], frontier, budget or PolitenessBudget(), **kwargs
+        )
+
+    if session is not None and frontier.summaries:
+        changed = upsert_summaries(
+            session, frontier.summaries.values(), scrape_date.strftime("%Y-%m-%d")
+        )
+        changed &= frontier.known_seen
+        if refresh_ids is not None:
+            refresh_ids |= changed
+        logger.info(
+            f"{len(frontier.summaries)} cards, "
+            f"{len(frontier.summaries.keys() - frontier.known_seen)} new listings, "
+            f"{len(changed)} changed"
+        )
+
     # Store the URLs in a file
     Path(f"artifacts/{scrape_date.strftime('%Y-%m-%d_%H-%M-%S')}").mkdir(
         parents=True, exist_ok=True
@@ -25,8 +89,26 @@ def get_urls_from_web(scrape_date: datetime, **kwargs) -> list[str]:
     with open(
         f"artifacts/{scrape_date.strftime('%Y-%m-%d_%H-%M-%S')}/urls.txt", "w"
     ) as f:
-        f.write("\n".join(urls))
-    return urls
+        for url in frontier.drain():
+            f.write(f"{url}\n")
+            yield url
+
+
+def get_urls_from_web(scrape_date: datetime, **kwargs) -> list[str]:
+    return list(iter_urls_from_web(scrape_date, **kwargs))
+
+
+def iter_urls_from_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Stream URLs from a file object or stdin, one per line."""
+    for line in lines:
+        if url := line.strip():
+            yield url
+
+
+def iter_urls_from_path(path: str | Path) -> Iterator[str]:
+    """Stream the URLs of a file, closed once read or when the caller stops."""
+    with open(path) as f:
+        yield from iter_urls_from_lines(f)
 
 
 def get_urls_from_file(scrape_time: str, **kwargs) -> list[str]:
@@ -35,34 +117,148 @@ def get_urls_from_file(scrape_time: str, **kwargs) -> list[str]:
     return urls
 
 
-def scrape_and_save(
-    urls: list[str], scrape_date: datetime, existing_ids: set[int], session
-) -> None:
-    for url in tqdm(urls, desc="Scraping and saving listings"):
-        try:
-            centris_parser = CentrisBienParser(url)
-            if centris_parser.centris_id in existing_ids:
-                logger.info(f"Skipping {centris_parser.centris_id}")
+def skip_existing(
+    urls: Iterable[str],
+    existing_ids: "set[int] | KnownIds",
+    refresh_ids: set[int],
+    chunk_size: int = 500,
+) -> Iterator[str]:
+    """URLs of the listings not stored yet, or to refresh, resolved per chunk."""
+    from centris.backend.known_ids import known_among
+
+    url_iter = iter(urls)
+    while chunk := list(itertools.islice(url_iter, chunk_size)):
+        ids = {url: parse_centris_id(url) for url in chunk}
+        known = known_among(existing_ids, set(ids.values()) - {None}) - refresh_ids
+        seen = set()
+        for url, centris_id in ids.items():
+            if centris_id in known or centris_id in seen:
+                logger.info(f"Skipping {centris_id}")
                 continue
+            seen.add(centris_id)
+            yield url
+
 
-            db_entry = centris_parser.to_db_model(scrape_date)
-            session.add(db_entry)
+def scrape_and_save(
+    urls: Iterable[str],
+    scrape_date: datetime,
+    existing_ids: "set[int] | KnownIds",
+    session,
+    budget: PolitenessBudget | None = None,
+    max_workers: int = 1,
+    memory_guard: MemoryGuard | None = None,
+    snapshot_store: SnapshotStore | None = None,
+    sketches: SketchAccumulator | None = None,
+    matcher: SearchMatcher | None = None,
+    refresh_ids: set[int] | None = None,
+    commit_every: int = 25,
+    record_log: RecordLog | None = None,
+) -> int:
+    """Fetch new listings concurrently under `budget` and store them in batches.
+
+    `urls` is consumed lazily and each page is released once its row is written,
+    so memory does not grow with the number of URLs. Returns the number of stored
+    listings; stops early if `memory_guard` reports the cap is exceeded. Pages are
+    archived as compact snapshots in `snapshot_store`, stored listings added to
+    the quantile `sketches` and their saved search hits queued by `matcher` when
+    given. Stored listings in `refresh_ids` are fetched again and overwritten,
+    and the sketches of their quartier and month rebuilt.
+    Rows are committed every `commit_every` listings, each in its own savepoint.
+    Parsed records are appended to `record_log` first, flushed before each commit.
+    """
+    budget = budget or PolitenessBudget(max_concurrency=max_workers)
+    refresh_ids = refresh_ids if refresh_ids is not None else set()
+    listings = fetch_listings(
+        skip_existing(urls, existing_ids, refresh_ids), budget, max_workers
+    )
+    progress = tqdm(listings, desc="Scraping and saving listings")
+    stored = 0
+    refreshed = 0
+    # Listings written since the last commit, new or refreshed, and the new ones
+    written: list[int] = []
+    uncommitted: list[int] = []
+
+    def commit() -> None:
+        nonlocal stored
+        if record_log is not None:
+            record_log.flush()
+        if not written:
+            return
+        try:
+            refreshed_ids = set(written).difference(uncommitted)
+            if sketches is not None and refreshed_ids:
+                # Their previous values cannot be taken out of the sketches
+                sketches.resketch(session, refreshed_ids, adding=uncommitted)
+            stamp_listings(session, written)
             session.commit()
-            existing_ids.add(centris_parser.centris_id)
+        except Exception as e:
+            logger.error(f"Error committing {len(written)} listings: {e}")
+            session.rollback()
+            existing_ids.difference_update(uncommitted)
+            stored -= len(uncommitted)
+        else:
+            # Only committed listings count in the quantiles
+            if sketches is not None:
+                for centris_id in uncommitted:
+                    sketches.add(centris_id)
+        uncommitted.clear()
+        written.clear()
+
+    for centris_parser in progress:
+        url = centris_parser.url
+        centris_id = centris_parser.centris_id
+        progress.set_postfix(rate=get_limiter(get_fetch_url(url)).current_rate)
+        try:
+            record = centris_parser.get_data(scrape_date)
+            if record_log is not None:
+                record_log.append(record)
+            db_entry = map_bien_centris_to_orm(record)
+            # One savepoint per listing: a failing row does not lose the batch
+            with session.begin_nested():
+                if centris_id in refresh_ids:
+                    row = refresh_listing(session, db_entry)
+                    if matcher is not None:
+                        matcher.add_matches(session, row, refreshed=True)
+                else:
+                    session.add(db_entry)
+                    if matcher is not None:
+                        # Flushing first fills the generated metrics the searches use
+                        session.flush()
+                        matcher.add_matches(session, db_entry)
+            written.append(centris_id)
+            if centris_id in refresh_ids:
+                refresh_ids.discard(centris_id)
+                refreshed += 1
+            else:
+                existing_ids.add(centris_id)
+                uncommitted.append(centris_id)
+                stored += 1
+            if snapshot_store is not None:
+                snapshot_store.put(centris_parser, db_entry.date_scrape)
 
         except Exception as e:
             logger.error(f"Error storing {url}: {e}")
-            session.rollback()
             continue
 
+        finally:
+            centris_parser.release()
+
+        if len(written) >= commit_every:
+            commit()
+
+        if memory_guard is not None and memory_guard.exceeded():
+            logger.error(
+                f"Memory above {memory_guard.max_mb} MB, stopping after {stored} listings"
+            )
+            break
+
+    commit()
+    if refreshed:
+        logger.info(f"Refreshed {refreshed} listings whose card changed")
+    return stored
+
 
 if __name__ == "__main__":
-    scrape_date = datetime.now()
-    scrape_urls = True
-    with Session() as session:
-        existing_ids = get_existing_centris_ids(session)
-        if scrape_urls:
-            urls = get_urls_from_web(scrape_date, num_pages=2, headless=True)
-        else:
-            urls = get_urls_from_file("2025-01-04_09-52-56")
-        scrape_and_save(urls, scrape_date, existing_ids, session)
+    from centris.backend.cli import main
+
+    main()
@@ -1,5 +1,16 @@
 import json
-from centris.backend.db_models import PlexCentrisListingDB
+import re
+from collections import Counter
+from centris.backend.db_models import PlexCentrisListingDB, PlexUnitMixDB
+
+
+def unit_mix_counts(unites: list[str] | None) -> dict[float, int]:
+    """Count units per size, e.g. ["3 1/2", "3 1/2", "5 1/2"] -> {3.5: 2, 5.5: 1}."""
+    counts = Counter()
+    for unite in unites or []:
+        if match := re.fullmatch(r"\s*(\d+)(\s+1/2)?\s*", unite):
+            counts[int(match.group(1)) + (0.5 if match.group(2) else 0.0)] += 1
+    return dict(counts)
 
 
 def map_bien_centris_to_orm(
@@ -33,4 +44,8 @@ def map_bien_centris_to_orm(
         taxes=pydantic_model.taxes,
         eval_municipale=pydantic_model.eval_municipale,
         date_scrape=pydantic_model.date_scrape,
+        unit_mix=[
+            PlexUnitMixDB(pieces=pieces, count=count)
+            for pieces, count in unit_mix_counts(pydantic_model.unites).items()
+        ],
     )
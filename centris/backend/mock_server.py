@@ -0,0 +1,342 @@
+"""Local stand-in for centris.ca, to load-test the pipeline without hitting the site.
+
+Serves thumbnail result pages, listing pages generated from the saved example in
+`tests/examples/` and the `GetInscriptions` JSON endpoint, with configurable latency,
+error, throttling and sold/removed listing rates. Point the scrapers at it with `CENTRIS_FETCH_BASE_URL`.
+
+    python -m centris.backend.mock_server --port 8765 --pages 50 --latency 0.05
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+
+EXAMPLE_LISTING_PATH = (
+    Path(__file__).parents[2] / "tests" / "examples" / "centris_26999986.html"
+)
+EXAMPLE_CENTRIS_ID = "26999986"
+EXAMPLE_PRICE = 899000
+EXAMPLE_REVENUS = 51240
+
+FIRST_CENTRIS_ID = 10_000_000
+QUARTIERS = [
+    "rosemont-la-petite-patrie",
+    "villeray-saint-michel-parc-extension",
+    "le-plateau-mont-royal",
+    "verdun",
+    "ahuntsic-cartierville",
+    "le-sud-ouest",
+    "mercier-hochelaga-maisonneuve",
+]
+PROPERTY_TYPES = ["duplex", "triplex", "quadruplex", "quintuplex"]
+
+
+@dataclass
+class MockConfig:
+    pages: int = 10
+    listings_per_page: int = 20
+    latency: float = 0.0  # mean response delay in seconds
+    error_rate: float = 0.0  # share of 500 responses
+    throttle_rate: float = 0.0  # share of 429 responses
+    retry_after: int = 1
+    inactive_rate: float = 0.0  # share of sold (redirected) or removed (404) listings
+    price_drop_rate: float = 0.0  # share of listings shown 5% below their first price
+    seed: int = 0
+
+
+def _format_money(value: int) -> str:
+    return f"{value:,}".replace(",", "\xa0")
+
+
+class MockCentrisSite:
+    """Deterministic fake catalog: the same ID always renders the same listing."""
+
+    def __init__(self, config: MockConfig) -> None:
+        self.config = config
+        self.template = EXAMPLE_LISTING_PATH.read_text(encoding="utf-8")
+
+    @property
+    def total_listings(self) -> int:
+        return self.config.pages * self.config.listings_per_page
+
+    def listing(self, position: int) -> dict:
+        rng = random.Random(self.config.seed * 1_000_003 + position)
+        centris_id = FIRST_CENTRIS_ID + position
+        property_type = rng.choice(PROPERTY_TYPES)
+        quartier = rng.choice(QUARTIERS)
+        prix = rng.randrange(500_000, 2_000_000, 1000)
+        revenus = rng.randrange(20_000, 120_000, 10)
+        adresse = f"{rng.randint(1, 9999)}, rue Exemple"
+        draw = rng.random()
+        if draw < self.config.inactive_rate / 2:
+            status = "sold"
+        elif draw < self.config.inactive_rate:
+            status = "removed"
+        else:
+            status = "active"
+        # Drawn apart so that the other rates keep the same listings
+        if random.Random(-position - 1).random() < self.config.price_drop_rate:
+            prix = int(round(prix * 0.95, -3))
+        return {
+            "centris_id": centris_id,
+            "prix": prix,
+            "revenus": revenus,
+            "property_type": property_type,
+            "path": f"/fr/{property_type}~a-vendre~montreal-{quartier}/{centris_id}",
+            "adresse": adresse,
+            "quartier": quartier,
+            "status": status,
+        }
+
+    def listing_status(self, centris_id: int) -> str:
+        position = centris_id - FIRST_CENTRIS_ID
+        if not 0 <= position < self.total_listings:
+            return "removed"
+        return self.listing(position)["status"]
+
+    def listing_page(self, centris_id: int) -> str | None:
+        position = centris_id - FIRST_CENTRIS_ID
+        if not 0 <= position < self.total_listings:
+            return None
+        listing = self.listing(position)
+        return (
+            self.template.replace(EXAMPLE_CENTRIS_ID, str(centris_id))
+            .replace(str(EXAMPLE_PRICE), str(listing["prix"]))
+            .replace(_format_money(EXAMPLE_PRICE), _format_money(listing["prix"]))
+            .replace(
+                f"{EXAMPLE_REVENUS:,}".replace(",", " "),
+                f"{listing['revenus']:,}".replace(",", " "),
+            )
+        )
+
+    def thumbnails_html(self, start: int, count: int) -> str:
+        cards = []
+        for position in range(start, min(start + count, self.total_listings)):
+            listing = self.listing(position)
+            cards.append(
+                f"""<div class="property-thumbnail-item thumbnailItem">
+  <div class="property-thumbnail-summary">
+    <meta itemprop="sku" content="{listing["centris_id"]}">
+    <a class="property-thumbnail-summary-link" href="{listing["path"]}?view=Summary">
+      <div class="price"><meta itemprop="price" content="{listing["prix"]}">
+        <span>{_format_money(listing["prix"])} $</span></div>
+      <span class="category"><div>{listing["property_type"].capitalize()} à vendre</div></span>
+      <div class="address"><div>{listing["adresse"]}</div>
+        <div>Montréal ({listing["quartier"]})</div></div>
+    </a>
+  </div>
+</div>"""
+            )
+        return "\n".join(cards)
+
+    def result_page(self, page: int, path: str) -> str:
+        per_page = self.config.listings_per_page
+        next_link = (
+            f'<li class="next"><a href="{path}?view=Thumbnail&page={page + 1}">›</a></li>'
+            if page < self.config.pages
+            else ""
+        )
+        return f"""<!DOCTYPE html>
+<html><body>
+<button id="selectSortById"
+  onclick="document.getElementById('sort-menu').classList.add('show')">Trier</button>
+<div id="sort-menu" class="dropdown-menu dropdown-menu-right">
+  <a data-option-value="3" href="#">Publication récente</a>
+</div>
+<div id="property-result">
+{self.thumbnails_html((page - 1) * per_page, per_page)}
+</div>
+<ul class="pager">{next_link}</ul>
+</body></html>"""
+
+    def inscriptions(self, start_position: int, max_results: int) -> dict:
+        return {
+            "d": {
+                "Result": {
+                    "html": self.thumbnails_html(start_position, max_results),
+                    "count": self.total_listings,
+                    "inscNumberPerPage": max_results,
+                },
+                "Succeeded": True,
+            }
+        }
+
+
+def make_handler(site: MockCentrisSite) -> type[BaseHTTPRequestHandler]:
+    config = site.config
+    rng = random.Random(config.seed)
+    rng_lock = threading.Lock()
+
+    class MockCentrisHandler(BaseHTTPRequestHandler):
+        _head_only = False
+
+        def do_GET(self) -> None:
+            if not self._simulate_server_load():
+                return
+            url = urlparse(self.path)
+            if match := re.fullmatch(r"/fr/[^/]+~[^/]+~[^/]+/(\d+)", url.path):
+                centris_id = int(match.group(1))
+                status = site.listing_status(centris_id)
+                if status == "removed":
+                    self._send(404, b"Not found", "text/plain")
+                elif status == "sold":
+                    # Centris sends sold listings back to the search results
+                    location = "/fr/plex~a-vendre~montreal?view=Thumbnail"
+                    self._send(302, b"", "text/plain", {"Location": location})
+                elif self._head_only:
+                    self._send(200, b"", "text/html; charset=utf-8")
+                else:
+                    html = site.listing_page(centris_id)
+                    self._send(200, html.encode(), "text/html; charset=utf-8")
+            elif url.path.startswith("/fr/"):
+                page = int(parse_qs(url.query).get("page", ["1"])[0])
+                html = site.result_page(page, url.path)
+                self._send(200, html.encode(), "text/html; charset=utf-8")
+            else:
+                self._send(404, b"Not found", "text/plain")
+
+        def do_HEAD(self) -> None:
+            self._head_only = True
+            try:
+                self.do_GET()
+            finally:
+                self._head_only = False
+
+        def do_POST(self) -> None:
+            if not self._simulate_server_load():
+                return
+            if urlparse(self.path).path != "/Property/GetInscriptions":
+                self._send(404, b"Not found", "text/plain")
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            body = site.inscriptions(
+                payload.get("startPosition", 0), payload.get("maxResults", 20)
+            )
+            self._send(200, json.dumps(body).encode(), "application/json")
+
+        def _simulate_server_load(self) -> bool:
+            """Sleep and inject failures, returns False if the request was answered."""
+            with rng_lock:
+                delay = rng.expovariate(1 / config.latency) if config.latency else 0
+                draw = rng.random()
+            time.sleep(delay)
+            if draw < config.throttle_rate:
+                self._send(
+                    429,
+                    b"Too many requests",
+                    "text/plain",
+                    {"Retry-After": str(config.retry_after)},
+                )
+                return False
+            if draw < config.throttle_rate + config.error_rate:
+                self._send(500, b"Internal error", "text/plain")
+                return False
+            return True
+
+        def _send(
+            self,
+            status: int,
+            body: bytes,
+            content_type: str,
+            headers: dict[str, str] | None = None,
+        ) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            if not self._head_only:
+                self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            logger.trace(f"mock centris: {format % args}")
+
+    return MockCentrisHandler
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for a burst of concurrent connections, the default backlog is 5
+    request_queue_size = 256
+
+
+class MockCentrisServer:
+    """Mock Centris site served from a background thread.
+
+    Usage:
+        with MockCentrisServer(MockConfig(pages=5)) as server:
+            os.environ["CENTRIS_FETCH_BASE_URL"] = server.base_url
+    """
+
+    def __init__(
+        self, config: MockConfig | None = None, host: str = "127.0.0.1", port: int = 0
+    ) -> None:
+        self.site = MockCentrisSite(config or MockConfig())
+        self.httpd = _MockHTTPServer((host, port), make_handler(self.site))
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockCentrisServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockCentrisServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve a local mock of centris.ca")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--listings-per-page", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--inactive-rate", type=float, default=0.0)
+    parser.add_argument("--price-drop-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        pages=args.pages,
+        listings_per_page=args.listings_per_page,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        retry_after=args.retry_after,
+        inactive_rate=args.inactive_rate,
+        price_drop_rate=args.price_drop_rate,
+    )
+    server = MockCentrisServer(config, args.host, args.port)
+    logger.info(f"Mock Centris serving {server.site.total_listings} listings")
+    logger.info(f"export CENTRIS_FETCH_BASE_URL={server.base_url}")
+    server.httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+"""Model-based fair price of the listings, next to the municipal evaluation.
+
+A ridge regression of log(prix) on the number of units, lot size, year of
+construction, revenus, taxes (log-scaled where skewed, with a flag per missing
+value) and a one-hot quartier. The model only keeps its sufficient statistics
+(XᵀX, Xᵀy), so new listings are added with one matrix product and refitting
+is a solve of a few dozen unknowns, whatever the number of listings. It is
+cached on disk between runs:
+
+    model = fair_price_model(session)   # load, add the new listings, save
+    score_listings(session, model)      # prix_modele of the unscored listings
+
+`prix_modele` is the predicted (median) price; the database derives
+`diff_prix_modele`, the % gap of the asking price to it, which the dashboard
+sorts on. Listings refreshed with a new price keep their first price in the
+statistics until a rebuild.
+"""
+
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import select, update
+
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import stamp_listings
+
+
+DEFAULT_MODEL_PATH = "artifacts/fair_price.npz"
+
+PRICING_FEATURES = [
+    "nombre_unites",
+    "superficie_terrain",
+    "annee_construction",
+    "revenus",
+    "taxes",
+]
+
+# Money and areas are skewed, they enter the model on a log scale
+LOG_FEATURES = {"superficie_terrain", "revenus", "taxes"}
+
+# Fewer listings than this leave prix_modele empty
+MIN_TRAINING_LISTINGS = 50
+
+
+class FairPriceModel:
+    """Incremental ridge regression of log(prix), see the module docstring.
+
+    The penalty `alpha` applies to standardized features, the intercept is not
+    penalized. Quartiers get a column the first time they are seen; a quartier
+    unknown to the model scores as the average one.
+    """
+
+    def __init__(self, alpha: float = 1.0) -> None:
+        self.alpha = alpha
+        self.quartiers: list[str] = []
+        self._quartier_columns: dict[str, int] = {}
+        size = self._base_size
+        self.xtx = np.zeros((size, size))
+        self.xty = np.zeros(size)
+        self.yty = 0.0
+        self.trained_ids = np.empty(0, dtype=np.int64)
+        self._coef: np.ndarray | None = None
+
+    @property
+    def _base_size(self) -> int:
+        # intercept, features, missing flags
+        return 1 + 2 * len(PRICING_FEATURES)
+
+    @property
+    def n(self) -> int:
+        return int(self.xtx[0, 0])
+
+    def _add_quartiers(self, quartiers) -> None:
+        new = [
+            q for q in dict.fromkeys(quartiers) if q and q not in self._quartier_columns
+        ]
+        if not new:
+            return
+        for quartier in new:
+            self._quartier_columns[quartier] = self._base_size + len(self.quartiers)
+            self.quartiers.append(quartier)
+        size = self._base_size + len(self.quartiers)
+        grown = np.zeros((size, size))
+        grown[: len(self.xtx), : len(self.xtx)] = self.xtx
+        self.xtx = grown
+        self.xty = np.concatenate([self.xty, np.zeros(size - len(self.xty))])
+
+    def design_matrix(self, values: np.ndarray, quartiers) -> np.ndarray:
+        """Rows of the model for `values` (one column per PRICING_FEATURES, NaN if missing)."""
+        values = np.asarray(values, dtype=float).reshape(-1, len(PRICING_FEATURES))
+        values = values.copy()
+        for i, feature in enumerate(PRICING_FEATURES):
+            if feature in LOG_FEATURES:
+                with np.errstate(invalid="ignore"):
+                    values[:, i] = np.log1p(np.clip(values[:, i], 0, None))
+        missing = np.isnan(values)
+        x = np.zeros((len(values), self._base_size + len(self.quartiers)))
+        x[:, 0] = 1.0
+        x[:, 1 : 1 + len(PRICING_FEATURES)] = np.where(missing, 0.0, values)
+        x[:, 1 + len(PRICING_FEATURES) : self._base_size] = missing
+        columns = np.array([self._quartier_columns.get(q, -1) for q in quartiers])
+        known = np.flatnonzero(columns >= 0)
+        x[known, columns[known]] = 1.0
+        return x
+
+    def partial_fit(self, centris_ids, values: np.ndarray, quartiers, prix) -> int:
+        """Add listings to the statistics, returns how many were added."""
+        centris_ids = np.asarray(centris_ids, dtype=np.int64)
+        prix = np.asarray(prix, dtype=float)
+        keep = ~np.isin(centris_ids, self.trained_ids) & (prix > 0)
+        if not keep.any():
+            return 0
+        quartiers = [q for q, k in zip(quartiers, keep) if k]
+        self._add_quartiers(quartiers)
+        x = self.design_matrix(np.asarray(values, dtype=float)[keep], quartiers)
+        y = np.log(prix[keep])
+        self.xtx += x.T @ x
+        self.xty += x.T @ y
+        self.yty += float(y @ y)
+        self.trained_ids = np.union1d(self.trained_ids, centris_ids[keep])
+        self._coef = None
+        return int(keep.sum())
+
+    @property
+    def coef(self) -> np.ndarray:
+        """Intercept then one coefficient per column of `design_matrix`."""
+        if self._coef is None:
+            self._coef = self._solve()
+        return self._coef
+
+    def _solve(self) -> np.ndarray:
+        n = max(self.n, 1)
+        mean = self.xtx[0] / n
+        y_mean = self.xty[0] / n
+        # Centered covariances, so the intercept stays out of the penalty
+        cov = self.xtx[1:, 1:] / n - np.outer(mean[1:], mean[1:])
+        cov_y = self.xty[1:] / n - mean[1:] * y_mean
+        variance = np.diag(cov).copy()
+        penalty = self.alpha / n * np.where(variance > 1e-12, variance, 1.0)
+        slopes = np.linalg.solve(cov + np.diag(penalty), cov_y)
+        return np.concatenate([[y_mean - mean[1:] @ slopes], slopes])
+
+    def r2(self) -> float:
+        """In-sample R² on log(prix), from the statistics alone."""
+        if self.n < 2:
+            return float("nan")
+        coef = self.coef
+        sse = self.yty - 2 * coef @ self.xty + coef @ self.xtx @ coef
+        sst = self.yty - self.xty[0] ** 2 / self.n
+        return float(1 - sse / sst) if sst > 0 else float("nan")
+
+    def predict(self, values: np.ndarray, quartiers) -> np.ndarray:
+        """Predicted prices of a batch, in one matrix product."""
+        return np.exp(self.design_matrix(values, quartiers) @ self.coef)
+
+    def save(self, path: str | Path) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                features=np.array(PRICING_FEATURES),
+                alpha=self.alpha,
+                quartiers=np.array(self.quartiers, dtype=str),
+                xtx=self.xtx,
+                xty=self.xty,
+                yty=self.yty,
+                trained_ids=self.trained_ids,
+            )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "FairPriceModel":
+        with np.load(path) as data:
+            if data["features"].tolist() != PRICING_FEATURES:
+                raise ValueError(f"{path} was trained on other features")
+            model = cls(alpha=float(data["alpha"]))
+            model._add_quartiers(data["quartiers"].tolist())
+            model.xtx = data["xtx"]
+            model.xty = data["xty"]
+            model.yty = float(data["yty"])
+            model.trained_ids = data["trained_ids"]
+        return model
+
+
+def _feature_columns():
+    return [getattr(PlexCentrisListingDB, feature) for feature in PRICING_FEATURES]
+
+
+def _to_arrays(rows) -> tuple[np.ndarray, np.ndarray, list[str | None], np.ndarray]:
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    prix = np.array([row[1] for row in rows], dtype=float)
+    quartiers = [row[2] for row in rows]
+    values = np.array(
+        [[np.nan if v is None else v for v in row[3:]] for row in rows], dtype=float
+    ).reshape(len(rows), len(PRICING_FEATURES))
+    return ids, prix, quartiers, values
+
+
+def train(session, model: FairPriceModel, batch_size: int = 20_000) -> int:
+    """Add the stored listings the model has not seen, returns their count."""
+    stored_ids = np.fromiter(
+        session.scalars(select(PlexCentrisListingDB.centris_id)), dtype=np.int64
+    )
+    new_ids = np.setdiff1d(stored_ids, model.trained_ids)
+    added = 0
+    for start in range(0, len(new_ids), batch_size):
+        chunk = new_ids[start : start + batch_size].tolist()
+        rows = session.execute(
+            select(
+                PlexCentrisListingDB.centris_id,
+                PlexCentrisListingDB.prix,
+                PlexCentrisListingDB.quartier,
+                *_feature_columns(),
+            ).where(PlexCentrisListingDB.centris_id.in_(chunk))
+        ).all()
+        ids, prix, quartiers, values = _to_arrays(rows)
+        added += model.partial_fit(ids, values, quartiers, prix)
+    return added
+
+
+def fair_price_model(
+    session,
+    path: str | Path | None = DEFAULT_MODEL_PATH,
+    rebuild: bool = False,
+    alpha: float | None = None,
+) -> FairPriceModel:
+    """The model cached at `path`, updated with the new listings and saved back.
+
+    A missing or outdated cache, `rebuild` or another `alpha` start from scratch.
+    """
+    model = None
+    if path is not None and Path(path).exists() and not rebuild:
+        try:
+            model = FairPriceModel.load(path)
+        except (ValueError, KeyError, OSError) as e:
+            logger.warning(f"Retraining the fair price model: {e}")
+    if model is None or (alpha is not None and alpha != model.alpha):
+        model = FairPriceModel(alpha=1.0 if alpha is None else alpha)
+    added = train(session, model)
+    if added and path is not None:
+        model.save(path)
+    logger.info(
+        f"Fair price model: {model.n} listings ({added} new), R² {model.r2():.3f}"
+    )
+    return model
+
+
+def score_listings(
+    session,
+    model: FairPriceModel,
+    rescore: bool = False,
+    batch_size: int = 20_000,
+) -> int:
+    """Store `prix_modele` of the listings without one (all with `rescore`).
+
+    Each batch is scored in one matrix product and written in one statement.
+    Returns the number of scored listings.
+    """
+    if model.n < MIN_TRAINING_LISTINGS:
+        logger.warning(
+            f"Fair price model trained on {model.n} listings, "
+            f"at least {MIN_TRAINING_LISTINGS} are needed to score"
+        )
+        return 0
+    query = select(
+        PlexCentrisListingDB.centris_id,
+        PlexCentrisListingDB.prix,
+        PlexCentrisListingDB.quartier,
+        *_feature_columns(),
+    )
+    if not rescore:
+        query = query.where(PlexCentrisListingDB.prix_modele.is_(None))
+    rows = session.execute(query).all()
+
+    for start in range(0, len(rows), batch_size):
+        ids, _, quartiers, values = _to_arrays(rows[start : start + batch_size])
+        predicted = np.round(model.predict(values, quartiers))
+        session.execute(
+            update(PlexCentrisListingDB),
+            [
+                {"centris_id": int(centris_id), "prix_modele": int(prix_modele)}
+                for centris_id, prix_modele in zip(ids, predicted)
+            ],
+        )
+        # Dashboards pick the scored rows up by their stamp
+        stamp_listings(session, ids.tolist())
+        session.commit()
+    logger.info(f"Scored {len(rows)} listings with the fair price model")
+    return len(rows)
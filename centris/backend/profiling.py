@@ -0,0 +1,297 @@
+"""Opt-in profiling of `CentrisBienParser`, per field and per CSS selector.
+
+`ProfiledCentrisBienParser` times every property of the parser and every
+`css`/`css_first` call made on its tree, and accumulates them in a
+`ParserProfiler` shared across a corpus:
+
+    profiler = ParserProfiler()
+    for url, html in pages:
+        ProfiledCentrisBienParser.from_html(url, html, profiler).get_data(now)
+    print(profiler.report())
+
+Fields call each other (`nombre_unites` reads `unites`, which reads
+`carac_data`), so each field has an inclusive time and a self time that
+excludes the nested fields and selectors. Stacks are also kept in the
+collapsed format read by flamegraph.pl and speedscope. The plain parser is
+untouched, profiling only costs when this subclass is used. A profiler is not
+thread-safe, use one per thread.
+"""
+
+import json
+import time
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+
+from selectolax.parser import HTMLParser
+
+from centris.backend.centris_scraper import CentrisBienParser
+
+
+@dataclass
+class TimingStats:
+    calls: int = 0
+    total_ns: int = 0
+    self_ns: int = 0
+
+
+@dataclass
+class SelectorStats:
+    calls: int = 0
+    total_ns: int = 0
+    matches: int = 0
+
+
+class ParserProfiler:
+    """Accumulate time and call counts per parser field and per selector."""
+
+    def __init__(self) -> None:
+        self.fields: dict[str, TimingStats] = defaultdict(TimingStats)
+        # (field, selector) -> stats, the field being the one that ran the query
+        self.selectors: dict[tuple[str, str], SelectorStats] = defaultdict(
+            SelectorStats
+        )
+        self.stacks: Counter = Counter()  # collapsed stack -> self time in ns
+        self.documents = 0
+        # Frames of the fields in progress: [name, start, time spent in children]
+        self._stack: list[list] = []
+
+    @contextmanager
+    def measure(self, name: str):
+        frame = [name, time.perf_counter_ns(), 0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter_ns() - frame[1]
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][2] += elapsed
+            stats = self.fields[name]
+            stats.calls += 1
+            # Recursive calls are only counted once in the inclusive time
+            if not any(parent[0] == name for parent in self._stack):
+                stats.total_ns += elapsed
+            stats.self_ns += elapsed - frame[2]
+            path = ";".join([parent[0] for parent in self._stack] + [name])
+            self.stacks[path] += elapsed - frame[2]
+
+    def record_selector(self, selector: str, elapsed: int, matches: int) -> None:
+        field = self._stack[-1][0] if self._stack else "<none>"
+        stats = self.selectors[field, selector]
+        stats.calls += 1
+        stats.total_ns += elapsed
+        stats.matches += matches
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        path = ";".join([frame[0] for frame in self._stack] + [f"css {selector}"])
+        self.stacks[path] += elapsed
+
+    def merge(self, other: "ParserProfiler") -> "ParserProfiler":
+        """Add the measures of `other`, e.g. from another thread or process."""
+        for name, stats in other.fields.items():
+            mine = self.fields[name]
+            mine.calls += stats.calls
+            mine.total_ns += stats.total_ns
+            mine.self_ns += stats.self_ns
+        for key, stats in other.selectors.items():
+            mine = self.selectors[key]
+            mine.calls += stats.calls
+            mine.total_ns += stats.total_ns
+            mine.matches += stats.matches
+        self.stacks.update(other.stacks)
+        self.documents += other.documents
+        return self
+
+    def to_dict(self) -> dict:
+        """Fields ranked by self time and selectors by total time, times in ms."""
+
+        def ms(ns: int) -> float:
+            return round(ns / 1e6, 3)
+
+        fields = sorted(self.fields.items(), key=lambda item: -item[1].self_ns)
+        selectors = sorted(self.selectors.items(), key=lambda item: -item[1].total_ns)
+        return {
+            "documents": self.documents,
+            "fields": [
+                {
+                    "field": name,
+                    "calls": stats.calls,
+                    "total_ms": ms(stats.total_ns),
+                    "self_ms": ms(stats.self_ns),
+                    "self_us_per_document": round(
+                        stats.self_ns / 1e3 / max(self.documents, 1), 1
+                    ),
+                }
+                for name, stats in fields
+            ],
+            "selectors": [
+                {
+                    "field": field,
+                    "selector": selector,
+                    "calls": stats.calls,
+                    "total_ms": ms(stats.total_ns),
+                    "matches": stats.matches,
+                }
+                for (field, selector), stats in selectors
+            ],
+        }
+
+    def report(self, top: int = 20) -> str:
+        """Human-readable ranking of the most expensive fields and selectors."""
+        data = self.to_dict()
+        total_ms = sum(field["self_ms"] for field in data["fields"]) or 1.0
+        lines = [
+            f"{data['documents']} documents, {total_ms:.1f} ms in parser fields",
+            "",
+            f"{'field':<28}{'calls':>8}{'self ms':>11}{'self %':>8}"
+            f"{'total ms':>11}{'us/doc':>9}",
+        ]
+        for field in data["fields"][:top]:
+            lines.append(
+                f"{field['field']:<28}{field['calls']:>8}{field['self_ms']:>11.2f}"
+                f"{100 * field['self_ms'] / total_ms:>7.1f}%"
+                f"{field['total_ms']:>11.2f}{field['self_us_per_document']:>9.1f}"
+            )
+        lines += [
+            "",
+            f"{'selector':<62}{'field':<28}{'calls':>8}{'ms':>10}{'matches':>9}",
+        ]
+        for selector in data["selectors"][:top]:
+            lines.append(
+                f"{selector['selector'][:60]:<62}{selector['field']:<28}"
+                f"{selector['calls']:>8}{selector['total_ms']:>10.2f}"
+                f"{selector['matches']:>9}"
+            )
+        return "\n".join(lines)
+
+    def write_json(self, path: str | Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False))
+
+    def write_collapsed(self, path: str | Path) -> None:
+        """Write `stack;frames value` lines (µs), for flamegraph.pl or speedscope."""
+        with open(path, "w") as f:
+            for stack, ns in sorted(self.stacks.items()):
+                if ns >= 1000:
+                    f.write(f"{stack.replace(' ', '_')} {ns // 1000}\n")
+
+
+class _ProfiledNode:
+    """Proxy of a selectolax node that times its `css` and `css_first` queries."""
+
+    __slots__ = ("_node", "_profiler")
+
+    def __init__(self, node, profiler: ParserProfiler) -> None:
+        self._node = node
+        self._profiler = profiler
+
+    def css(self, selector: str) -> list["_ProfiledNode"]:
+        start = time.perf_counter_ns()
+        nodes = self._node.css(selector)
+        self._profiler.record_selector(
+            selector, time.perf_counter_ns() - start, len(nodes)
+        )
+        return [_ProfiledNode(node, self._profiler) for node in nodes]
+
+    def css_first(self, selector: str, *args, **kwargs) -> "_ProfiledNode | None":
+        start = time.perf_counter_ns()
+        node = self._node.css_first(selector, *args, **kwargs)
+        self._profiler.record_selector(
+            selector, time.perf_counter_ns() - start, int(node is not None)
+        )
+        return None if node is None else _ProfiledNode(node, self._profiler)
+
+    def __getattr__(self, name: str):
+        return getattr(self._node, name)
+
+    def __bool__(self) -> bool:
+        return bool(self._node)
+
+
+class ProfiledCentrisBienParser(CentrisBienParser):
+    """`CentrisBienParser` reporting its timings to a `ParserProfiler`."""
+
+    def __init__(self, url, profiler: ParserProfiler) -> None:
+        super().__init__(url)
+        self.profiler = profiler
+
+    @classmethod
+    def from_html(
+        cls, url: str, html: str, profiler: ParserProfiler
+    ) -> "ProfiledCentrisBienParser":
+        centris_parser = cls(url, profiler)
+        centris_parser.html = html
+        return centris_parser
+
+    @cached_property
+    def tree(self):
+        with self.profiler.measure("tree"):
+            return _ProfiledNode(HTMLParser(self.html), self.profiler)
+
+
+def _timed(name: str, func):
+    def timed(self):
+        with self.profiler.measure(name):
+            return func(self)
+
+    return timed
+
+
+# Wrap every other property of the parser, cached or not
+for _name, _attribute in vars(CentrisBienParser).items():
+    if _name == "tree":
+        continue
+    if isinstance(_attribute, cached_property):
+        _wrapped = cached_property(_timed(_name, _attribute.func))
+        _wrapped.__set_name__(ProfiledCentrisBienParser, _name)
+        setattr(ProfiledCentrisBienParser, _name, _wrapped)
+    elif isinstance(_attribute, property):
+        setattr(
+            ProfiledCentrisBienParser, _name, property(_timed(_name, _attribute.fget))
+        )
+
+# Public fields of a listing: what `get_data` reads, plus the ones it does not
+PARSER_FIELDS = [
+    name
+    for name, attribute in vars(CentrisBienParser).items()
+    if isinstance(attribute, property)
+]
+
+
+def profile_pages(
+    pages: Iterable[tuple[str, str]],
+    profiler: ParserProfiler | None = None,
+    fields: list[str] | None = None,
+) -> ParserProfiler:
+    """Parse (url, html) pages reading `fields` (default: every field) once each.
+
+    Errors on a page are counted under the `<error>` field and do not stop the run.
+    """
+    profiler = profiler or ParserProfiler()
+    for url, html in pages:
+        centris_parser = ProfiledCentrisBienParser.from_html(url, html, profiler)
+        profiler.documents += 1
+        for field in fields or PARSER_FIELDS:
+            try:
+                getattr(centris_parser, field)
+            except Exception:
+                profiler.fields["<error>"].calls += 1
+        centris_parser.release()
+    return profiler
+
+
+def parse_pages(
+    pages: Iterable[tuple[str, str]], fields: list[str] | None = None
+) -> None:
+    """Same work as `profile_pages` on the plain parser, e.g. to run under cProfile."""
+    for url, html in pages:
+        centris_parser = CentrisBienParser.from_html(url, html)
+        for field in fields or PARSER_FIELDS:
+            try:
+                getattr(centris_parser, field)
+            except Exception:
+                pass
+        centris_parser.release()
@@ -0,0 +1,157 @@
+from datetime import datetime
+
+import itertools
+import json
+from collections.abc import Iterable
+
+from sqlalchemy import Select, delete, exists, func, insert, select, update
+
+from centris.backend.db_models import (
+    DataVersionDB,
+    PlexCentrisListingDB,
+    PlexUnitMixDB,
+)
+from centris.backend.mappers import unit_mix_counts
+
+
+LISTINGS_DATA = "listings"
+
+
+def listings_query(
+    quartier: str | None = None,
+    min_prix: int | None = None,
+    max_prix: int | None = None,
+    max_payback: float | None = None,
+    max_prix_par_unite: float | None = None,
+    include_inactive: bool = False,
+    min_unit_counts: dict[float, int] | None = None,
+) -> Select:
+    """Filter listings on columns backed by an index, e.g. payback < 15 in Rosemont.
+
+    The derived metrics are generated columns, so these filters never load
+    or recompute the whole table. Sold or removed listings are left out unless
+    `include_inactive`. `min_unit_counts` keeps the listings with at least that
+    many units of each size, e.g. {5.5: 2} for two 5 ½ or more.
+    """
+    query = select(PlexCentrisListingDB)
+    if not include_inactive:
+        query = query.where(PlexCentrisListingDB.active)
+    if quartier is not None:
+        query = query.where(PlexCentrisListingDB.quartier == quartier)
+    if min_prix is not None:
+        query = query.where(PlexCentrisListingDB.prix >= min_prix)
+    if max_prix is not None:
+        query = query.where(PlexCentrisListingDB.prix <= max_prix)
+    if max_payback is not None:
+        query = query.where(PlexCentrisListingDB.annees_payback < max_payback)
+    if max_prix_par_unite is not None:
+        query = query.where(PlexCentrisListingDB.prix_par_unite <= max_prix_par_unite)
+    for pieces, count in (min_unit_counts or {}).items():
+        query = query.where(
+            exists().where(
+                PlexUnitMixDB.centris_id == PlexCentrisListingDB.centris_id,
+                PlexUnitMixDB.pieces == pieces,
+                PlexUnitMixDB.count >= count,
+            )
+        )
+    return query
+
+
+def unit_mix_stats_query(pieces: float, include_inactive: bool = False) -> Select:
+    """Per quartier: listings with units of size `pieces`, their number and prices.
+
+    Rows are (quartier, listings, units, average price, average price per unit).
+    """
+    query = (
+        select(
+            PlexCentrisListingDB.quartier,
+            func.count(),
+            func.sum(PlexUnitMixDB.count),
+            func.avg(PlexCentrisListingDB.prix),
+            func.avg(PlexCentrisListingDB.prix_par_unite),
+        )
+        .join(PlexUnitMixDB)
+        .where(PlexUnitMixDB.pieces == pieces)
+        .group_by(PlexCentrisListingDB.quartier)
+        .order_by(PlexCentrisListingDB.quartier)
+    )
+    if not include_inactive:
+        query = query.where(PlexCentrisListingDB.active)
+    return query
+
+
+def replace_unit_mix(session, unites_by_id: dict[int, str | None]) -> None:
+    """Rewrite the unit mix of listings from their JSON `unites` column value."""
+    if not unites_by_id:
+        return
+    session.execute(
+        delete(PlexUnitMixDB).where(PlexUnitMixDB.centris_id.in_(unites_by_id))
+    )
+    rows = [
+        {"centris_id": centris_id, "pieces": pieces, "count": count}
+        for centris_id, unites in unites_by_id.items()
+        for pieces, count in unit_mix_counts(json.loads(unites or "[]")).items()
+    ]
+    if rows:
+        session.execute(insert(PlexUnitMixDB), rows)
+
+
+def dialect_insert(session):
+    """The `insert` of the session's dialect, which supports ON CONFLICT clauses."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"No ON CONFLICT support for {dialect}")
+    return insert
+
+
+def data_version_bump(session, name: str = LISTINGS_DATA):
+    """Statement moving the version of `name` forward.
+
+    Execute it once per transaction or batch of writes, not per row: concurrent
+    writers queue on the version row until they commit. In the transaction of
+    the writes it covers, readers never see new data under an old version; in a
+    short one right after their commit, only until it lands.
+    """
+    insert = dialect_insert(session)
+    statement = insert(DataVersionDB).values(
+        name=name, version=1, updated_at=datetime.now().isoformat(timespec="seconds")
+    )
+    return statement.on_conflict_do_update(
+        index_elements=["name"],
+        set_={
+            "version": DataVersionDB.version + 1,
+            "updated_at": statement.excluded.updated_at,
+        },
+    )
+
+
+def stamp_listings(session, centris_ids: Iterable[int], chunk_size: int = 1000) -> int:
+    """Bump the listings data version and stamp it on `centris_ids`, returns it.
+
+    The version row stays locked until the commit, so stamps follow the commit
+    order: once a reader sees version v, every row stamped v or less is visible.
+    Readers then fetch the rows written since with `write_version > v` (plus the
+    NULL ones, written but not stamped yet).
+    """
+    version = session.execute(
+        data_version_bump(session).returning(DataVersionDB.version)
+    ).scalar_one()
+    id_iter = iter(centris_ids)
+    while chunk := list(itertools.islice(id_iter, chunk_size)):
+        session.execute(
+            update(PlexCentrisListingDB)
+            .where(PlexCentrisListingDB.centris_id.in_(chunk))
+            .values(write_version=version)
+        )
+    return version
+
+
+def get_data_version(session, name: str = LISTINGS_DATA) -> int:
+    return (
+        session.scalar(select(DataVersionDB.version).where(DataVersionDB.name == name))
+        or 0
+    )
@@ -0,0 +1,367 @@
+"""Read-only HTTP API over the stored listings, for notebooks, dashboards and scripts.
+
+    GET /listings?quartier=Verdun&max_payback=15&limit=100&after=<cursor>
+    GET /listings?units=5.5:2,4.5:1   (at least two 5 ½ and one 4 ½)
+    GET /listings?since=2024-12-01    (first scraped on or after that day)
+    GET /listings/<centris_id>
+    GET /quartiers?after=<quartier>
+    GET /version
+
+Pages are keyset-paginated on the primary key (`next` holds the URL of the
+following page), so a deep page costs the same as the first one. Every write to
+the listings moves the `listings` data version forward in its transaction.
+Responses of known paths carry it as their ETag: a client sending it back in
+`If-None-Match` (or `*`) gets a 304 after a single primary key lookup. Bodies
+are kept in an in-process LRU cache, which is emptied whenever the version
+changes.
+"""
+
+import json
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from loguru import logger
+from sqlalchemy import func, select
+
+from centris import Session
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import get_data_version, listings_query
+from centris.backend.sketches import UNKNOWN_QUARTIER, load_sketches
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Query parameter -> type, passed to `listings_query`
+LISTING_FILTERS = {
+    "quartier": str,
+    "min_prix": int,
+    "max_prix": int,
+    "max_payback": float,
+    "max_prix_par_unite": float,
+}
+
+
+# Paths answered by `ListingsAPI._route`, others are a 404 without ETag
+ROUTES = re.compile(r"/listings|/listings/\d+|/quartiers|/version")
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class ResponseCache:
+    """LRU of response bodies, valid for a single data version."""
+
+    def __init__(self, max_entries: int = 512) -> None:
+        self.max_entries = max_entries
+        self.version: int | None = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: int) -> bytes | None:
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, version: int, body: bytes) -> None:
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _param(params: dict[str, list[str]], name: str, type_=str, default=None):
+    if name not in params:
+        return default
+    try:
+        return type_(params[name][-1])
+    except ValueError:
+        raise BadRequest(f"Invalid value for {name}: {params[name][-1]!r}")
+
+
+def _unit_counts(params: dict[str, list[str]]) -> dict[float, int] | None:
+    if "units" not in params:
+        return None
+    try:
+        return {
+            float(pieces): int(count)
+            for pieces, _, count in (
+                item.partition(":") for item in params["units"][-1].split(",")
+            )
+        }
+    except ValueError:
+        raise BadRequest(
+            f"Invalid value for units: {params['units'][-1]!r}, e.g. units=5.5:2"
+        )
+
+
+def _since(params: dict[str, list[str]]) -> str | None:
+    since = _param(params, "since")
+    if since is not None:
+        try:
+            # Scrape dates are stored as YYYY-MM-DD text, compared as such
+            date.fromisoformat(since)
+        except ValueError:
+            raise BadRequest(f"Invalid value for since: {since!r}, e.g. 2024-12-01")
+    return since
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an `If-None-Match` header lists `etag`, compared weakly."""
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def _limit(params: dict[str, list[str]]) -> int:
+    limit = _param(params, "limit", int, DEFAULT_LIMIT)
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f"limit must be between 1 and {MAX_LIMIT}")
+    return limit
+
+
+def _next_url(path: str, params: dict[str, list[str]], after) -> str:
+    query = {name: values[-1] for name, values in params.items()}
+    query["after"] = after
+    return f"{path}?{urlencode(query)}"
+
+
+def listing_to_dict(listing: PlexCentrisListingDB) -> dict:
+    return {
+        column.key: getattr(listing, column.key)
+        for column in PlexCentrisListingDB.__table__.columns
+    }
+
+
+def get_listings(session, path: str, params: dict[str, list[str]]) -> dict:
+    limit = _limit(params)
+    filters = {
+        name: _param(params, name, type_) for name, type_ in LISTING_FILTERS.items()
+    }
+    include_inactive = _param(params, "include_inactive", str, "") in {"1", "true"}
+    query = listings_query(
+        **filters,
+        include_inactive=include_inactive,
+        min_unit_counts=_unit_counts(params),
+    )
+    if (after := _param(params, "after", int)) is not None:
+        query = query.where(PlexCentrisListingDB.centris_id > after)
+    if (since := _since(params)) is not None:
+        query = query.where(PlexCentrisListingDB.date_scrape >= since)
+    listings = session.scalars(
+        query.order_by(PlexCentrisListingDB.centris_id).limit(limit + 1)
+    ).all()
+
+    has_more = len(listings) > limit
+    listings = listings[:limit]
+    return {
+        "items": [listing_to_dict(listing) for listing in listings],
+        "next": _next_url(path, params, listings[-1].centris_id) if has_more else None,
+    }
+
+
+def get_listing(session, centris_id: int) -> dict | None:
+    listing = session.get(PlexCentrisListingDB, centris_id)
+    return None if listing is None else listing_to_dict(listing)
+
+
+def get_quartiers(session, path: str, params: dict[str, list[str]]) -> dict:
+    """Listing stats per quartier of the active listings.
+
+    Medians come from the quantile sketches of the active listings, and are
+    approximate above 200 listings.
+    """
+    limit = _limit(params)
+    quartier = PlexCentrisListingDB.quartier
+    query = (
+        select(
+            quartier,
+            func.count(),
+            func.min(PlexCentrisListingDB.prix),
+            func.avg(PlexCentrisListingDB.prix),
+            func.max(PlexCentrisListingDB.prix),
+            func.avg(PlexCentrisListingDB.annees_payback),
+            func.avg(PlexCentrisListingDB.prix_par_unite),
+        )
+        .where(PlexCentrisListingDB.active, quartier.is_not(None))
+        .group_by(quartier)
+        .order_by(quartier)
+        .limit(limit + 1)
+    )
+    if (after := _param(params, "after")) is not None:
+        query = query.where(quartier > after)
+    rows = session.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    sketches = load_sketches(session, ["prix", "annees_payback"])
+
+    def median(metric: str, name: str) -> float | None:
+        sketch = sketches.get((metric, name or UNKNOWN_QUARTIER))
+        return None if sketch is None else sketch.quantile(0.5)
+
+    items = [
+        {
+            "quartier": name,
+            "count": count,
+            "min_prix": min_prix,
+            "avg_prix": avg_prix,
+            "max_prix": max_prix,
+            "median_prix": median("prix", name),
+            "avg_annees_payback": avg_payback,
+            "median_annees_payback": median("annees_payback", name),
+            "avg_prix_par_unite": avg_prix_par_unite,
+        }
+        for name, count, min_prix, avg_prix, max_prix, avg_payback, avg_prix_par_unite in rows
+    ]
+    return {
+        "items": items,
+        "next": _next_url(path, params, rows[-1][0]) if has_more else None,
+    }
+
+
+class ListingsAPI:
+    """Routing, conditional requests and caching, independent of the HTTP server."""
+
+    def __init__(self, session_factory=None, cache_size: int = 512) -> None:
+        self.session_factory = session_factory or Session
+        self.cache = ResponseCache(cache_size)
+
+    def handle(
+        self, target: str, if_none_match: str | None = None
+    ) -> tuple[int, bytes, dict[str, str]]:
+        """Answer a GET of `target` (path and query), returns (status, body, headers)."""
+        url = urlparse(target)
+        if not ROUTES.fullmatch(url.path):
+            body = json.dumps({"error": f"Unknown path {url.path}"}).encode()
+            return 404, body, {}
+        params = parse_qs(url.query)
+        cache_key = f"{url.path}?{urlencode(sorted(params.items()), doseq=True)}"
+
+        with self.session_factory() as session:
+            version = get_data_version(session)
+            etag = f'"listings-{version}"'
+            headers = {
+                "ETag": etag,
+                "Cache-Control": "no-cache",
+                "X-Data-Version": str(version),
+            }
+            if if_none_match is not None and _etag_matches(if_none_match, etag):
+                return 304, b"", headers
+
+            body = self.cache.get(cache_key, version)
+            if body is not None:
+                return 200, body, headers
+            try:
+                status, data = self._route(session, url.path, params, version)
+            except BadRequest as e:
+                return 400, json.dumps({"error": str(e)}).encode(), headers
+
+        body = json.dumps(data, ensure_ascii=False).encode()
+        if status == 200:
+            self.cache.put(cache_key, version, body)
+        return status, body, headers
+
+    def _route(
+        self, session, path: str, params: dict[str, list[str]], version: int
+    ) -> tuple[int, dict]:
+        if path == "/listings":
+            return 200, get_listings(session, path, params)
+        if match := re.fullmatch(r"/listings/(\d+)", path):
+            listing = get_listing(session, int(match.group(1)))
+            if listing is None:
+                return 404, {"error": "Listing not found"}
+            return 200, listing
+        if path == "/quartiers":
+            return 200, get_quartiers(session, path, params)
+        if path == "/version":
+            return 200, {
+                "version": version,
+                "cache": {"hits": self.cache.hits, "misses": self.cache.misses},
+            }
+        return 404, {"error": f"Unknown path {path}"}
+
+
+def make_handler(api: ListingsAPI) -> type[BaseHTTPRequestHandler]:
+    class ListingsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            try:
+                status, body, headers = api.handle(
+                    self.path, self.headers.get("If-None-Match")
+                )
+            except Exception as e:
+                logger.exception(f"Error answering {self.path}: {e}")
+                status, body, headers = 500, b'{"error": "Internal error"}', {}
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug(f"read api: {format % args}")
+
+    return ListingsHandler
+
+
+class _ReadAPIHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class ReadAPIServer:
+    """Read API served from a background thread.
+
+    Usage:
+        with ReadAPIServer(port=8000) as server:
+            requests.get(f"{server.base_url}/listings?quartier=Verdun")
+    """
+
+    def __init__(
+        self,
+        api: ListingsAPI | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.api = api or ListingsAPI()
+        self.httpd = _ReadAPIHTTPServer((host, port), make_handler(self.api))
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "ReadAPIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "ReadAPIServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
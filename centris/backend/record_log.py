@@ -0,0 +1,250 @@
+"""Append-only log of the parsed listings, replayable into any store.
+
+Every validated `PlexCentrisListing` of an ingest is appended to a segment of
+NDJSON, one segment per run (and process), before its row is written to the
+database, so a database outage does not cost the scrape:
+
+    artifacts/records/2024-12-01_08-00-00_4242.ndjson.gz
+    artifacts/records/2024-12-01_08-00-00_4242.ndjson.gz.idx
+
+Records are flushed in blocks, each a complete gzip member, so a segment is a
+plain gzip file (`zcat` reads it) and the sidecar index holds one line per
+block: byte offset, length and record count. Readers seek straight to the
+blocks listed in the index, so counting needs no decompression and a block
+being written by a crashed run is ignored. Replay into the database or a
+Parquet file:
+
+    centris records replay --db-url sqlite:///rebuilt.db
+    centris records replay --parquet listings.parquet --from 2024-12-01
+"""
+
+import gzip
+import itertools
+import json
+import os
+import zlib
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+from types import UnionType
+from typing import get_args
+
+from loguru import logger
+
+from centris.backend.data_models import PlexCentrisListing
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import dialect_insert, replace_unit_mix, stamp_listings
+
+
+DEFAULT_RECORD_LOG_DIR = "artifacts/records"
+
+SEGMENT_SUFFIX = ".ndjson.gz"
+INDEX_SUFFIX = ".idx"
+
+
+class RecordLog:
+    """Writer of the segment of this run, opened on the first record.
+
+    Usage:
+        record_log = RecordLog()
+        record_log.append(centris_parser.get_data(scrape_date))
+        record_log.flush()  # before committing the matching rows
+    """
+
+    def __init__(
+        self, directory: str | Path = DEFAULT_RECORD_LOG_DIR, block_size: int = 500
+    ) -> None:
+        self.directory = Path(directory)
+        self.block_size = block_size
+        self.path: Path | None = None
+        self.records = 0
+        self._buffer: list[bytes] = []
+        self._segment = None
+        self._index = None
+
+    def _open(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{datetime.now():%Y-%m-%d_%H-%M-%S}_{os.getpid()}{SEGMENT_SUFFIX}"
+        self.path = self.directory / name
+        self._segment = open(self.path, "ab")
+        self._index = open(f"{self.path}{INDEX_SUFFIX}", "a")
+
+    def append(self, record: PlexCentrisListing) -> None:
+        self._buffer.append(record.model_dump_json().encode() + b"\n")
+        if len(self._buffer) >= self.block_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records as one block and index it."""
+        if not self._buffer:
+            return
+        if self._segment is None:
+            self._open()
+        block = gzip.compress(b"".join(self._buffer), compresslevel=6)
+        offset = self._segment.tell()
+        self._segment.write(block)
+        self._segment.flush()
+        os.fsync(self._segment.fileno())
+        # Indexed once on disk, so the index never points past the data
+        self._index.write(
+            json.dumps(
+                {"offset": offset, "length": len(block), "records": len(self._buffer)}
+            )
+            + "\n"
+        )
+        self._index.flush()
+        self.records += len(self._buffer)
+        self._buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            logger.info(f"Logged {self.records} records to {self.path}")
+
+    def __enter__(self) -> "RecordLog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def list_segments(
+    directory: str | Path = DEFAULT_RECORD_LOG_DIR,
+    first: str | None = None,
+    last: str | None = None,
+) -> list[Path]:
+    """Segments in run order, from the one named `first` to `last` (name prefixes)."""
+    segments = sorted(Path(directory).glob(f"*{SEGMENT_SUFFIX}"))
+    if first is not None:
+        segments = [s for s in segments if s.name >= first]
+    if last is not None:
+        segments = [s for s in segments if s.name[: len(last)] <= last]
+    return segments
+
+
+def read_index(segment: Path) -> list[dict]:
+    index_path = Path(f"{segment}{INDEX_SUFFIX}")
+    if not index_path.exists():
+        return []
+    blocks = []
+    for line in index_path.read_text().splitlines():
+        try:
+            blocks.append(json.loads(line))
+        except json.JSONDecodeError:
+            # Last line cut by a crash, its block is not complete either
+            break
+    return blocks
+
+
+def iter_segment(segment: Path) -> Iterator[dict]:
+    """Records of a segment, as dicts, block by block."""
+    blocks = read_index(segment)
+    if not blocks:
+        # Index lost: read the whole gzip file up to a cut block
+        with gzip.open(segment, "rt") as f:
+            try:
+                for line in f:
+                    yield json.loads(line)
+            except (EOFError, gzip.BadGzipFile, zlib.error):
+                logger.warning(f"{segment} ends with an incomplete block")
+        return
+    with open(segment, "rb") as f:
+        for block in blocks:
+            f.seek(block["offset"])
+            data = zlib.decompress(f.read(block["length"]), wbits=31)
+            for line in data.splitlines():
+                yield json.loads(line)
+
+
+def iter_records(segments: Iterable[Path]) -> Iterator[dict]:
+    for segment in segments:
+        yield from iter_segment(segment)
+
+
+def record_to_row(record: dict) -> dict:
+    """Values of the listing row of a logged record, as `map_bien_centris_to_orm`."""
+    unites = record.get("unites")
+    return {
+        **record,
+        "unites": json.dumps(unites) if unites else None,
+        "active": True,
+        "last_seen": record["date_scrape"],
+    }
+
+
+def replay_to_database(session, records: Iterable[dict], batch_size: int = 5000) -> int:
+    """Upsert logged records into the listings, later records win.
+
+    The first scrape date, liveness and coordinates of a stored listing are
+    kept, its fair price is cleared to be scored again. Returns the number of
+    written rows.
+    """
+    insert = dialect_insert(session)
+    columns = set(PlexCentrisListingDB.__table__.columns.keys())
+    statement = insert(PlexCentrisListingDB)
+    # One statement for every batch, executed with many parameter sets
+    statement = statement.on_conflict_do_update(
+        index_elements=["centris_id"],
+        set_={
+            **{
+                name: statement.excluded[name]
+                for name in PlexCentrisListing.model_fields
+                if name not in {"centris_id", "date_scrape"}
+            },
+            "prix_modele": None,
+        },
+    )
+    written = 0
+    record_iter = iter(records)
+    while batch := list(itertools.islice(record_iter, batch_size)):
+        # One row per listing and batch, the latest record
+        rows = {
+            record["centris_id"]: {
+                key: value
+                for key, value in record_to_row(record).items()
+                if key in columns
+            }
+            for record in batch
+        }
+        session.execute(statement, list(rows.values()))
+        replace_unit_mix(
+            session,
+            {centris_id: row["unites"] for centris_id, row in rows.items()},
+        )
+        stamp_listings(session, rows)
+        session.commit()
+        written += len(rows)
+    return written
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    types = {int: pa.int64(), str: pa.string(), list[str]: pa.list_(pa.string())}
+    fields = []
+    for name, field in PlexCentrisListing.model_fields.items():
+        annotation = field.annotation
+        if isinstance(annotation, UnionType):
+            # X | None
+            annotation = next(a for a in get_args(annotation) if a is not type(None))
+        fields.append((name, types[annotation]))
+    return pa.schema(fields)
+
+
+def replay_to_parquet(
+    records: Iterable[dict], path: str | Path, batch_size: int = 50_000
+) -> int:
+    """Write logged records to a Parquet file, returns their count."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    written = 0
+    record_iter = iter(records)
+    with pq.ParquetWriter(path, schema) as writer:
+        while batch := list(itertools.islice(record_iter, batch_size)):
+            writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+            written += len(batch)
+    return written
@@ -0,0 +1,179 @@
+import math
+import operator
+from bisect import bisect_right
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any
+
+from loguru import logger
+from sqlalchemy import select
+
+from centris.backend.db_models import (
+    PlexCentrisListingDB,
+    SavedSearchDB,
+    SearchMatchDB,
+)
+
+
+# Saved search column -> (listing attribute, comparison), quartier and prix aside
+CRITERIA = {
+    "min_unites": ("nombre_unites", operator.ge),
+    "max_unites": ("nombre_unites", operator.le),
+    "max_payback": ("annees_payback", operator.le),
+    "max_prix_par_unite": ("prix_par_unite", operator.le),
+}
+
+
+class IntervalTree:
+    """Static centered interval tree over closed intervals (start, end, value).
+
+    `stab(x)` returns the values of the intervals containing x in O(log n + k).
+    """
+
+    def __init__(self, intervals: list[tuple[float, float, Any]]) -> None:
+        finite = sorted(
+            point
+            for start, end, _ in intervals
+            for point in (start, end)
+            if math.isfinite(point)
+        )
+        self.center = finite[len(finite) // 2] if finite else 0.0
+        here = [i for i in intervals if i[0] <= self.center <= i[1]]
+        left = [i for i in intervals if i[1] < self.center]
+        right = [i for i in intervals if i[0] > self.center]
+
+        # The intervals overlapping the center, by start and by decreasing end
+        self._by_start = sorted(here, key=lambda i: i[0])
+        self._starts = [i[0] for i in self._by_start]
+        self._by_end = sorted(here, key=lambda i: -i[1])
+        self._negative_ends = [-i[1] for i in self._by_end]
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def stab(self, x: float) -> list:
+        values = []
+        node = self
+        while node is not None:
+            if x < node.center:
+                count = bisect_right(node._starts, x)
+                values.extend(i[2] for i in node._by_start[:count])
+                node = node.left
+            elif x > node.center:
+                count = bisect_right(node._negative_ends, -x)
+                values.extend(i[2] for i in node._by_end[:count])
+                node = node.right
+            else:
+                values.extend(i[2] for i in node._by_start)
+                break
+        return values
+
+
+def _quartier_key(quartier: str | None) -> str | None:
+    return quartier.strip().casefold() if quartier else None
+
+
+class SearchIndex:
+    """Saved searches indexed for matching one listing at a time.
+
+    Searches are bucketed by quartier (plus one bucket for those on every
+    quartier), and each bucket keeps an interval tree of price ranges. A listing
+    is only checked against the searches of its quartier whose price range
+    contains its price; the remaining criteria are evaluated on those.
+    """
+
+    def __init__(self, searches: Iterable[SavedSearchDB]) -> None:
+        buckets = defaultdict(list)
+        for search in searches:
+            criteria = tuple(
+                (attribute, compare, getattr(search, column))
+                for column, (attribute, compare) in CRITERIA.items()
+                if getattr(search, column) is not None
+            )
+            start = -math.inf if search.min_prix is None else search.min_prix
+            end = math.inf if search.max_prix is None else search.max_prix
+            buckets[_quartier_key(search.quartier)].append(
+                (start, end, (search.id, criteria))
+            )
+        self.size = sum(len(bucket) for bucket in buckets.values())
+        self._trees = {key: IntervalTree(bucket) for key, bucket in buckets.items()}
+
+    @classmethod
+    def from_session(cls, session) -> "SearchIndex":
+        searches = session.scalars(select(SavedSearchDB).where(SavedSearchDB.enabled))
+        return cls(searches)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def match(self, listing: PlexCentrisListingDB) -> list[int]:
+        """IDs of the saved searches matched by `listing`."""
+        if listing.prix is None:
+            return []
+        candidates = []
+        for key in {None, _quartier_key(listing.quartier)}:
+            if key in self._trees:
+                candidates.extend(self._trees[key].stab(listing.prix))
+
+        matches = []
+        for search_id, criteria in candidates:
+            for attribute, compare, threshold in criteria:
+                value = getattr(listing, attribute)
+                if value is None or not compare(value, threshold):
+                    break
+            else:
+                matches.append(search_id)
+        return matches
+
+
+class SearchMatcher:
+    """Match listings at ingest and queue the hits in the `search_matches` outbox.
+
+    Call `add_matches` after flushing a listing (so that its generated metrics
+    are set) and before the commit, the matches are then stored atomically
+    with the listing.
+    """
+
+    def __init__(self, index: SearchIndex) -> None:
+        self.index = index
+        self.matched = 0
+
+    @classmethod
+    def from_session(cls, session) -> "SearchMatcher":
+        index = SearchIndex.from_session(session)
+        logger.info(f"Matching new listings against {len(index)} saved searches")
+        return cls(index)
+
+    def add_matches(
+        self, session, listing: PlexCentrisListingDB, refreshed: bool = False
+    ) -> int:
+        """Queue the hits of `listing`, only the new ones for a `refreshed` listing."""
+        search_ids = self.index.match(listing)
+        if refreshed and search_ids:
+            already_matched = set(
+                session.scalars(
+                    select(SearchMatchDB.search_id).where(
+                        SearchMatchDB.centris_id == listing.centris_id
+                    )
+                )
+            )
+            search_ids = [i for i in search_ids if i not in already_matched]
+        session.add_all(
+            SearchMatchDB(search_id=search_id, centris_id=listing.centris_id)
+            for search_id in search_ids
+        )
+        self.matched += len(search_ids)
+        return len(search_ids)
+
+
+def pending_matches(session) -> list[tuple[SearchMatchDB, SavedSearchDB, str]]:
+    """Unsent outbox entries with their search and listing URL, oldest first."""
+    return session.execute(
+        select(SearchMatchDB, SavedSearchDB, PlexCentrisListingDB.url)
+        .join(SavedSearchDB, SearchMatchDB.search_id == SavedSearchDB.id)
+        .join(
+            PlexCentrisListingDB,
+            SearchMatchDB.centris_id == PlexCentrisListingDB.centris_id,
+        )
+        .where(SearchMatchDB.sent_at.is_(None))
+        .order_by(SearchMatchDB.id)
+    ).all()
@@ -0,0 +1,120 @@
+import sqlite3
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+
+from selectolax.parser import HTMLParser
+
+from centris.backend.centris_scraper import CentrisBienParser
+
+
+# Every fragment read by CentrisBienParser. Each selector keeps its matches in
+# document order, so `css_first` picks the same node on a snapshot as on the page.
+SNAPSHOT_SELECTORS = [
+    'span[data-id="PageTitle"]',
+    'h2[itemprop="address"]',
+    "span#BuyPrice",
+    ".carac-container",
+    'div[itemprop="description"]',
+    "div.financial-details-table",
+]
+
+DEFAULT_SNAPSHOT_PATH = "artifacts/snapshots.db"
+
+
+def extract_snapshot(html: str) -> str:
+    """Keep only the subtrees the parser reads (~5% of a listing page)."""
+    tree = HTMLParser(html)
+    fragments = [
+        node.html for selector in SNAPSHOT_SELECTORS for node in tree.css(selector)
+    ]
+    return "<html><body>\n" + "\n".join(fragments) + "\n</body></html>"
+
+
+class SnapshotStore:
+    """Compressed snapshots of listing pages, one per listing and scrape date.
+
+    Stored in a single SQLite file, so years of history stay small and can be
+    reparsed without network access:
+
+        with SnapshotStore() as store:
+            for centris_parser in store.iter_parsers():
+                print(centris_parser.revenus)
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_SNAPSHOT_PATH) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS snapshots (
+                centris_id INTEGER NOT NULL,
+                date_scrape TEXT NOT NULL,
+                url TEXT NOT NULL,
+                html BLOB NOT NULL,
+                PRIMARY KEY (centris_id, date_scrape)
+            )
+            """
+        )
+        self._pending = 0
+
+    def put(self, centris_parser: CentrisBienParser, date_scrape: str) -> None:
+        """Store the compact snapshot of a fetched listing page."""
+        snapshot = extract_snapshot(centris_parser.html)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?)",
+            (
+                centris_parser.centris_id,
+                date_scrape,
+                centris_parser.url,
+                zlib.compress(snapshot.encode(), level=9),
+            ),
+        )
+        self._pending += 1
+        if self._pending >= 100:
+            self.commit()
+
+    def get(self, centris_id: int, date_scrape: str | None = None) -> str | None:
+        """Snapshot HTML of a listing, the latest one unless `date_scrape` is given."""
+        query = "SELECT html FROM snapshots WHERE centris_id = ?"
+        params: tuple = (centris_id,)
+        if date_scrape is not None:
+            query += " AND date_scrape = ?"
+            params += (date_scrape,)
+        row = self.connection.execute(
+            query + " ORDER BY date_scrape DESC LIMIT 1", params
+        ).fetchone()
+        return zlib.decompress(row[0]).decode() if row else None
+
+    def iter_latest(self) -> Iterator[tuple[str, int, str, str]]:
+        """Yield (url, centris_id, date_scrape, html) of the latest snapshot per listing."""
+        rows = self.connection.execute(
+            """
+            SELECT url, centris_id, MAX(date_scrape), html
+            FROM snapshots GROUP BY centris_id ORDER BY centris_id
+            """
+        )
+        for url, centris_id, date_scrape, html in rows:
+            yield url, centris_id, date_scrape, zlib.decompress(html).decode()
+
+    def iter_parsers(self) -> Iterator[CentrisBienParser]:
+        for url, _, _, html in self.iter_latest():
+            yield CentrisBienParser.from_html(url, html)
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0]
+
+    def commit(self) -> None:
+        self.connection.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self) -> "SnapshotStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,157 @@
+"""Thumbnail cards of the result pages, so that listing pages are only fetched when needed.
+
+Each card of a crawl (ID, URL, price, category and address) is upserted into
+`listing_summaries` with the day it was seen. A listing page is then fetched
+only for a new ID, or for a stored listing whose card changed since the
+previous crawl (e.g. a price drop), whose row is refreshed in place. A card
+whose price still differs from its stored listing counts as changed too, so a
+refresh that failed is retried by the next crawl. Stored listings seen on a
+result page are marked active for the day, so `centris liveness --unseen-days 1`
+only checks the ones the crawl did not see.
+"""
+
+import itertools
+from collections.abc import Iterable
+
+from sqlalchemy import select, update
+
+from centris.backend.centris_scraper import ThumbnailSummary
+from centris.backend.db_models import (
+    NON_PARSER_COLUMNS,
+    ListingSummaryDB,
+    PlexCentrisListingDB,
+)
+from centris.backend.queries import (
+    dialect_insert,
+    replace_unit_mix,
+    stamp_listings,
+)
+from centris.backend.sketches import resketch_listings
+from centris.backend.utils import get_default_date
+
+
+# Card fields whose change triggers a fetch of the listing page
+SUMMARY_FIELDS = ["prix", "categorie", "adresse"]
+
+# Listing columns overwritten by a refresh, the first scrape date and the
+# coordinates are kept (prix_modele is cleared, to be scored again)
+REFRESH_FIELDS = [
+    column.key
+    for column in PlexCentrisListingDB.__table__.columns
+    if column.computed is None
+    and column.key not in {"centris_id", "date_scrape", *NON_PARSER_COLUMNS}
+]
+
+
+def upsert_summaries(
+    session,
+    summaries: Iterable[ThumbnailSummary],
+    seen_on: str | None = None,
+    chunk_size: int = 1000,
+) -> set[int]:
+    """Store the cards seen on `seen_on` (default: today), returns the IDs to refresh.
+
+    Those are the stored listings whose card changed since the previous crawl, or
+    whose card price differs from the stored price (a refresh that did not land).
+    A card seen for the first time is not a change. Commits once every chunk is written.
+    """
+    seen_on = seen_on or get_default_date()
+    insert = dialect_insert(session)
+    changed = set()
+    # Stored listings reactivated or whose card changed
+    touched = []
+    summary_iter = iter(summaries)
+    while chunk := {
+        summary.centris_id: summary
+        for summary in itertools.islice(summary_iter, chunk_size)
+    }:
+        previous = {
+            row.centris_id: row
+            for row in session.execute(
+                select(
+                    ListingSummaryDB.centris_id,
+                    ListingSummaryDB.changed_on,
+                    *(getattr(ListingSummaryDB, field) for field in SUMMARY_FIELDS),
+                ).where(ListingSummaryDB.centris_id.in_(chunk))
+            )
+        }
+        stored = {
+            row.centris_id: row
+            for row in session.execute(
+                select(
+                    PlexCentrisListingDB.centris_id,
+                    PlexCentrisListingDB.prix,
+                    PlexCentrisListingDB.active,
+                ).where(PlexCentrisListingDB.centris_id.in_(chunk))
+            )
+        }
+        rows = []
+        for centris_id, summary in chunk.items():
+            row = {
+                **summary._asdict(),
+                "first_seen": seen_on,
+                "last_seen": seen_on,
+                "changed_on": None,
+            }
+            if (old := previous.get(centris_id)) is not None:
+                row["changed_on"] = old.changed_on
+                if any(getattr(old, field) != row[field] for field in SUMMARY_FIELDS):
+                    changed.add(centris_id)
+                    row["changed_on"] = seen_on
+            if (
+                summary.prix is not None
+                and centris_id in stored
+                and stored[centris_id].prix != summary.prix
+            ):
+                changed.add(centris_id)
+            if centris_id in changed and centris_id in stored:
+                touched.append(centris_id)
+            rows.append(row)
+
+        statement = insert(ListingSummaryDB).values(rows)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["centris_id"],
+                set_={
+                    name: statement.excluded[name]
+                    for name in ["url", *SUMMARY_FIELDS, "last_seen", "changed_on"]
+                },
+            )
+        )
+        session.execute(
+            update(PlexCentrisListingDB)
+            .where(PlexCentrisListingDB.centris_id.in_(chunk))
+            .values(active=True, last_seen=seen_on)
+        )
+        # Back on a result page after liveness found them gone
+        back = [row.centris_id for row in stored.values() if not row.active]
+        if back:
+            resketch_listings(session, back)
+            touched.extend(back)
+
+    # A crawl that changed nothing keeps the data version, and the read API cache
+    if touched:
+        stamp_listings(session, touched)
+    session.commit()
+    return changed
+
+
+def refresh_listing(session, db_entry: PlexCentrisListingDB) -> PlexCentrisListingDB:
+    """Overwrite a stored listing with a new parse of its page, without committing.
+
+    Returns the stored row, reloaded so that its generated metrics are up to date.
+    """
+    session.execute(
+        update(PlexCentrisListingDB)
+        .where(PlexCentrisListingDB.centris_id == db_entry.centris_id)
+        .values(
+            **{field: getattr(db_entry, field) for field in REFRESH_FIELDS},
+            active=True,
+            last_seen=db_entry.date_scrape,
+            prix_modele=None,
+        )
+    )
+    replace_unit_mix(session, {db_entry.centris_id: db_entry.unites})
+    return session.get(
+        PlexCentrisListingDB, db_entry.centris_id, populate_existing=True
+    )
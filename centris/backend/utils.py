@@ -1,6 +1,34 @@
+import gc
+import os
+import resource
 from datetime import datetime
 
 
 # Helper function to generate the default date
 def get_default_date():
     return datetime.now().strftime("%Y-%m-%d")
+
+
+def current_rss_mb() -> float:
+    """Resident memory of the process, in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except OSError:
+        # No procfs (macOS): fall back on the peak, in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024**2
+
+
+class MemoryGuard:
+    """Soft memory cap checked between two listings of an ingest run."""
+
+    def __init__(self, max_mb: float) -> None:
+        self.max_mb = max_mb
+
+    def exceeded(self) -> bool:
+        if current_rss_mb() <= self.max_mb:
+            return False
+        # Parsers are released as soon as their row is written, give the GC a chance
+        gc.collect()
+        return current_rss_mb() > self.max_mb
@@ -0,0 +1,333 @@
+"""Work queue of listing URLs shared by ingest workers through the database.
+
+Workers claim batches in leases with a single `UPDATE ... WHERE id IN (SELECT ...
+FOR UPDATE SKIP LOCKED) RETURNING`. On Postgres, concurrent claims skip each
+other's rows instead of waiting. SQLite has no row locks, but the statement is
+atomic under its database write lock, so the same code runs there with claims
+serialized. A heartbeat extends the leases of the batch in progress. Leases of
+a crashed worker expire and their URLs are claimed again, up to `max_attempts`
+times.
+
+A listing row and the `done` mark of its URL are committed together, and only
+while the worker still holds the lease, so no URL is stored twice.
+"""
+
+import itertools
+import os
+import socket
+import threading
+import time
+import uuid
+from collections.abc import Iterable
+from datetime import datetime
+
+from loguru import logger
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from centris import Session
+from centris.backend.centris_scraper import parse_centris_id
+from centris.backend.db_models import PlexCentrisListingDB, UrlQueueDB
+from centris.backend.frontier import PolitenessBudget, fetch_listings
+from centris.backend.mappers import map_bien_centris_to_orm
+from centris.backend.queries import dialect_insert, stamp_listings
+from centris.backend.record_log import RecordLog
+from centris.backend.saved_searches import SearchMatcher
+from centris.backend.sketches import SketchAccumulator
+
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+def enqueue(session, urls: Iterable[str], chunk_size: int = 1000) -> int:
+    """Add listing URLs to the queue, returns how many were new.
+
+    URLs already queued or of listings already stored are skipped, checking
+    one chunk at a time so that memory does not grow with the input.
+    """
+    insert = dialect_insert(session)
+    added = 0
+    url_iter = iter(urls)
+    while chunk := list(itertools.islice(url_iter, chunk_size)):
+        rows = {}
+        for url in chunk:
+            if (centris_id := parse_centris_id(url)) is not None:
+                rows[centris_id] = {"centris_id": centris_id, "url": url}
+        stored = session.scalars(
+            select(PlexCentrisListingDB.centris_id).where(
+                PlexCentrisListingDB.centris_id.in_(rows)
+            )
+        )
+        for centris_id in stored:
+            del rows[centris_id]
+        if not rows:
+            continue
+        result = session.execute(
+            insert(UrlQueueDB)
+            .values(list(rows.values()))
+            .on_conflict_do_nothing(index_elements=["centris_id"])
+        )
+        session.commit()
+        added += result.rowcount
+    return added
+
+
+def claim(
+    session,
+    worker_id: str,
+    limit: int,
+    lease_seconds: float = 120,
+    max_attempts: int = 3,
+) -> list[tuple[int, str]]:
+    """Lease up to `limit` pending or expired URLs, returns (queue id, url) pairs."""
+    now = time.time()
+    claimable = (
+        select(UrlQueueDB.id)
+        .where(
+            UrlQueueDB.attempts < max_attempts,
+            or_(
+                UrlQueueDB.status == PENDING,
+                and_(UrlQueueDB.status == LEASED, UrlQueueDB.lease_expires_at < now),
+            ),
+        )
+        .order_by(UrlQueueDB.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    rows = session.execute(
+        update(UrlQueueDB)
+        .where(UrlQueueDB.id.in_(claimable.scalar_subquery()))
+        .values(
+            status=LEASED,
+            lease_owner=worker_id,
+            lease_expires_at=now + lease_seconds,
+            attempts=UrlQueueDB.attempts + 1,
+        )
+        .returning(UrlQueueDB.id, UrlQueueDB.url)
+        .execution_options(synchronize_session=False)
+    ).all()
+    # Expired leases that used their last attempt will not be claimed again
+    session.execute(
+        update(UrlQueueDB)
+        .where(
+            UrlQueueDB.status == LEASED,
+            UrlQueueDB.lease_expires_at < now,
+            UrlQueueDB.attempts >= max_attempts,
+        )
+        .values(status=FAILED, lease_owner=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return [tuple(row) for row in rows]
+
+
+def _owned(queue_ids: Iterable[int], worker_id: str):
+    return and_(
+        UrlQueueDB.id.in_(list(queue_ids)),
+        UrlQueueDB.lease_owner == worker_id,
+        UrlQueueDB.status == LEASED,
+    )
+
+
+def heartbeat(
+    session, worker_id: str, queue_ids: Iterable[int], lease_seconds: float = 120
+) -> int:
+    """Extend the leases still held by `worker_id`, returns how many."""
+    result = session.execute(
+        update(UrlQueueDB)
+        .where(_owned(queue_ids, worker_id))
+        .values(lease_expires_at=time.time() + lease_seconds)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def mark_done(session, worker_id: str, queue_id: int) -> bool:
+    """Mark a leased URL as done in the current transaction, False if the lease was lost."""
+    result = session.execute(
+        update(UrlQueueDB)
+        .where(_owned([queue_id], worker_id))
+        .values(status=DONE, lease_owner=None, lease_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def release(
+    session,
+    worker_id: str,
+    queue_ids: Iterable[int],
+    error: str,
+    max_attempts: int = 3,
+) -> None:
+    """Give failed URLs back to the queue, or mark them failed after `max_attempts`."""
+    queue_ids = list(queue_ids)
+    if not queue_ids:
+        return
+    for status, condition in [
+        (PENDING, UrlQueueDB.attempts < max_attempts),
+        (FAILED, UrlQueueDB.attempts >= max_attempts),
+    ]:
+        session.execute(
+            update(UrlQueueDB)
+            .where(_owned(queue_ids, worker_id), condition)
+            .values(
+                status=status,
+                lease_owner=None,
+                lease_expires_at=None,
+                last_error=error[:500],
+            )
+            .execution_options(synchronize_session=False)
+        )
+    session.commit()
+
+
+def queue_counts(session) -> dict[str, int]:
+    return dict(
+        session.execute(
+            select(UrlQueueDB.status, func.count()).group_by(UrlQueueDB.status)
+        ).all()
+    )
+
+
+class _Heartbeat(threading.Thread):
+    """Extend the leases of the batch in progress every third of the lease.
+
+    The worker replaces `queue_ids` with a new frozenset instead of mutating it,
+    so the heartbeat always reads a complete set.
+    """
+
+    def __init__(self, session_factory, worker_id: str, lease_seconds: float) -> None:
+        super().__init__(daemon=True)
+        self.session_factory = session_factory
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.queue_ids: frozenset[int] = frozenset()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.lease_seconds / 3):
+            if not (queue_ids := self.queue_ids):
+                continue
+            try:
+                with self.session_factory() as session:
+                    heartbeat(session, self.worker_id, queue_ids, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Heartbeat of {self.worker_id} failed: {e}")
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def run_worker(
+    session_factory=None,
+    worker_id: str | None = None,
+    batch_size: int = 20,
+    max_workers: int = 4,
+    lease_seconds: float = 120,
+    max_attempts: int = 3,
+    poll_interval: float = 2.0,
+    stop_when_empty: bool = True,
+    sketches: SketchAccumulator | None = None,
+    matcher: SearchMatcher | None = None,
+    record_log: RecordLog | None = None,
+) -> int:
+    """Claim and ingest batches of queued URLs until the queue is drained.
+
+    Several workers can run at once, in processes or on machines sharing the
+    database. Each fetches its batch with `max_workers` threads. Returns the
+    number of listings this worker stored. Parsed records go to `record_log`,
+    flushed before their row is committed.
+    """
+    session_factory = session_factory or Session
+    worker_id = worker_id or default_worker_id()
+    budget = PolitenessBudget(max_concurrency=max_workers)
+    pulse = _Heartbeat(session_factory, worker_id, lease_seconds)
+    pulse.start()
+    stored = 0
+    scrape_date = datetime.now()
+
+    try:
+        with session_factory() as session:
+            while True:
+                batch = dict(
+                    claim(session, worker_id, batch_size, lease_seconds, max_attempts)
+                )
+                if not batch:
+                    counts = queue_counts(session)
+                    # Do not hold a read transaction while sleeping, it would
+                    # block the commits of other workers on SQLite
+                    session.commit()
+                    if stop_when_empty and not counts.get(PENDING, 0) + counts.get(
+                        LEASED, 0
+                    ):
+                        break
+                    # Leases held by other workers may still expire
+                    time.sleep(poll_interval)
+                    continue
+
+                in_progress = set(batch)
+                pulse.queue_ids = frozenset(in_progress)
+                batch_stored = []
+                queue_ids_by_url = {url: queue_id for queue_id, url in batch.items()}
+                for centris_parser in fetch_listings(
+                    batch.values(), budget, max_workers
+                ):
+                    queue_id = queue_ids_by_url[centris_parser.url]
+                    try:
+                        if not mark_done(session, worker_id, queue_id):
+                            logger.warning(f"Lease on {centris_parser.url} lost")
+                            session.rollback()
+                            continue
+                        if session.get(PlexCentrisListingDB, centris_parser.centris_id):
+                            session.commit()
+                            continue
+                        record = centris_parser.get_data(scrape_date)
+                        if record_log is not None:
+                            record_log.append(record)
+                            record_log.flush()
+                        db_entry = map_bien_centris_to_orm(record)
+                        session.add(db_entry)
+                        if matcher is not None:
+                            session.flush()
+                            matcher.add_matches(session, db_entry)
+                        session.commit()
+                        stored += 1
+                        batch_stored.append(centris_parser.centris_id)
+                        if sketches is not None:
+                            sketches.add(centris_parser.centris_id)
+                    except IntegrityError:
+                        # Stored meanwhile by a worker that took over an expired lease
+                        session.rollback()
+                        mark_done(session, worker_id, queue_id)
+                        session.commit()
+                    except Exception as e:
+                        logger.error(f"Error storing {centris_parser.url}: {e}")
+                        session.rollback()
+                        release(session, worker_id, [queue_id], str(e), max_attempts)
+                    finally:
+                        centris_parser.release()
+                        in_progress.discard(queue_id)
+                        pulse.queue_ids = frozenset(in_progress)
+
+                # Pages that could not be fetched go back to the queue
+                release(session, worker_id, in_progress, "fetch failed", max_attempts)
+                pulse.queue_ids = frozenset()
+                if batch_stored:
+                    # Once per batch: a bump per listing would serialize the
+                    # workers on the version row
+                    stamp_listings(session, batch_stored)
+                    session.commit()
+    finally:
+        pulse.stop()
+
+    logger.info(f"Worker {worker_id} stored {stored} listings")
+    return stored
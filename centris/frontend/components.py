@@ -1,23 +1,50 @@
+import os
 import streamlit as st
-from centris.frontend.utils import format_money, clean_address
+from centris import Session
+from centris.frontend.utils import ListingsFrame, format_money, clean_address
 import pandas as pd
-from geopy.geocoders import Nominatim
 import time
 
 
-def geocode_addresses(df):
-    geolocator = Nominatim(user_agent="centris_app", timeout=5)
+@st.cache_resource
+def get_gazetteer():
+    """Address points of `CENTRIS_GAZETTEER` (CSV or Parquet), None if unset."""
+    path = os.getenv("CENTRIS_GAZETTEER")
+    if not path:
+        return None
+    from centris.backend.geocoding import Gazetteer
+
+    return Gazetteer.load(path)
 
+
+def geocode_addresses(df, max_online: int = 2):
+    """Fill the missing coordinates from the gazetteer, then from Nominatim for
+    at most `max_online` of the remaining rows (one per second)."""
+    df = df.copy()
     if "latitude" not in df.columns:
         df["latitude"] = None
         df["longitude"] = None
 
     mask = df[["latitude", "longitude"]].isna().any(axis=1)
-    for idx, row in df[mask].iterrows():
+    gazetteer = get_gazetteer()
+    if gazetteer is not None and mask.any():
+        addresses = df.loc[mask, "Adresse"].fillna("").map(clean_address)
+        latitudes, longitudes, _ = gazetteer.geocode(addresses.tolist())
+        df.loc[mask, "latitude"] = latitudes
+        df.loc[mask, "longitude"] = longitudes
+        mask = df[["latitude", "longitude"]].isna().any(axis=1)
+
+    if max_online <= 0 or not mask.any():
+        return df
+
+    from geopy.geocoders import Nominatim
+
+    geolocator = Nominatim(user_agent="centris_app", timeout=5)
+    for idx, row in df[mask].head(max_online).iterrows():
         clean_addr = clean_address(row["Adresse"])
         address = f"{clean_addr}, {row['Ville']}, Québec, Canada"
         try:
-            # TODO - Save the geocoding results to the DB to avoid re-geocoding
+            # Store them for good with `centris geocode --online`
             location = geolocator.geocode(address)
             if location:
                 df.at[idx, "latitude"] = location.latitude
@@ -40,21 +67,30 @@ def create_map_data(df):
     return map_df[["latitude", "longitude", "Prix", "Adresse"]]
 
 
-def display_property_metrics(df: pd.DataFrame) -> None:
+def display_property_metrics(
+    df: pd.DataFrame, medians: dict[tuple[str, str | None], float] | None = None
+) -> None:
+    medians = medians or {}
+
+    def median(metric: str, column: str) -> float:
+        if (metric, None) in medians:
+            return medians[(metric, None)]
+        return df[column].median()
+
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("Nombre de propriétés", format_money(len(df)))
     with col2:
-        st.metric("Prix médian", format_money(df["Prix"].median()))
+        st.metric("Prix médian", format_money(median("prix", "Prix")))
     with col3:
         st.metric(
             "Revenus médians",
-            format_money(df["Revenus annuels"].median()),
+            format_money(median("revenus", "Revenus annuels")),
         )
     with col4:
         st.metric(
             "Taxes médianes",
-            format_money(df["Taxes annuelles"].median()),
+            format_money(median("taxes", "Taxes annuelles")),
         )
 
 
@@ -115,6 +151,61 @@ def display_quartier_filters():
     }
 
 
+def get_listings_frame(include_inactive: bool = False) -> ListingsFrame:
+    """Listings of the browser session, reruns only read the rows stored since."""
+    frame = st.session_state.get("listings_frame")
+    if frame is None or frame.include_inactive != include_inactive:
+        frame = ListingsFrame(include_inactive)
+        st.session_state["listings_frame"] = frame
+    elif added := frame.refresh():
+        st.toast(f"{added} nouvelles annonces")
+    return frame
+
+
+@st.cache_resource
+def load_comps_index():
+    """Built once per dashboard process, later runs upsert the rows written since."""
+    from centris.backend.comps import CompsIndex
+
+    with Session() as session:
+        return CompsIndex.from_session(session)
+
+
+def find_comps(centris_id: int, k: int = 10) -> pd.DataFrame:
+    index = load_comps_index()
+    with Session() as session:
+        index.sync(session)
+    comps = index.query_id(centris_id, k=k)
+    return pd.DataFrame(comps, columns=["ID Centris", "Distance"])
+
+
+def display_comps(df: pd.DataFrame, ordered_df: pd.DataFrame) -> None:
+    """Pick a listing and show its most comparable listings."""
+    listings = df.set_index("ID Centris")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        centris_id = st.selectbox(
+            "Propriété",
+            listings.index,
+            format_func=lambda i: f"{i} - {listings.at[i, 'Adresse']}",
+        )
+    with col2:
+        k = st.number_input("Nombre de comparables", 1, 50, 10)
+    if centris_id is None:
+        return
+
+    comps = find_comps(int(centris_id), k=int(k))
+    selected = listings.loc[[centris_id]].reset_index()
+    comps_df = comps.merge(listings.reset_index(), on="ID Centris", how="inner")
+    columns = ["Distance"] + list(ordered_df.columns)
+    st.dataframe(
+        pd.concat([selected.assign(Distance=0.0), comps_df])[columns],
+        column_config=set_column_config(),
+        hide_index=True,
+        use_container_width=True,
+    )
+
+
 def set_column_config():
     return {
         "URL": st.column_config.LinkColumn(
@@ -151,4 +242,22 @@ def set_column_config():
             help="Différence en % entre prix et évaluation municipale",
             format="%.1f%%",
         ),
+        "Prix modèle": st.column_config.NumberColumn(
+            "Prix modèle",
+            help="Prix attendu selon unités, terrain, année, revenus, taxes et quartier",
+            format="%d",
+        ),
+        "Diff Prix vs Modèle (%)": st.column_config.NumberColumn(
+            "Diff Prix vs Modèle (%)",
+            help="Différence en % entre prix et prix modèle, négatif = sous le modèle",
+            format="%.1f%%",
+        ),
+        "Prix par unité": st.column_config.NumberColumn(
+            "Prix par unité", help="Prix demandé par logement", format="%d"
+        ),
+        "Multiplicateur revenus bruts": st.column_config.NumberColumn(
+            "Multiplicateur revenus bruts",
+            help="Prix divisé par les revenus bruts annuels",
+            format="%.1f",
+        ),
     }
@@ -1,14 +1,15 @@
 import streamlit as st
 from centris.frontend.utils import (
     calculate_quartier_stats,
-    load_listings_data,
-    calculate_property_financial_metrics,
+    load_sketch_medians,
     order_df,
 )
 from centris.frontend.components import (
     display_property_metrics,
     display_property_filters,
     display_quartier_filters,
+    display_comps,
+    get_listings_frame,
     set_column_config,
     geocode_addresses,
     create_map_data,
@@ -22,18 +23,25 @@ def main():
 
     st.title("Centris Plex Listings Dashboard")
     display_map = st.checkbox("Afficher la carte des propriétés", value=False)
-    # Load data
-    raw_df = load_listings_data()
+    include_inactive = st.checkbox("Inclure les annonces vendues ou retirées")
+    # Load data: the frame is kept across reruns and only gets the new listings
+    frame = get_listings_frame(include_inactive=include_inactive)
+    if st.button("Recharger toutes les annonces"):
+        frame.reload()
+    enriched_df = frame.df
+    # The sketches only cover the active listings
+    medians = None if include_inactive else load_sketch_medians()
     if display_map:
-        raw_df = geocode_addresses(raw_df.iloc[:2])
-    df = calculate_property_financial_metrics(raw_df)
-    df = order_df(df, include_latlong=display_map)
+        enriched_df = geocode_addresses(enriched_df)
+    df = order_df(enriched_df, include_latlong=display_map)
 
-    tab1, tab2 = st.tabs(["📊 Propriétés", "📈 Statistiques par quartier"])
+    tab1, tab2, tab3 = st.tabs(
+        ["📊 Propriétés", "📈 Statistiques par quartier", "🔎 Comparables"]
+    )
 
     with tab1:
         # Metrics
-        display_property_metrics(df)
+        display_property_metrics(df, medians)
 
         # Column configuration
         column_config = set_column_config()
@@ -69,7 +77,7 @@ def main():
     with tab2:
         st.subheader("Analyse par quartier")
 
-        stats_df = calculate_quartier_stats(df)
+        stats_df = calculate_quartier_stats(df, medians)
         stats_column_config = display_quartier_filters()
 
         # Display the statistics table
@@ -88,6 +96,10 @@ def main():
         )
         st.bar_chart(chart_data.set_index("Quartier"), use_container_width=True)
 
+    with tab3:
+        st.subheader("Propriétés comparables")
+        display_comps(enriched_df, df)
+
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,4 @@
 import pandas as pd
-from ydata_profiling import ProfileReport
 import streamlit as st
 from centris.backend.db_models import PlexCentrisListingDB
 from centris import Session
@@ -131,6 +130,9 @@ def main():
     st.subheader("Rapport détaillé")
     if st.button("Générer un rapport détaillé (peut prendre quelques minutes)"):
         with st.spinner("Génération du rapport en cours..."):
+            # Imported on demand, ydata_profiling takes seconds to import
+            from ydata_profiling import ProfileReport
+
             profile = ProfileReport(
                 df, title="Rapport qualité des données Centris", minimal=True
             )
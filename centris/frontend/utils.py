@@ -1,26 +1,40 @@
 import pandas as pd
+from sqlalchemy import select
 from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import get_data_version
 from centris import Session
 
 
-def calculate_quartier_stats(df: pd.DataFrame) -> pd.DataFrame:
-    """Calculate price statistics per quartier"""
+def calculate_quartier_stats(
+    df: pd.DataFrame, medians: dict[tuple[str, str | None], float] | None = None
+) -> pd.DataFrame:
+    """Calculate price statistics per quartier
+
+    Medians of sketched metrics come from `medians` (see load_sketch_medians)
+    when available instead of sorting each group.
+    """
     stats = []
+    medians = medians or {}
 
     for quartier, group in df.groupby("Quartier"):
         if pd.isna(quartier):
             continue
 
+        def median(metric: str, column: str) -> float:
+            if (metric, quartier) in medians:
+                return medians[(metric, quartier)]
+            return group[column].median()
+
         stats.append(
             {
                 "Quartier": quartier,
                 "Nombre de propriétés": len(group),
                 "Prix moyen": group["Prix"].mean(),
-                "Prix médian": group["Prix"].median(),
+                "Prix médian": median("prix", "Prix"),
                 "Prix min": group["Prix"].min(),
                 "Prix max": group["Prix"].max(),
                 "Prix/pi² terrain médian": group["Prix/pi² terrain"].median(),
-                "Annees Payback médian": group["Annees Payback"].median(),
+                "Annees Payback médian": median("annees_payback", "Annees Payback"),
                 "Diff Prix vs Éval (%) médian": group["Diff Prix vs Éval (%)"].median(),
             }
         )
@@ -36,37 +50,50 @@ def format_money(x):
 
 
 def calculate_property_financial_metrics(raw_df: pd.DataFrame) -> pd.DataFrame:
-    """Calculate derived financial metrics"""
+    """Calculate derived financial metrics missing from the frame.
+
+    Listings loaded from the database already carry them as generated columns
+    (see PlexCentrisListingDB), this only fills the gaps for other frames.
+    """
     # Create a copy to avoid modifying the original
     enriched_df = raw_df.copy()
+    prix = enriched_df["Prix"]
+    revenus = enriched_df["Revenus annuels"]
+    taxes = enriched_df["Taxes annuelles"]
 
-    # Price per square foot metrics
-    if "Superficie terrain (pi²)" in enriched_df.columns:
-        enriched_df["Prix/pi² terrain"] = (
-            enriched_df["Prix"] / enriched_df["Superficie terrain (pi²)"]
-        )
-
-    # not computing because too many missing values (>=80%)
-    # if "Superficie bâtiment (pi²)" in df.columns:
-    #     df["Prix/pi² bâtiment"] = df["Prix"] / df["Superficie bâtiment (pi²)"]
-    # if "Superficie habitable (pi²)" in df.columns:
-    #     df["Prix/pi² habitable"] = df["Prix"] / df["Superficie habitable (pi²)"]
-
-    # Calculate payback period considering taxes
-    enriched_df["Annees Payback"] = enriched_df["Prix"] / (
-        enriched_df["Revenus annuels"] - enriched_df["Taxes annuelles"]
-    )
-
-    enriched_df["Ratio Revenus / Prix"] = (
-        enriched_df["Revenus annuels"] / enriched_df["Prix"]
-    ) * 100
+    def nonzero(column: pd.Series) -> pd.Series:
+        return column.where(column != 0)
 
-    # Municipal evaluation metrics
-    enriched_df["Diff Prix vs Éval (%)"] = (
-        (enriched_df["Prix"] - enriched_df["Évaluation municipale"])
-        / enriched_df["Évaluation municipale"]
-        * 100
-    )
+    derived = {
+        # Price per square foot metrics
+        "Prix/pi² terrain": lambda: prix
+        / nonzero(enriched_df["Superficie terrain (pi²)"]),
+        # Payback period considering taxes, undefined if taxes eat all revenus
+        "Annees Payback": lambda: (prix / (revenus - taxes)).where(revenus > taxes),
+        "Ratio Revenus / Prix": lambda: revenus / nonzero(prix) * 100,
+        # Municipal evaluation metrics
+        "Diff Prix vs Éval (%)": lambda: (
+            (prix - enriched_df["Évaluation municipale"])
+            / nonzero(enriched_df["Évaluation municipale"])
+            * 100
+        ),
+        # Fair price model, see centris.backend.pricing
+        "Diff Prix vs Modèle (%)": lambda: (
+            (prix - enriched_df["Prix modèle"])
+            / nonzero(enriched_df["Prix modèle"])
+            * 100
+        ),
+        "Prix par unité": lambda: prix / nonzero(enriched_df["Nombre unités"]),
+        "Multiplicateur revenus bruts": lambda: prix / nonzero(revenus),
+    }
+    for column, compute in derived.items():
+        if column in enriched_df.columns:
+            continue
+        try:
+            enriched_df[column] = compute()
+        except KeyError:
+            # An input column is not loaded in this frame
+            continue
 
     return enriched_df
 
@@ -80,10 +107,14 @@ def order_df(df, include_latlong=False):
         "Superficie terrain (pi²)",
         "Prix/pi² terrain",
         "Diff Prix vs Éval (%)",
+        "Prix modèle",
+        "Diff Prix vs Modèle (%)",
         "Revenus annuels",
         "Taxes annuelles",
         "Annees Payback",
         "Ratio Revenus / Prix",
+        "Prix par unité",
+        "Multiplicateur revenus bruts",
         "Adresse",
         "Année construction",
         "Description",
@@ -105,37 +136,123 @@ def clean_address(address):
     return main_part
 
 
-def load_listings_data() -> pd.DataFrame:
-    """Load all listings from the database into a pandas DataFrame"""
-    with Session.begin() as session:
-        listings = session.query(PlexCentrisListingDB).all()
+def listing_to_row(listing: PlexCentrisListingDB) -> dict:
+    return {
+        "Quartier": listing.quartier,
+        "URL": listing.url,
+        "Prix": listing.prix,
+        "Titre": listing.title,
+        "Adresse": listing.adresse,
+        "Superficie terrain (pi²)": listing.superficie_terrain,
+        "Revenus annuels": listing.revenus,
+        "Taxes annuelles": listing.taxes,
+        "Évaluation municipale": listing.eval_municipale,
+        "Prix modèle": listing.prix_modele,
+        "Année construction": listing.annee_construction,
+        "Description": listing.description,
+        "Unités": listing.unites,
+        "Nombre unités": listing.nombre_unites,
+        # "Superficie habitable (pi²)": listing.superficie_habitable,
+        # "Superficie bâtiment (pi²)": listing.superficie_batiment,
+        # "Superficie commerce (pi²)": listing.superficie_commerce,
+        "Stationnement": listing.stationnement,
+        "Utilisation": listing.utilisation,
+        # "Style bâtiment": listing.style_batiment,
+        "ID Centris": listing.centris_id,
+        "Date de scrape": listing.date_scrape,
+        "Vu pour la dernière fois": listing.last_seen,
+        "Ville": listing.ville,
+        "latitude": listing.latitude,
+        "longitude": listing.longitude,
+        # Derived metrics, generated by the database
+        "Prix/pi² terrain": listing.prix_pi2_terrain,
+        "Annees Payback": listing.annees_payback,
+        "Ratio Revenus / Prix": listing.ratio_revenus_prix,
+        "Diff Prix vs Éval (%)": listing.diff_prix_eval,
+        "Diff Prix vs Modèle (%)": listing.diff_prix_modele,
+        "Prix par unité": listing.prix_par_unite,
+        "Multiplicateur revenus bruts": listing.multiplicateur_revenus,
+    }
 
-        data = [
-            {
-                "Quartier": listing.quartier,
-                "URL": listing.url,
-                "Prix": listing.prix,
-                "Titre": listing.title,
-                "Adresse": listing.adresse,
-                "Superficie terrain (pi²)": listing.superficie_terrain,
-                "Revenus annuels": listing.revenus,
-                "Taxes annuelles": listing.taxes,
-                "Évaluation municipale": listing.eval_municipale,
-                "Année construction": listing.annee_construction,
-                "Description": listing.description,
-                "Unités": listing.unites,
-                #'Nombre unités': listing.nombre_unites,
-                # "Superficie habitable (pi²)": listing.superficie_habitable,
-                # "Superficie bâtiment (pi²)": listing.superficie_batiment,
-                # "Superficie commerce (pi²)": listing.superficie_commerce,
-                "Stationnement": listing.stationnement,
-                "Utilisation": listing.utilisation,
-                # "Style bâtiment": listing.style_batiment,
-                "ID Centris": listing.centris_id,
-                "Date de scrape": listing.date_scrape,
-                "Ville": listing.ville,
-            }
-            for listing in listings
-        ]
+
+def load_listings_data(include_inactive: bool = False) -> pd.DataFrame:
+    """Load the listings from the database into a pandas DataFrame
+
+    Listings found sold or removed by `centris liveness` are left out unless
+    `include_inactive`; the filter uses the index on the active flag.
+    """
+    with Session.begin() as session:
+        query = session.query(PlexCentrisListingDB)
+        if not include_inactive:
+            query = query.filter(PlexCentrisListingDB.active)
+        data = [listing_to_row(listing) for listing in query.all()]
 
     return pd.DataFrame(data)
+
+
+class ListingsFrame:
+    """Listings frame kept in memory and refreshed with the rows written since.
+
+    The watermark is the listings data version of the last load. Writers stamp
+    the rows they write with the version they bump to (`stamp_listings`), so a
+    refresh reads the rows stamped later, whatever their scrape date, and
+    replaces them in the frame: new, refreshed, scored, geocoded, backfilled and
+    turned inactive or active again. Nothing is read when the version has not
+    moved.
+    """
+
+    def __init__(self, include_inactive: bool = False) -> None:
+        self.include_inactive = include_inactive
+        self.reload()
+
+    def reload(self) -> None:
+        with Session() as session:
+            self.version = get_data_version(session)
+        self.df = calculate_property_financial_metrics(
+            load_listings_data(self.include_inactive)
+        )
+
+    def refresh(self) -> int:
+        """Replace the listings written since the last load, returns the new ones."""
+        with Session() as session:
+            version = get_data_version(session)
+            if version == self.version:
+                return 0
+            write_version = PlexCentrisListingDB.write_version
+            # Stamps follow the commit order: nothing stamped up to `version` is
+            # still to come, the unstamped rows are read until they are stamped
+            written = session.scalars(
+                select(PlexCentrisListingDB).where(
+                    (write_version > self.version) | write_version.is_(None)
+                )
+            ).all()
+            written_ids = {listing.centris_id for listing in written}
+            new_rows = [
+                listing_to_row(listing)
+                for listing in written
+                if self.include_inactive or listing.active
+            ]
+        self.version = version
+
+        loaded = set(self.df["ID Centris"]) if not self.df.empty else set()
+        added = sum(row["ID Centris"] not in loaded for row in new_rows)
+        if written_ids & loaded:
+            self.df = self.df[~self.df["ID Centris"].isin(written_ids)]
+        if new_rows:
+            # Only the written rows go through the derived metrics
+            new_df = calculate_property_financial_metrics(pd.DataFrame(new_rows))
+            self.df = pd.concat([self.df, new_df], ignore_index=True)
+        return added
+
+
+def load_sketch_medians() -> dict[tuple[str, str | None], float]:
+    """Approximate medians per (metric, quartier) of the active listings.
+
+    The overall median of a metric is under the quartier None. Empty until
+    `centris ingest` or `centris sketches --rebuild` has filled the sketches.
+    """
+    from centris.backend.sketches import load_sketches
+
+    with Session() as session:
+        sketches = load_sketches(session)
+    return {key: sketch.quantile(0.5) for key, sketch in sketches.items()}
@@ -0,0 +1 @@
+"""HTTP fetching shared by the scrapers of the repo (Centris, library catalog)."""
@@ -0,0 +1,263 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import requests
+from loguru import logger
+
+
+THROTTLING_STATUS_CODES = {429, 503}
+
+
+class FetchError(Exception):
+    """A page could not be fetched (non-200 response)."""
+
+    def __init__(self, url: str, status_code: int, response=None) -> None:
+        super().__init__(f"Failed to fetch page {url} (HTTP {status_code})")
+        self.url = url
+        self.status_code = status_code
+        self.response = response
+
+
+class ThrottledError(FetchError):
+    """The server kept throttling the request after all retries."""
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a `Retry-After` header, given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AdaptiveRateLimiter:
+    """Token bucket whose refill rate follows the health of the server.
+
+    The rate grows additively while responses are fast and successful, and is cut
+    multiplicatively on 429/503 or when latency rises well above its baseline (AIMD).
+    Latencies under `latency_floor` seconds never count as slow, so jitter on very
+    fast responses does not hold the rate down. A `Retry-After` header pauses every
+    caller until the given time.
+    """
+
+    def __init__(
+        self,
+        rate: float = 1.0,
+        min_rate: float = 0.1,
+        max_rate: float = 10.0,
+        burst: int = 1,
+        increase: float = 0.05,
+        decrease: float = 0.5,
+        latency_factor: float = 2.0,
+        latency_floor: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self.latency_floor = latency_floor
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last_refill = clock()
+        self._paused_until = 0.0
+        # Fast and slow moving averages of the response time
+        self._latency = None
+        self._baseline_latency = None
+        self._recent_latencies: deque[float] = deque(maxlen=1000)
+        self.requests = 0
+        self.throttled = 0
+
+    def acquire(self) -> None:
+        """Block until a token is available."""
+        while (wait := self._try_acquire()) > 0:
+            self._sleep(wait)
+
+    async def acquire_async(self) -> None:
+        """Wait for a token without blocking the event loop."""
+        while (wait := self._try_acquire()) > 0:
+            await asyncio.sleep(wait)
+
+    def _try_acquire(self) -> float:
+        """Take a token if one is available, else return how long to wait."""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if now >= self._paused_until and self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return max(self._paused_until - now, (1 - self._tokens) / self.rate, 1e-3)
+
+    def record(
+        self, status_code: int, latency: float, retry_after: float | None = None
+    ) -> None:
+        """Adapt the rate to the outcome of a request."""
+        with self._lock:
+            self.requests += 1
+            if status_code in THROTTLING_STATUS_CODES:
+                self.throttled += 1
+                self._set_rate(self.rate * self.decrease)
+                if retry_after is not None:
+                    self._paused_until = max(
+                        self._paused_until, self._clock() + retry_after
+                    )
+                self._tokens = 0.0
+                return
+
+            self._update_latency(latency)
+            if self._latency > max(
+                self.latency_factor * self._baseline_latency, self.latency_floor
+            ):
+                self._set_rate(self.rate * (1 + self.decrease) / 2)
+            elif status_code < 400:
+                self._set_rate(self.rate + self.increase)
+
+    @property
+    def current_rate(self) -> float:
+        """Current refill rate, in requests per second."""
+        return self.rate
+
+    def latency_quantile(self, q: float) -> float | None:
+        """Quantile of the last 1000 response times."""
+        latencies = sorted(self._recent_latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def metrics(self) -> dict[str, float | int | None]:
+        with self._lock:
+            return {
+                "rate": round(self.rate, 3),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "latency": self._latency,
+                "baseline_latency": self._baseline_latency,
+                "p95_latency": self.latency_quantile(0.95),
+                "paused_for": max(0.0, self._paused_until - self._clock()),
+            }
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def _set_rate(self, rate: float) -> None:
+        self._refill(self._clock())
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def _update_latency(self, latency: float) -> None:
+        self._recent_latencies.append(latency)
+        if self._latency is None:
+            self._latency = self._baseline_latency = latency
+            return
+        self._latency = 0.1 * latency + 0.9 * self._latency
+        self._baseline_latency = 0.01 * latency + 0.99 * self._baseline_latency
+
+
+_limiters: dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(url: str) -> AdaptiveRateLimiter:
+    """Return the limiter shared by every request of the process to the host of `url`."""
+    host = urlparse(url).netloc
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveRateLimiter()
+        return _limiters[host]
+
+
+def configure_limiter(url: str, **kwargs) -> AdaptiveRateLimiter:
+    """Replace the shared limiter of the host of `url`, e.g. to raise its max rate."""
+    limiter = AdaptiveRateLimiter(**kwargs)
+    with _limiters_lock:
+        _limiters[urlparse(url).netloc] = limiter
+    return limiter
+
+
+def _check_response(
+    limiter: AdaptiveRateLimiter, url: str, response, latency: float
+) -> bool:
+    """Record `response` on the limiter, True if it can be returned, False to retry.
+
+    Raises:
+        FetchError: a non-200 response that is not throttling
+    """
+    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+    limiter.record(response.status_code, latency, retry_after)
+    if response.status_code == 200:
+        return True
+    if response.status_code not in THROTTLING_STATUS_CODES:
+        raise FetchError(url, response.status_code, response)
+    logger.warning(
+        f"Throttled on {url} (HTTP {response.status_code}), "
+        f"rate lowered to {limiter.current_rate:.2f} req/s"
+    )
+    return False
+
+
+def limited_request(
+    method: str,
+    url: str,
+    session: requests.Session | None = None,
+    limiter: AdaptiveRateLimiter | None = None,
+    max_retries: int = 5,
+    **kwargs,
+) -> requests.Response:
+    """Send a request through the host limiter, retrying while the server throttles.
+
+    Raises:
+        ThrottledError: the server still throttled after `max_retries` attempts
+        FetchError: any other non-200 response
+    """
+    limiter = limiter or get_limiter(url)
+    send = session.request if session is not None else requests.request
+
+    for attempt in range(max_retries + 1):
+        limiter.acquire()
+        start = time.perf_counter()
+        response = send(method, url, **kwargs)
+        if _check_response(limiter, url, response, time.perf_counter() - start):
+            return response
+
+    raise ThrottledError(url, response.status_code)
+
+
+async def limited_request_async(
+    client,
+    method: str,
+    url: str,
+    limiter: AdaptiveRateLimiter | None = None,
+    max_retries: int = 5,
+    **kwargs,
+):
+    """Async version of `limited_request`, sending through an `httpx.AsyncClient`."""
+    limiter = limiter or get_limiter(url)
+
+    for attempt in range(max_retries + 1):
+        await limiter.acquire_async()
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        if _check_response(limiter, url, response, time.perf_counter() - start):
+            return response
+
+    raise ThrottledError(url, response.status_code)
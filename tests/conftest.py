@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from centris.backend.db_models import Base
+from centris.backend.mock_server import MockCentrisServer, MockConfig
+
+
+class FakeClock:
+    """Clock and sleep of a limiter, advanced by the sleeps instead of waiting."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+class RecordingSketches:
+    """Stand-in for a `SketchAccumulator`, keeps the IDs it was given."""
+
+    def __init__(self) -> None:
+        self.ids: list[int] = []
+        self.resketched: list[int] = []
+
+    def add(self, centris_id: int) -> None:
+        self.ids.append(centris_id)
+
+    def resketch(self, session, centris_ids, adding=()) -> int:
+        self.resketched.extend(centris_ids)
+        return 0
+
+
+@pytest.fixture
+def sketches() -> RecordingSketches:
+    return RecordingSketches()
+
+
+@pytest.fixture
+def mock_server():
+    """Start a `MockCentrisServer` with the given `MockConfig` fields."""
+    servers = []
+
+    def start(**config) -> MockCentrisServer:
+        server = MockCentrisServer(MockConfig(**config)).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    """Sessions on a fresh SQLite database with every table."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'listings.db'}")
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
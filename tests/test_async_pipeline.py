@@ -0,0 +1,105 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from centris.backend import async_pipeline
+from centris.backend.centris_scraper import BASE_URL
+from centris.backend.known_ids import KnownIds
+from centris.backend.main import scrape_and_save
+from centris.backend.queries import get_data_version
+from fetching.rate_limiter import configure_limiter
+
+
+@pytest.fixture
+def listing_urls(mock_server, monkeypatch):
+    server = mock_server(pages=3, listings_per_page=10)
+    monkeypatch.setenv("CENTRIS_FETCH_BASE_URL", server.base_url)
+    configure_limiter(server.base_url, rate=500, max_rate=500, burst=50)
+    return [
+        f"{BASE_URL}{server.site.listing(position)['path']}?view=Summary"
+        for position in range(server.site.total_listings)
+    ]
+
+
+def run(urls, existing_ids, **kwargs) -> int:
+    coroutine = async_pipeline.scrape_and_save_async(
+        urls,
+        datetime(2024, 12, 1),
+        existing_ids,
+        concurrency=4,
+        **{"session_factory": object(), "batch_size": 2, **kwargs},
+    )
+    return asyncio.run(asyncio.wait_for(coroutine, timeout=30))
+
+
+def test_writer_failure_stops_the_fetchers(listing_urls, monkeypatch):
+    async def broken_save(session_factory, batch, *args):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(async_pipeline, "save_batch_async", broken_save)
+    # Raised instead of blocking on the full queue until the timeout
+    with pytest.raises(RuntimeError, match="disk full"):
+        run(listing_urls, set())
+
+
+def test_only_written_listings_become_known(listing_urls, monkeypatch):
+    async def save_even(session_factory, batch, *args):
+        return [entry.centris_id for entry in batch if entry.centris_id % 2 == 0]
+
+    monkeypatch.setattr(async_pipeline, "save_batch_async", save_even)
+    existing_ids = set()
+    stored = run(listing_urls + listing_urls[:5], existing_ids)
+    assert stored == 15
+    assert existing_ids == {i for i in range(10_000_000, 10_000_030) if i % 2 == 0}
+
+
+def test_row_by_row_fallback_bumps_the_version_once(
+    listing_urls, session_factory, tmp_path
+):
+    with session_factory() as session:
+        # Already stored: the batch with this listing fails on its primary key
+        scrape_and_save(listing_urls[:1], datetime(2024, 12, 1), set(), session)
+        assert get_data_version(session) == 1
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'listings.db'}")
+    stored = run(
+        listing_urls[:4],
+        set(),
+        session_factory=async_sessionmaker(engine, expire_on_commit=False),
+        batch_size=4,
+    )
+    asyncio.run(engine.dispose())
+
+    assert stored == 3
+    with session_factory() as session:
+        assert get_data_version(session) == 2
+
+
+def test_known_ids_are_queried_off_the_event_loop(
+    listing_urls, session_factory, tmp_path, monkeypatch
+):
+    threads = set()
+    known = KnownIds.known
+
+    def recording_known(self, ids):
+        threads.add(threading.current_thread())
+        return known(self, ids)
+
+    monkeypatch.setattr(KnownIds, "known", recording_known)
+    with session_factory() as session:
+        scrape_and_save(listing_urls[:5], datetime(2024, 12, 1), set(), session)
+        existing_ids = KnownIds.load(session, path=None)
+
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'listings.db'}")
+        stored = run(
+            listing_urls,
+            existing_ids,
+            session_factory=async_sessionmaker(engine, expire_on_commit=False),
+        )
+        asyncio.run(engine.dispose())
+
+    assert stored == 25
+    assert threads and threading.main_thread() not in threads
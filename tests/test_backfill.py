@@ -0,0 +1,84 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from centris.backend.backfill import BACKFILL_FIELDS, backfill
+from centris.backend.centris_scraper import BASE_URL, CentrisBienParser
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import get_data_version
+from centris.backend.sketches import load_sketches, rebuild_sketches
+from centris.backend.snapshots import SnapshotStore
+
+EXAMPLE_URL = (
+    f"{BASE_URL}/fr/triplex~a-vendre~montreal-rosemont-la-petite-patrie/26999986"
+    "?view=Summary"
+)
+CENTRIS_ID = 26999986
+
+
+@pytest.fixture
+def store(tmp_path):
+    html = (Path(__file__).parent / "examples" / "centris_26999986.html").read_text(
+        encoding="utf-8"
+    )
+    with SnapshotStore(tmp_path / "snapshots.db") as store:
+        store.put(CentrisBienParser.from_html(EXAMPLE_URL, html), "2024-12-01")
+        store.commit()
+        yield store
+
+
+@pytest.fixture
+def session(store, session_factory):
+    """The example listing stored with wrong revenus and a fair price."""
+    html = store.get(CENTRIS_ID)
+    db_entry = CentrisBienParser.from_html(EXAMPLE_URL, html).to_db_model(
+        datetime(2024, 12, 1)
+    )
+    db_entry.revenus = 1
+    db_entry.prix_modele = 850_000
+    with session_factory() as session:
+        session.add(db_entry)
+        session.commit()
+        rebuild_sketches(session)
+        yield session
+
+
+def revenus_sketch(session):
+    return load_sketches(session, ["revenus"])[("revenus", None)]
+
+
+def test_backfill_fixes_the_changed_values(store, session):
+    assert backfill(["revenus", "taxes"], store, session, workers=1, dry_run=True) == {
+        "revenus": 1
+    }
+    assert session.get(PlexCentrisListingDB, CENTRIS_ID).revenus == 1
+
+    version = get_data_version(session)
+    assert backfill(["revenus", "taxes"], store, session, workers=1) == {"revenus": 1}
+    listing = session.get(PlexCentrisListingDB, CENTRIS_ID, populate_existing=True)
+    assert listing.revenus == 51240
+    assert listing.write_version == get_data_version(session) == version + 1
+    # Scored again and sketched with the new value
+    assert listing.prix_modele is None
+    sketch = revenus_sketch(session)
+    assert sketch.n == 1 and sketch.quantile(0.5) == 51240
+
+
+def test_only_parsed_columns_are_backfilled(store, session):
+    assert "write_version" not in BACKFILL_FIELDS
+    assert "prix_modele" not in BACKFILL_FIELDS
+    with pytest.raises(ValueError, match="write_version"):
+        backfill(["write_version"], store, session, workers=1)
+
+
+def test_new_quartier_moves_the_listing_sketches(store, session):
+    listing = session.get(PlexCentrisListingDB, CENTRIS_ID)
+    quartier = listing.quartier
+    listing.quartier = "Verdun"
+    session.commit()
+    rebuild_sketches(session)
+
+    assert backfill(["quartier"], store, session, workers=1) == {"quartier": 1}
+    sketched = {key for key in load_sketches(session, ["revenus"]) if key[1]}
+    assert sketched == {("revenus", quartier)}
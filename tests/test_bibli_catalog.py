@@ -0,0 +1,77 @@
+from pathlib import Path
+from urllib.parse import unquote
+
+from bibli.catalog import (
+    BASE_URL,
+    SavedPages,
+    TitleCache,
+    build_search_url,
+    lookup_titles,
+    normalize_title,
+    page_file_name,
+    parse_results,
+)
+
+ENCORE_PAGES = Path(__file__).parent / "examples" / "encore"
+
+
+def read_page(name: str) -> str:
+    return (ENCORE_PAGES / name).read_text(encoding="utf-8")
+
+
+def test_parse_results():
+    hits = parse_results(read_page("the_wake.html"))
+
+    assert [hit.title for hit in hits] == ["The wake : a novel", "Wake"]
+    assert hits[0].author == "Kingsnorth, Paul, 1972-"
+    assert hits[0].record_url == (
+        "https://nelligandecouverte.ville.montreal.qc.ca/iii/encore/record/"
+        "C__Rb3145219__St%3A%28The%20Wake%29__Orightresult__U__X7"
+        "?lang=frc&suite=cobalt"
+    )
+    assert hits[0].status == "Disponible à LE PRÉVOST - Adultes"
+    assert hits[0].available is True
+    assert hits[1].status == "En prêt - Retour prévu le 2024-12-20"
+    assert hits[1].available is False
+
+
+def test_parse_no_results_ignores_suggestions():
+    assert parse_results(read_page("not_in_catalog.html")) == []
+
+
+def test_search_url_has_title_and_limits():
+    url = build_search_url("Kafka: sur le rivage (poche)")
+
+    assert url.startswith(f"{BASE_URL}/search/C__S")
+    search = unquote(url.split("/C__S")[1].split("__O")[0])
+    assert search == "t:(Kafka sur le rivage poche) f:- c:55 b:x33a (l:eng | l:fre)"
+
+
+def test_normalize_title():
+    assert normalize_title("  Kafka sur le RIVAGE!") == "kafka sur le rivage"
+    assert normalize_title("Élégance du hérisson") == "elegance du herisson"
+    assert page_file_name("The Wake") == "the_wake.html"
+
+
+def test_lookup_titles_offline(tmp_path):
+    fetch = SavedPages(ENCORE_PAGES)
+    titles = ["The Wake", "the wake ", "Not in catalog", "Missing page"]
+
+    with TitleCache(tmp_path / "cache.json") as cache:
+        results = lookup_titles(titles, cache=cache, fetch=fetch, max_workers=2)
+
+    # Titles equal once normalized share one lookup
+    assert results[0] is results[1]
+    assert [result.query for result in results[1:]] == titles[:1] + titles[2:]
+    assert results[0].available
+    assert results[2].hits == [] and results[2].error is None
+    assert "No saved result page" in results[3].error
+
+    # Failed lookups are not cached, the others are answered without fetching
+    cache = TitleCache(tmp_path / "cache.json")
+    assert len(cache) == 2
+    cached = cache.get("THE WAKE")
+    assert cached.from_cache and [hit.title for hit in cached.hits] == [
+        "The wake : a novel",
+        "Wake",
+    ]
@@ -0,0 +1,80 @@
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from centris.backend.centris_scraper import (
+    BASE_URL,
+    CentrisBienParser,
+    build_seed_urls,
+    parse_centris_id,
+    parse_thumbnail_summaries,
+)
+from centris.backend.mock_server import MockCentrisSite, MockConfig
+
+EXAMPLES = Path(__file__).parent / "examples"
+EXAMPLE_URL = (
+    f"{BASE_URL}/fr/triplex~a-vendre~montreal-rosemont-la-petite-patrie/26999986"
+    "?view=Summary"
+)
+
+
+@pytest.fixture(scope="module")
+def example_listing():
+    html = (EXAMPLES / "centris_26999986.html").read_text(encoding="utf-8")
+    parser = CentrisBienParser.from_html(EXAMPLE_URL, html)
+    return parser.get_data(datetime(2024, 12, 1))
+
+
+def test_parse_listing_page(example_listing):
+    assert example_listing.centris_id == 26999986
+    assert example_listing.title == "Triplex à vendre"
+    assert example_listing.prix == 899000
+    assert example_listing.revenus == 51240
+    assert example_listing.taxes == 5450
+    assert example_listing.eval_municipale == 759100
+    assert example_listing.annee_construction == 1959
+    assert example_listing.superficie_terrain == 2400
+    assert example_listing.stationnement == 1
+    assert example_listing.date_scrape == "2024-12-01"
+
+
+def test_parse_listing_units_and_location(example_listing):
+    assert example_listing.unites == ["3 1/2", "3 1/2", "3 1/2", "5 1/2"]
+    assert example_listing.nombre_unites == 4
+    assert example_listing.ville == "Montreal"
+    assert example_listing.quartier == "Rosemont La Petite Patrie"
+    assert example_listing.adresse.startswith("4007 - 4011, boulevard Rosemont")
+
+
+@pytest.mark.parametrize(
+    "url, centris_id",
+    [
+        (EXAMPLE_URL, 26999986),
+        (f"{BASE_URL}/fr/duplex~a-vendre~laval/12345678", 12345678),
+        (f"{BASE_URL}/fr/plex~a-vendre~montreal?view=Thumbnail", None),
+    ],
+)
+def test_parse_centris_id(url, centris_id):
+    assert parse_centris_id(url) == centris_id
+
+
+def test_parse_thumbnail_summaries():
+    site = MockCentrisSite(MockConfig(pages=1, listings_per_page=5))
+    # Cards repeated on a page are kept once
+    html = site.thumbnails_html(0, 5) + site.thumbnails_html(0, 2)
+    summaries = parse_thumbnail_summaries(html)
+    assert len(summaries) == 5
+    for position, summary in enumerate(summaries):
+        listing = site.listing(position)
+        assert summary.centris_id == listing["centris_id"]
+        assert summary.url == f"{BASE_URL}{listing['path']}?view=Summary"
+        assert summary.prix == listing["prix"]
+        assert summary.categorie.endswith("à vendre")
+        assert listing["adresse"] in summary.adresse
+
+
+def test_seed_urls_search_plexes_only():
+    urls = build_seed_urls()
+    assert urls
+    assert all("/fr/plex~a-vendre~" in url for url in urls)
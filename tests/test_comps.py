@@ -0,0 +1,44 @@
+from sqlalchemy import update
+
+from centris.backend.comps import CompsIndex
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import stamp_listings
+
+PRICES = {1: 500_000, 2: 510_000, 3: 600_000, 4: 900_000, 5: 1_000_000}
+
+
+def nearest(index: CompsIndex, centris_id: int, k: int) -> list[int]:
+    return [comp for comp, _ in index.query_id(centris_id, k=k)]
+
+
+def test_comps_follow_the_written_listings(session_factory):
+    with session_factory() as session:
+        session.add_all(
+            PlexCentrisListingDB(
+                centris_id=centris_id,
+                url=f"https://www.centris.ca/fr/triplex~a-vendre~montreal/{centris_id}",
+                prix=prix,
+                nombre_unites=3,
+                quartier="Verdun",
+            )
+            for centris_id, prix in PRICES.items()
+        )
+        stamp_listings(session, PRICES)
+        session.commit()
+
+        index = CompsIndex.from_session(session)
+        assert nearest(index, 1, k=3) == [2, 3, 4]
+        assert nearest(index, 5, k=2) == [4, 3]
+        assert index.sync(session) == 0
+
+        # Refreshed with a new price: written after the index was loaded
+        session.execute(
+            update(PlexCentrisListingDB)
+            .where(PlexCentrisListingDB.centris_id == 4)
+            .values(prix=505_000)
+        )
+        stamp_listings(session, [4])
+        session.commit()
+        assert index.sync(session) == 1
+        assert nearest(index, 1, k=3) == [4, 2, 3]
+        assert nearest(index, 5, k=1) == [3]
@@ -0,0 +1,135 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.geocoding import (
+    Gazetteer,
+    geocode_listings,
+    normalize_street,
+    parse_address,
+)
+from centris.backend.queries import get_data_version
+
+
+@pytest.fixture
+def gazetteer() -> Gazetteer:
+    return Gazetteer.from_records(
+        [
+            {
+                "numero": "5405",
+                "rue": "Rue Saint-Dominique",
+                "lat": "45.52",
+                "lon": "-73.59",
+            },
+            {
+                "numero": "5500",
+                "rue": "Rue Saint-Dominique",
+                "lat": "45.53",
+                "lon": "-73.60",
+            },
+            {
+                "numero": "1234",
+                "rue": "Avenue du Parc",
+                "lat": "45.51",
+                "lon": "-73.58",
+            },
+            {"numero": "", "rue": "Avenue du Parc", "lat": "45.50", "lon": "-73.57"},
+        ]
+    )
+
+
+def test_normalize_street():
+    assert normalize_street("Boul. St-Laurent O.") == "boulevard saint laurent ouest"
+    assert normalize_street("Rue de l'Église") == "rue eglise"
+
+
+def test_parse_address():
+    assert parse_address("5405 - 5409, Rue Saint-Dominique, Montréal (Le Plateau)") == (
+        5405,
+        "rue saint dominique",
+    )
+    assert parse_address("1234A Av. du Parc") == (1234, "avenue parc")
+    assert parse_address("Rue Saint-Dominique") == (None, "rue saint dominique")
+
+
+def test_geocode_levels(gazetteer):
+    assert len(gazetteer) == 3
+    latitudes, longitudes, quality = gazetteer.geocode(
+        [
+            "5405, Rue Saint-Dominique",
+            "5420, Rue Saint-Dominique",
+            "5405, Rue Saint-Dominqiue",
+            "1234, Parc",
+            "9000, Rue Saint-Dominique",
+            "5405, Rue Inconnue",
+            None,
+        ]
+    )
+    assert list(quality) == ["exact", "nearest", "fuzzy", "exact", "", "", ""]
+    assert list(latitudes[:4]) == [45.52, 45.52, 45.52, 45.51]
+    assert longitudes[1] == -73.59
+    assert all(math.isnan(latitude) for latitude in latitudes[4:])
+
+
+def test_only_misses_go_online(gazetteer, session_factory):
+    addresses = {
+        1: "5405, Rue Saint-Dominique",
+        2: "1230, Avenue du Parc",
+        3: "10, Rue Inconnue",
+        4: "20, Rue Introuvable",
+    }
+    asked = []
+
+    def online(query: str):
+        asked.append(query)
+        if "Inconnue" in query:
+            return SimpleNamespace(latitude=45.4, longitude=-73.5)
+        return None
+
+    with session_factory() as session:
+        session.add_all(
+            PlexCentrisListingDB(
+                centris_id=centris_id,
+                url=f"https://www.centris.ca/fr/triplex~a-vendre~montreal/{centris_id}",
+                prix=800_000,
+                adresse=adresse,
+            )
+            for centris_id, adresse in addresses.items()
+        )
+        session.commit()
+
+        counts = geocode_listings(session, gazetteer, online=online)
+        assert counts == {
+            "exact": 1,
+            "nearest": 1,
+            "fuzzy": 0,
+            "online": 1,
+            "missed": 1,
+        }
+        assert asked == [
+            "10 Rue Inconnue, Montréal, Québec, Canada",
+            "20 Rue Introuvable, Montréal, Québec, Canada",
+        ]
+        coordinates = {
+            listing.centris_id: (
+                listing.latitude,
+                listing.longitude,
+                listing.write_version,
+            )
+            for listing in session.query(PlexCentrisListingDB)
+        }
+        # One stamp for the offline batch, one for the online one
+        assert get_data_version(session) == 2
+        assert coordinates == {
+            1: (45.52, -73.59, 1),
+            2: (45.51, -73.58, 1),
+            3: (45.4, -73.5, 2),
+            4: (None, None, None),
+        }
+
+        # Already geocoded listings are skipped, the miss is asked again
+        asked.clear()
+        assert geocode_listings(session, gazetteer, online=online)["missed"] == 1
+        assert asked == ["20 Rue Introuvable, Montréal, Québec, Canada"]
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.known_ids import KnownIds, ScalableBloomFilter
+
+STORED = list(range(10_000_000, 10_000_050))
+
+
+def listing(centris_id: int) -> PlexCentrisListingDB:
+    return PlexCentrisListingDB(
+        centris_id=centris_id,
+        url=f"https://www.centris.ca/fr/triplex~a-vendre~montreal/{centris_id}",
+        prix=800_000,
+    )
+
+
+@pytest.fixture
+def session(session_factory):
+    with session_factory() as session:
+        session.add_all(listing(centris_id) for centris_id in STORED)
+        session.commit()
+        yield session
+
+
+def test_bloom_filter_grows_without_false_negatives():
+    bloom = ScalableBloomFilter(initial_capacity=1000, error_rate=0.01)
+    ids = np.arange(1, 8001) * 7919
+    for chunk in np.array_split(ids, 5):
+        bloom.add_many(chunk)
+
+    # 1000, 2000 and 4000 IDs, then the rest
+    assert len(bloom.filters) == 4
+    assert bloom.contains_many(ids).all()
+    absent = np.arange(1, 100_001) * 7919 + 1
+    assert bloom.contains_many(absent).mean() < 0.01
+
+
+def test_cached_filter_is_rebuilt_when_rows_changed(session, tmp_path, monkeypatch):
+    path = tmp_path / "known_ids.npz"
+    rebuilds = []
+    rebuild = KnownIds.rebuild
+    monkeypatch.setattr(
+        KnownIds, "rebuild", lambda self: rebuilds.append(1) or rebuild(self)
+    )
+
+    KnownIds.load(session, path)
+    assert path.exists() and len(rebuilds) == 1
+
+    known_ids = KnownIds.load(session, path)
+    assert len(rebuilds) == 1
+    known_ids.add(20_000_000)
+    session.add(listing(20_000_000))
+    session.commit()
+    known_ids.save()
+    # Rows added through `add` count as synced
+    assert KnownIds.load(session, path).known([20_000_000]) == {20_000_000}
+    assert len(rebuilds) == 1
+
+    # Stored meanwhile by another worker
+    session.add(listing(20_000_001))
+    session.commit()
+    assert KnownIds.load(session, path).known([20_000_001]) == {20_000_001}
+    assert len(rebuilds) == 2
+
+
+def test_known_resolves_hits_and_misses_in_batches(session):
+    known_ids = KnownIds.load(session, path=None, batch_size=20)
+    absent = list(range(30_000_000, 30_001_000))
+
+    assert known_ids.known(STORED + absent) == set(STORED)
+    # 50 stored IDs and about 1% of the absent ones reach the database
+    assert known_ids.queries == 3
+    assert STORED[0] in known_ids and absent[0] not in known_ids
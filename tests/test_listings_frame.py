@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.liveness import write_statuses
+from centris.backend.pricing import MIN_TRAINING_LISTINGS, score_listings
+from centris.backend.queries import (
+    data_version_bump,
+    get_data_version,
+    stamp_listings,
+)
+from centris.frontend import utils
+from centris.frontend.utils import ListingsFrame
+
+
+def listing(centris_id: int, date_scrape: str) -> PlexCentrisListingDB:
+    return PlexCentrisListingDB(
+        centris_id=centris_id,
+        url=f"https://www.centris.ca/fr/triplex~a-vendre~montreal/{centris_id}",
+        prix=800_000,
+        date_scrape=date_scrape,
+        quartier="Verdun",
+        revenus=40_000,
+        taxes=5_000,
+    )
+
+
+@pytest.fixture
+def session(session_factory, monkeypatch):
+    monkeypatch.setattr(utils, "Session", session_factory)
+    with session_factory() as session:
+        yield session
+
+
+def write(session, *listings: PlexCentrisListingDB) -> None:
+    session.add_all(listings)
+    stamp_listings(session, [listing.centris_id for listing in listings])
+    session.commit()
+
+
+def frame_ids(frame: ListingsFrame) -> list[int]:
+    return sorted(frame.df["ID Centris"])
+
+
+def test_refresh_reads_the_rows_written_since(session):
+    write(session, listing(1, "2024-12-02"), listing(2, "2024-12-02"))
+    frame = ListingsFrame()
+    assert frame_ids(frame) == [1, 2]
+    assert frame.refresh() == 0
+
+    # Written late with an earlier scrape date, e.g. by a queue worker
+    write(session, listing(3, "2024-11-30"))
+    assert frame.refresh() == 1
+    assert frame_ids(frame) == [1, 2, 3]
+
+    write_statuses(session, [{"centris_id": 2, "active": False}])
+    session.commit()
+    assert frame.refresh() == 0
+    assert frame_ids(frame) == [1, 3]
+
+    # Committed before its stamp, as the queue worker does
+    session.add(listing(4, "2024-11-29"))
+    session.commit()
+    session.execute(data_version_bump(session))
+    session.commit()
+    assert frame.refresh() == 1
+    assert frame_ids(frame) == [1, 3, 4]
+    assert len(frame.df) == 3
+
+
+class FlatModel:
+    """Prices every listing at 750 000."""
+
+    n = MIN_TRAINING_LISTINGS
+
+    def predict(self, values, quartiers):
+        return np.full(len(values), 750_000.0)
+
+
+def test_refresh_picks_up_scored_listings(session):
+    write(session, listing(1, "2024-12-02"), listing(2, "2024-12-02"))
+    frame = ListingsFrame()
+    assert frame.df["Prix modèle"].isna().all()
+
+    assert score_listings(session, FlatModel()) == 2
+    # Read back as written rows, not looked up among the unscored ones
+    version = get_data_version(session)
+    assert set(session.scalars(select(PlexCentrisListingDB.write_version))) == {version}
+    assert frame.refresh() == 0
+    assert frame_ids(frame) == [1, 2]
+    assert (frame.df["Prix modèle"] == 750_000).all()
+    assert frame.df["Diff Prix vs Modèle (%)"].round(2).tolist() == [6.67, 6.67]
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+
+from centris.backend.centris_scraper import BASE_URL
+from centris.backend.main import scrape_and_save
+from fetching.rate_limiter import configure_limiter
+
+
+@pytest.fixture
+def listing_urls(mock_server, monkeypatch):
+    server = mock_server(pages=1, listings_per_page=6)
+    monkeypatch.setenv("CENTRIS_FETCH_BASE_URL", server.base_url)
+    configure_limiter(server.base_url, rate=500, max_rate=500, burst=50)
+    return [
+        f"{BASE_URL}{server.site.listing(position)['path']}?view=Summary"
+        for position in range(server.site.total_listings)
+    ]
+
+
+def test_failed_commit_is_not_sketched(
+    listing_urls, session_factory, sketches, monkeypatch
+):
+    existing_ids = set()
+    with session_factory() as session:
+        commit = session.commit
+        commits = []
+
+        def commit_all_but_first() -> None:
+            commits.append(1)
+            if len(commits) == 1:
+                raise RuntimeError("database is locked")
+            commit()
+
+        monkeypatch.setattr(session, "commit", commit_all_but_first)
+        stored = scrape_and_save(
+            listing_urls,
+            datetime(2024, 12, 1),
+            existing_ids,
+            session,
+            sketches=sketches,
+            commit_every=3,
+        )
+
+    assert stored == 3
+    assert sorted(sketches.ids) == sorted(existing_ids)
+    assert len(existing_ids) == 3
@@ -0,0 +1,71 @@
+from datetime import datetime
+
+import requests
+
+from centris.backend.api_client import CentrisAPIClient
+from centris.backend.centris_scraper import (
+    BASE_URL,
+    CentrisBienParser,
+    parse_thumbnail_urls,
+)
+from centris.backend.mock_server import FIRST_CENTRIS_ID
+from fetching.rate_limiter import configure_limiter
+
+
+def test_listing_pages_parse_into_the_generated_listing(mock_server):
+    server = mock_server(pages=1, listings_per_page=3)
+    for position in range(3):
+        listing = server.site.listing(position)
+        response = requests.get(f"{server.base_url}{listing['path']}")
+        assert response.status_code == 200
+        url = f"{BASE_URL}{listing['path']}?view=Summary"
+        record = CentrisBienParser.from_html(url, response.text).get_data(
+            datetime(2024, 12, 1)
+        )
+        assert record.centris_id == listing["centris_id"]
+        assert record.prix == listing["prix"]
+        assert record.revenus == listing["revenus"]
+
+
+def test_result_pages_are_paginated(mock_server):
+    server = mock_server(pages=2, listings_per_page=4)
+    search = f"{server.base_url}/fr/plex~a-vendre~montreal"
+    first = requests.get(f"{search}?view=Thumbnail").text
+    last = requests.get(f"{search}?view=Thumbnail&page=2").text
+    assert 'class="next"' in first
+    assert 'class="next"' not in last
+    ids = [
+        int(url.rsplit("/", 1)[1].split("?")[0]) for url in parse_thumbnail_urls(last)
+    ]
+    assert ids == list(range(FIRST_CENTRIS_ID + 4, FIRST_CENTRIS_ID + 8))
+
+
+def test_get_inscriptions(mock_server, monkeypatch):
+    server = mock_server(pages=2, listings_per_page=5)
+    monkeypatch.setenv("CENTRIS_FETCH_BASE_URL", server.base_url)
+    configure_limiter(server.base_url, rate=100, max_rate=100, burst=10)
+    summaries = CentrisAPIClient().get_listing_summaries(max_pages=3)
+    assert [summary.centris_id for summary in summaries] == [
+        FIRST_CENTRIS_ID + position for position in range(10)
+    ]
+
+
+def test_sold_and_removed_listings(mock_server):
+    server = mock_server(pages=1, listings_per_page=20, inactive_rate=1.0)
+    statuses = {}
+    for position in range(20):
+        listing = server.site.listing(position)
+        response = requests.head(
+            f"{server.base_url}{listing['path']}", allow_redirects=False
+        )
+        statuses[listing["status"]] = response.status_code
+    assert statuses == {"sold": 302, "removed": 404}
+    missing = f"{server.base_url}/fr/plex~a-vendre~montreal/{FIRST_CENTRIS_ID - 1}"
+    assert requests.get(missing).status_code == 404
+
+
+def test_throttling_sends_retry_after(mock_server):
+    server = mock_server(throttle_rate=1.0, retry_after=7)
+    response = requests.get(f"{server.base_url}/fr/plex~a-vendre~montreal")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "7"
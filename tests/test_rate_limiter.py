@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from fetching.rate_limiter import (
+    AdaptiveRateLimiter,
+    FetchError,
+    ThrottledError,
+    limited_request,
+    parse_retry_after,
+)
+
+
+def make_limiter(clock, **kwargs) -> AdaptiveRateLimiter:
+    return AdaptiveRateLimiter(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_parse_retry_after_seconds_and_date():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 <= parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+def test_acquire_paces_requests_at_the_rate(clock):
+    limiter = make_limiter(clock, rate=2.0, burst=1)
+    for _ in range(5):
+        limiter.acquire()
+    # The burst token is free, the 4 others come every 0.5 s
+    assert clock.now == pytest.approx(2.0)
+
+
+def test_rate_grows_additively_on_fast_successes(clock):
+    limiter = make_limiter(clock, rate=1.0, increase=0.1, max_rate=1.25)
+    for _ in range(2):
+        limiter.record(200, latency=0.01)
+    assert limiter.current_rate == pytest.approx(1.2)
+    limiter.record(200, latency=0.01)
+    assert limiter.current_rate == 1.25
+
+
+def test_rate_is_cut_on_slow_responses(clock):
+    limiter = make_limiter(clock, rate=4.0, decrease=0.5, latency_floor=0.05)
+    limiter.record(200, latency=0.1)
+    limiter.record(200, latency=5.0)
+    assert limiter.current_rate == pytest.approx((4.0 + 0.05) * 0.75)
+
+
+def test_throttling_halves_the_rate_and_honours_retry_after(clock):
+    limiter = make_limiter(clock, rate=4.0, min_rate=0.5, decrease=0.5)
+    limiter.record(429, latency=0.01, retry_after=10)
+    assert limiter.current_rate == 2.0
+    assert limiter.throttled == 1
+    limiter.acquire()
+    assert clock.now == pytest.approx(10)
+    for _ in range(5):
+        limiter.record(503, latency=0.01)
+    assert limiter.current_rate == 0.5
+
+
+def test_retries_throttled_requests_until_they_pass(clock, mock_server):
+    server = mock_server(throttle_rate=0.5, retry_after=3, seed=1)
+    limiter = make_limiter(clock, rate=100.0, burst=100)
+    url = f"{server.base_url}/fr/plex~a-vendre~montreal?view=Thumbnail"
+    for _ in range(10):
+        assert limited_request("GET", url, limiter=limiter).status_code == 200
+    assert limiter.throttled > 0
+    assert limiter.requests == 10 + limiter.throttled
+    # Every 429 paused the limiter for its Retry-After, without a real sleep
+    assert clock.now >= 3 * limiter.throttled
+
+
+def test_gives_up_after_max_retries(clock, mock_server):
+    server = mock_server(throttle_rate=1.0, retry_after=2)
+    limiter = make_limiter(clock, rate=8.0, min_rate=0.1, decrease=0.5)
+    url = f"{server.base_url}/fr/plex~a-vendre~montreal?view=Thumbnail"
+    with pytest.raises(ThrottledError) as error:
+        limited_request("GET", url, limiter=limiter, max_retries=3)
+    assert error.value.status_code == 429
+    assert limiter.throttled == 4
+    assert limiter.current_rate == pytest.approx(8.0 * 0.5**4)
+    assert clock.now >= 2 * 3
+
+
+def test_other_errors_are_not_retried(clock, mock_server):
+    server = mock_server(error_rate=1.0)
+    limiter = make_limiter(clock, rate=8.0)
+    with pytest.raises(FetchError) as error:
+        limited_request("GET", f"{server.base_url}/fr/plex", limiter=limiter)
+    assert not isinstance(error.value, ThrottledError)
+    assert error.value.status_code == 500
+    assert limiter.requests == 1
+    assert limiter.current_rate == 8.0
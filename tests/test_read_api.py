@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import data_version_bump
+from centris.backend.read_api import ListingsAPI
+
+LISTINGS = 5
+
+
+@pytest.fixture
+def api(session_factory) -> ListingsAPI:
+    with session_factory() as session:
+        session.add_all(
+            PlexCentrisListingDB(
+                centris_id=centris_id,
+                url=f"https://www.centris.ca/fr/triplex~a-vendre~montreal/{centris_id}",
+                prix=700_000 + centris_id,
+                date_scrape=f"2024-12-0{centris_id}",
+                quartier="Verdun",
+            )
+            for centris_id in range(1, LISTINGS + 1)
+        )
+        session.execute(data_version_bump(session))
+        session.commit()
+    return ListingsAPI(session_factory)
+
+
+def get(api: ListingsAPI, target: str, if_none_match: str | None = None):
+    status, body, headers = api.handle(target, if_none_match)
+    return status, json.loads(body) if body else None, headers
+
+
+def test_listings_are_paginated_on_the_primary_key(api):
+    ids = []
+    target = "/listings?limit=2&quartier=Verdun"
+    while target is not None:
+        status, page, _ = get(api, target)
+        assert status == 200
+        ids += [item["centris_id"] for item in page["items"]]
+        target = page["next"]
+    assert ids == list(range(1, LISTINGS + 1))
+
+    _, page, _ = get(api, "/listings?since=2024-12-04")
+    assert [item["centris_id"] for item in page["items"]] == [4, 5]
+    assert get(api, "/listings?since=yesterday")[0] == 400
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    [
+        '"listings-1"',
+        'W/"listings-1"',
+        '"a","listings-1"',
+        ' "a" , W/"listings-1"',
+        "*",
+    ],
+)
+def test_matching_etag_is_not_modified(api, if_none_match):
+    status, body, headers = get(api, "/listings/1", if_none_match)
+    assert (status, body) == (304, None)
+    assert headers["ETag"] == '"listings-1"'
+
+
+def test_unknown_path_has_no_etag(api):
+    status, body, headers = get(api, "/nowhere", "*")
+    assert status == 404 and "ETag" not in headers
+    assert get(api, "/listings/99")[0] == 404
+
+
+def test_cache_is_emptied_by_a_version_bump(api, session_factory):
+    assert get(api, "/quartiers", '"listings-0"')[0] == 200
+    get(api, "/quartiers")
+    assert (api.cache.hits, api.cache.misses) == (1, 1)
+
+    with session_factory() as session:
+        session.execute(data_version_bump(session))
+        session.commit()
+    status, _, headers = get(api, "/quartiers", '"listings-1"')
+    assert status == 200 and headers["ETag"] == '"listings-2"'
+    assert (api.cache.hits, api.cache.misses) == (1, 2)
@@ -0,0 +1,68 @@
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+
+import pyarrow.parquet as pq
+
+from centris.backend import record_log
+from centris.backend.centris_scraper import BASE_URL, CentrisBienParser
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.record_log import (
+    RecordLog,
+    iter_records,
+    list_segments,
+    read_index,
+    replay_to_database,
+    replay_to_parquet,
+)
+
+EXAMPLE_URL = (
+    f"{BASE_URL}/fr/triplex~a-vendre~montreal-rosemont-la-petite-patrie/26999986"
+    "?view=Summary"
+)
+
+
+def test_segments_replay_round_trip(tmp_path, session_factory, monkeypatch):
+    html = (Path(__file__).parent / "examples" / "centris_26999986.html").read_text(
+        encoding="utf-8"
+    )
+    record = CentrisBienParser.from_html(EXAMPLE_URL, html).get_data(
+        datetime(2024, 12, 1)
+    )
+    # Segments are named after the start time of their run
+    runs = iter([datetime(2024, 12, 1, 8), datetime(2024, 12, 2, 8)])
+    monkeypatch.setattr(record_log, "datetime", SimpleNamespace(now=runs.__next__))
+    directory = tmp_path / "records"
+    for prices in [
+        [800_000, 810_000, 820_000, 830_000, 840_000],
+        [900_000, 910_000, 920_000],
+    ]:
+        with RecordLog(directory, block_size=2) as log:
+            for position, prix in enumerate(prices):
+                log.append(
+                    record.model_copy(update={"centris_id": position, "prix": prix})
+                )
+
+    first, second = list_segments(directory)
+    assert first.name.startswith("2024-12-01_08-00-00")
+    assert [block["records"] for block in read_index(first)] == [2, 2, 1]
+    assert [block["records"] for block in read_index(second)] == [2, 1]
+
+    # A block cut by a crash is not indexed, so it is not read
+    with open(second, "ab") as f:
+        f.write(b"\x1f\x8b\x08partial")
+    assert len(list(iter_records([first, second]))) == 8
+
+    # Later runs win on replay
+    with session_factory() as session:
+        assert replay_to_database(session, iter_records(list_segments(directory))) == 5
+        prices = dict(
+            session.query(PlexCentrisListingDB.centris_id, PlexCentrisListingDB.prix)
+        )
+    assert prices == {0: 900_000, 1: 910_000, 2: 920_000, 3: 830_000, 4: 840_000}
+
+    parquet = tmp_path / "listings.parquet"
+    records = iter_records(list_segments(directory, first="2024-12-02"))
+    assert replay_to_parquet(records, parquet) == 3
+    table = pq.read_table(parquet)
+    assert table.column("prix").to_pylist() == [900_000, 910_000, 920_000]
@@ -0,0 +1,93 @@
+from collections import Counter
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from centris.backend.centris_scraper import parse_thumbnail_summaries
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.liveness import write_statuses
+from centris.backend.main import scrape_and_save
+from centris.backend.sketches import SketchAccumulator, load_sketches
+from centris.backend.summaries import upsert_summaries
+from fetching.rate_limiter import configure_limiter
+
+LISTINGS = 12
+
+
+@pytest.fixture
+def server(mock_server, monkeypatch):
+    server = mock_server(pages=1, listings_per_page=LISTINGS)
+    monkeypatch.setenv("CENTRIS_FETCH_BASE_URL", server.base_url)
+    configure_limiter(server.base_url, rate=500, max_rate=500, burst=50)
+    return server
+
+
+def sketched_counts(session) -> dict[str, int]:
+    return {
+        quartier: sketch.n
+        for (_, quartier), sketch in load_sketches(session, ["prix"]).items()
+        if quartier is not None
+    }
+
+
+def active_counts(session) -> Counter:
+    return Counter(
+        session.scalars(
+            select(PlexCentrisListingDB.quartier).where(PlexCentrisListingDB.active)
+        )
+    )
+
+
+def test_sketches_follow_the_active_listings(server, session_factory):
+    cards = parse_thumbnail_summaries(server.site.thumbnails_html(0, LISTINGS))
+    sketches = SketchAccumulator(session_factory)
+    with session_factory() as session:
+        scrape_and_save(
+            [card.url for card in cards],
+            datetime(2024, 12, 1),
+            set(),
+            session,
+            sketches=sketches,
+        )
+        sketches.flush()
+        assert sketched_counts(session) == active_counts(session)
+
+        gone = [card.centris_id for card in cards[:5]]
+        write_statuses(
+            session,
+            [{"centris_id": centris_id, "active": False} for centris_id in gone],
+        )
+        session.commit()
+        counts = active_counts(session)
+        assert counts.total() == LISTINGS - 5
+        assert sketched_counts(session) == +counts
+
+        # Seen again on a result page
+        upsert_summaries(session, cards[:2])
+        assert sketched_counts(session) == +active_counts(session)
+        assert active_counts(session).total() == LISTINGS - 3
+
+
+def test_refresh_does_not_count_pending_listings_twice(server, session_factory):
+    urls = [
+        card.url
+        for card in parse_thumbnail_summaries(server.site.thumbnails_html(0, LISTINGS))
+    ]
+    # Not flushed until the end: the refreshed groups hold pending listings
+    sketches = SketchAccumulator(session_factory)
+    scrape_date = datetime(2024, 12, 1)
+    with session_factory() as session:
+        existing_ids = set()
+        scrape_and_save(urls[:6], scrape_date, existing_ids, session, sketches=sketches)
+        scrape_and_save(
+            urls,
+            scrape_date,
+            existing_ids,
+            session,
+            sketches=sketches,
+            refresh_ids=set(list(existing_ids)[:3]),
+        )
+        sketches.flush()
+        assert sketched_counts(session) == active_counts(session)
+        assert active_counts(session).total() == LISTINGS
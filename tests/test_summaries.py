@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from centris.backend.async_pipeline import scrape_and_save_async
+from centris.backend.centris_scraper import parse_thumbnail_summaries
+from centris.backend.db_models import SavedSearchDB, SearchMatchDB
+from centris.backend.main import scrape_and_save
+from centris.backend.queries import get_data_version
+from centris.backend.saved_searches import SearchMatcher
+from centris.backend.sketches import SketchAccumulator, load_sketches
+from centris.backend.summaries import upsert_summaries
+from fetching.rate_limiter import configure_limiter
+
+LISTINGS = 4
+
+
+@pytest.fixture
+def sites(mock_server, monkeypatch):
+    """The same listings before and after a price drop on all of them."""
+    before = mock_server(pages=1, listings_per_page=LISTINGS)
+    after = mock_server(pages=1, listings_per_page=LISTINGS, price_drop_rate=1.0)
+    for server in (before, after):
+        configure_limiter(server.base_url, rate=500, max_rate=500, burst=50)
+    monkeypatch.setenv("CENTRIS_FETCH_BASE_URL", before.base_url)
+    return before, after
+
+
+def cards(server):
+    return parse_thumbnail_summaries(server.site.thumbnails_html(0, LISTINGS))
+
+
+def urls(server):
+    return [card.url for card in cards(server)]
+
+
+def prix_sketch(session):
+    return load_sketches(session, metrics=["prix"])[("prix", None)]
+
+
+def test_changed_card_is_refreshed_until_it_lands(sites, session_factory, monkeypatch):
+    before, after = sites
+    scrape_date = datetime(2024, 12, 1)
+    sketches = SketchAccumulator(session_factory)
+    with session_factory() as session:
+        scrape_and_save(urls(before), scrape_date, set(), session, sketches=sketches)
+        sketches.flush()
+        old_median = prix_sketch(session).quantile(0.5)
+        assert upsert_summaries(session, cards(before), "2024-12-01") == set()
+
+        changed = upsert_summaries(session, cards(after), "2024-12-02")
+        assert len(changed) == LISTINGS
+        # The refresh did not happen: the next crawl still sees a changed card
+        assert upsert_summaries(session, cards(after), "2024-12-03") == changed
+
+        session.add(SavedSearchDB(name="Tout", max_prix=10_000_000))
+        session.commit()
+        matcher = SearchMatcher.from_session(session)
+        monkeypatch.setenv("CENTRIS_FETCH_BASE_URL", after.base_url)
+        for _ in range(2):
+            stored = scrape_and_save(
+                urls(after),
+                scrape_date,
+                set(),
+                session,
+                sketches=sketches,
+                matcher=matcher,
+                refresh_ids=set(changed),
+            )
+            assert stored == 0
+
+        # Refreshed rows replace their previous values in the sketches, and are
+        # matched once per saved search
+        sketches.flush()
+        sketch = prix_sketch(session)
+        assert sketch.n == LISTINGS
+        assert sketch.quantile(0.5) < old_median
+        assert matcher.matched == LISTINGS
+        assert session.scalar(select(func.count()).select_from(SearchMatchDB)) == 4
+        assert upsert_summaries(session, cards(after), "2024-12-04") == set()
+
+
+def test_async_refresh_is_matched_and_sketched(
+    sites, session_factory, sketches, tmp_path, monkeypatch
+):
+    before, after = sites
+    scrape_date = datetime(2024, 12, 1)
+    with session_factory() as session:
+        scrape_and_save(urls(before), scrape_date, set(), session)
+        upsert_summaries(session, cards(before), "2024-12-01")
+        changed = upsert_summaries(session, cards(after), "2024-12-02")
+        session.add(SavedSearchDB(name="Tout", max_prix=10_000_000))
+        session.commit()
+        matcher = SearchMatcher.from_session(session)
+
+    async def refresh() -> int:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'listings.db'}")
+        try:
+            return await scrape_and_save_async(
+                urls(after),
+                scrape_date,
+                set(),
+                session_factory=async_sessionmaker(engine, expire_on_commit=False),
+                sketches=sketches,
+                matcher=matcher,
+                refresh_ids=set(changed),
+            )
+        finally:
+            await engine.dispose()
+
+    monkeypatch.setenv("CENTRIS_FETCH_BASE_URL", after.base_url)
+    assert asyncio.run(refresh()) == 0
+    assert sketches.ids == []
+    assert sorted(sketches.resketched) == sorted(changed)
+    assert matcher.matched == LISTINGS
+    with session_factory() as session:
+        assert upsert_summaries(session, cards(after), "2024-12-03") == set()
+
+
+def test_unchanged_crawl_keeps_the_data_version(sites, session_factory):
+    before, after = sites
+    with session_factory() as session:
+        scrape_and_save(urls(before), datetime(2024, 12, 1), set(), session)
+        upsert_summaries(session, cards(before), "2024-12-01")
+        version = get_data_version(session)
+
+        assert upsert_summaries(session, cards(before), "2024-12-02") == set()
+        assert get_data_version(session) == version
+        assert upsert_summaries(session, cards(after), "2024-12-03")
+        assert get_data_version(session) == version + 1
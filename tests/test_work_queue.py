@@ -0,0 +1,107 @@
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from centris.backend.centris_scraper import BASE_URL
+from centris.backend.db_models import PlexCentrisListingDB
+from centris.backend.queries import get_data_version
+from centris.backend.work_queue import (
+    _Heartbeat,
+    claim,
+    enqueue,
+    heartbeat,
+    mark_done,
+    queue_counts,
+    release,
+    run_worker,
+)
+from fetching.rate_limiter import configure_limiter
+
+
+def test_worker_bumps_the_data_version_once_per_batch(
+    mock_server, session_factory, sketches, monkeypatch
+):
+    server = mock_server(pages=1, listings_per_page=10)
+    monkeypatch.setenv("CENTRIS_FETCH_BASE_URL", server.base_url)
+    configure_limiter(server.base_url, rate=500, max_rate=500, burst=50)
+    urls = [
+        f"{BASE_URL}{server.site.listing(position)['path']}?view=Summary"
+        for position in range(10)
+    ]
+    with session_factory() as session:
+        assert enqueue(session, urls) == 10
+
+    stored = run_worker(
+        session_factory, worker_id="test", batch_size=4, sketches=sketches
+    )
+
+    assert stored == 10
+    assert sorted(sketches.ids) == list(range(10_000_000, 10_000_010))
+    with session_factory() as session:
+        assert queue_counts(session) == {"done": 10}
+        assert session.scalar(select(func.count(PlexCentrisListingDB.centris_id))) == 10
+        # Batches of 4, 4 and 2 listings
+        assert get_data_version(session) == 3
+
+
+@pytest.fixture
+def queued(session_factory):
+    """A session on a queue of 5 URLs."""
+    urls = [f"{BASE_URL}/fr/triplex~a-vendre~montreal/{i}" for i in range(1, 6)]
+    with session_factory() as session:
+        enqueue(session, urls)
+        yield session
+
+
+def test_workers_claim_disjoint_batches(queued):
+    first = claim(queued, "a", limit=3)
+    second = claim(queued, "b", limit=3)
+    assert len(first) == 3 and len(second) == 2
+    assert {url for _, url in first}.isdisjoint(url for _, url in second)
+    assert claim(queued, "c", limit=3) == []
+    assert queue_counts(queued) == {"leased": 5}
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(queued):
+    # Expired as soon as claimed, as if worker "a" had crashed
+    ids = [queue_id for queue_id, _ in claim(queued, "a", limit=2, lease_seconds=-1)]
+    assert heartbeat(queued, "b", ids) == 0
+    assert [queue_id for queue_id, _ in claim(queued, "b", limit=2)] == ids
+
+    # The first worker lost its leases, only the second one can finish
+    assert not mark_done(queued, "a", ids[0])
+    assert mark_done(queued, "b", ids[0])
+    queued.commit()
+    assert heartbeat(queued, "b", ids) == 1
+    assert queue_counts(queued) == {"done": 1, "leased": 1, "pending": 3}
+
+
+def test_urls_fail_after_max_attempts(queued):
+    for worker_id in ["a", "b"]:
+        assert len(claim(queued, worker_id, 5, lease_seconds=-1, max_attempts=2)) == 5
+    # The second attempt expired too: nothing left to claim
+    assert claim(queued, "c", 5, max_attempts=2) == []
+    assert queue_counts(queued) == {"failed": 5}
+
+
+def test_released_urls_go_back_to_the_queue_until_max_attempts(queued):
+    ids = [queue_id for queue_id, _ in claim(queued, "a", 5, max_attempts=2)]
+    release(queued, "a", ids, "fetch failed", max_attempts=2)
+    assert queue_counts(queued) == {"pending": 5}
+
+    ids = [queue_id for queue_id, _ in claim(queued, "a", 5, max_attempts=2)]
+    release(queued, "a", ids, "fetch failed", max_attempts=2)
+    assert queue_counts(queued) == {"failed": 5}
+
+
+def test_heartbeat_keeps_the_published_leases(queued, session_factory):
+    ids = [queue_id for queue_id, _ in claim(queued, "a", 2, lease_seconds=1)]
+    pulse = _Heartbeat(session_factory, "a", lease_seconds=1)
+    pulse.queue_ids = frozenset(ids)
+    pulse.start()
+    try:
+        time.sleep(1.5)
+        assert len(claim(queued, "b", 5)) == 3
+    finally:
+        pulse.stop()